@@ -0,0 +1,247 @@
+# benchmarks/evals.py
+# ----------------------------------------------------
+# Planner evals: each case (benchmarks/eval_cases.jsonl) is a query plus a gold plan.
+# The query goes through the page-03 flow (route_to_tool -> execute_plan -> run_pandas_code)
+# and is scored against the gold plan run on the same data:
+#   plan_valid     the planner returned a plan that passes validate_plan
+#   filters_match  same filters as the gold plan (order-free; a one-value 'in' equals '==')
+#   result_match   same rows (by id) / same values (aggregates) as the gold plan's result
+#   plan_s, exec_s execution time of the planner call and of executing the plan (+ code)
+# LLM calls go through a cassette (llm_clients.cassette): record once, then replay with
+# no network so prompt / caching / execution changes are compared on identical answers.
+#
+#   python -m benchmarks.evals --record benchmarks/cassettes/planner.jsonl            # live OpenAI
+#   python -m benchmarks.evals --record /tmp/planner.jsonl --standin                  # local stand-in
+#   python -m benchmarks.evals --replay benchmarks/cassettes/planner.jsonl --workers 8 --json out.json
+# Data is synthetic (benchmarks/synthetic_data.py, same seed -> same results) unless --data supabase.
+# ----------------------------------------------------
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:  # allow `python benchmarks/evals.py`
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.load_test import _percentiles
+from benchmarks.run_benchmarks import _parse_size
+from benchmarks.synthetic_data import DATASET, make_player_stats
+from llm_clients.cassette import CassetteMiss, use_cassette
+from llm_clients.openai_client import get_openai_client
+from llm_clients.router import PLANNER_SYSTEM, route_to_tool
+from tools import snapshot_store
+from tools.conversation import build_planner_context
+from tools.pandas_compiler import run_pandas_code
+from tools.registry import TOOL_REGISTRY, execute_plan, execute_tool, plan_base_load, validate_plan
+from tools.schema_catalog import loader_tool_name
+from tools.specs import PLANNER_TOOL_SPECS
+
+DEFAULT_CASES = ROOT / "benchmarks" / "eval_cases.jsonl"
+
+
+# ---------- 1) Cases and data ----------
+def load_cases(path: Path) -> List[Dict[str, Any]]:
+    cases = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if line.strip():
+                case = json.loads(line)
+                if not case.get("query") or not isinstance(case.get("expected_plan"), dict):
+                    raise ValueError(f"{path}:{n}: a case needs 'query' and 'expected_plan'")
+                case.setdefault("id", f"case-{n}")
+                cases.append(case)
+    return cases
+
+
+def use_synthetic_data(rows: int, seed: int, snapshot_root: Path) -> pd.DataFrame:
+    """Serve a synthetic table from the loader tool (derived columns included)."""
+    df = make_player_stats(rows, seed=seed, derived=True)
+    latest = df.loc[df["as_of_date"] == df["as_of_date"].max()]
+
+    def load_stub(snapshot: Optional[str] = None) -> pd.DataFrame:
+        return latest if snapshot == "latest" else df
+
+    TOOL_REGISTRY.register("load_biwenger_player_stats", lambda: load_stub)
+    # an empty store in a temp dir: the optimizer keeps the (stubbed) loader as the source
+    snapshot_store._STORES[DATASET] = snapshot_store.SnapshotStore(DATASET, root=snapshot_root)
+    return df
+
+
+# ---------- 2) Scoring ----------
+def _filters(plan: Dict[str, Any]) -> List[tuple]:
+    out = []
+    for step in plan.get("steps", []):
+        if step.get("tool") != "filter_df":
+            continue
+        for f in (step.get("args") or {}).get("filters", []):
+            op, val = f.get("op"), f.get("val")
+            if op in ("in", "not_in") and isinstance(val, list):
+                if len(val) == 1:
+                    op, val = ("==" if op == "in" else "!="), val[0]
+                else:
+                    val = sorted(map(str, val))
+            out.append((f.get("col"), op, json.dumps(val, sort_keys=True, default=str)))
+    return sorted(out)
+
+
+def _frame_result(plan: Dict[str, Any], result: Any) -> pd.DataFrame:
+    """execute_plan output as a DataFrame; translate plans run their code like page 03 does."""
+    if isinstance(result, dict) and "python_code" in result:
+        table, args = plan_base_load(plan)
+        result, _engine = run_pandas_code(result["python_code"], execute_tool(loader_tool_name(table), args))
+    if isinstance(result, pd.Series):
+        result = result.to_frame()
+    if not isinstance(result, pd.DataFrame):
+        raise ValueError(f"Plan returned {type(result).__name__}, expected a DataFrame")
+    return result
+
+
+def results_match(got: pd.DataFrame, expected: pd.DataFrame) -> bool:
+    """Row frames compare by id set; aggregates by sorted values (column names may differ)."""
+    if "id" in got.columns and "id" in expected.columns:
+        return set(got["id"]) == set(expected["id"])
+    if got.shape != expected.shape:
+        return False
+    a = got.sort_values(list(got.columns)).reset_index(drop=True)
+    b = expected.sort_values(list(expected.columns)).reset_index(drop=True)
+    for x, y in zip(a.columns, b.columns):
+        xs, ys = a[x], b[y]
+        if pd.api.types.is_numeric_dtype(xs) and pd.api.types.is_numeric_dtype(ys):
+            if not np.allclose(xs.to_numpy(float), ys.to_numpy(float), equal_nan=True):
+                return False
+        elif not (xs.astype(str).to_numpy() == ys.astype(str).to_numpy()).all():
+            return False
+    return True
+
+
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"id": case["id"], "query": case["query"], "plan_valid": False,
+                           "filters_match": False, "result_match": False,
+                           "plan_s": None, "exec_s": None, "total_s": None, "error": None}
+    expected = case["expected_plan"]
+    t_case = time.perf_counter()
+    stage = "plan"
+    try:
+        t0 = time.perf_counter()
+        call = route_to_tool(case["query"], PLANNER_TOOL_SPECS, context=build_planner_context(DATASET),
+                             force_tool_name="make_plan", system_override=PLANNER_SYSTEM, validate=validate_plan)
+        out["plan_s"] = round(time.perf_counter() - t0, 4)
+        out["plan"] = call.args
+        stage = "validate"
+        validate_plan(call.args)
+        out["plan_valid"] = True
+        out["filters_match"] = _filters(call.args) == _filters(expected)
+
+        stage = "execute"
+        t0 = time.perf_counter()
+        got = _frame_result(call.args, execute_plan(call.args))
+        out["exec_s"] = round(time.perf_counter() - t0, 4)
+
+        stage = "expected"
+        out["result_match"] = results_match(got, _frame_result(expected, execute_plan(expected)))
+        out["rows"] = len(got)
+    except CassetteMiss as e:
+        out["error"] = f"cassette miss: {e}"
+    except Exception as e:  # a failed case is a data point, not a crash
+        out["error"] = f"{stage}: {type(e).__name__}: {e}"
+    out["total_s"] = round(time.perf_counter() - t_case, 4)
+    return out
+
+
+# ---------- 3) Runner ----------
+def run_evals(cases: List[Dict[str, Any]], workers: int) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        rows = list(pool.map(run_case, cases))
+    n = len(rows) or 1
+    rate = lambda key: round(sum(bool(r[key]) for r in rows) / n, 3)
+    return {
+        "cases": len(rows),
+        "wall_s": round(time.perf_counter() - t0, 3),
+        "plan_valid": rate("plan_valid"),
+        "filters_match": rate("filters_match"),
+        "result_match": rate("result_match"),
+        "errors": sum(r["error"] is not None for r in rows),
+        "plan_latency": _percentiles([r["plan_s"] for r in rows if r["plan_s"] is not None]),
+        "exec_latency": _percentiles([r["exec_s"] for r in rows if r["exec_s"] is not None]),
+        "results": rows,
+    }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"{'case':<28}{'valid':>7}{'filters':>9}{'result':>8}{'plan ms':>10}{'exec ms':>10}  error")
+    ms = lambda v: f"{v * 1000:>10.1f}" if v is not None else f"{'-':>10}"
+    yn = lambda v, w: f"{'yes' if v else 'no':>{w}}"
+    for r in report["results"]:
+        print(f"{r['id'][:27]:<28}{yn(r['plan_valid'], 7)}{yn(r['filters_match'], 9)}{yn(r['result_match'], 8)}"
+              f"{ms(r['plan_s'])}{ms(r['exec_s'])}  {r['error'] or ''}")
+    print(f"\n{report['cases']} cases in {report['wall_s']}s: plan_valid {report['plan_valid']:.0%}, "
+          f"filters_match {report['filters_match']:.0%}, result_match {report['result_match']:.0%}, "
+          f"{report['errors']} errors")
+    for key in ("plan_latency", "exec_latency", "cassette"):
+        if report.get(key):
+            print(f"{key}: {json.dumps(report[key], default=str)}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Planner accuracy/latency evals with record/replay of LLM calls.")
+    ap.add_argument("--cases", type=Path, default=DEFAULT_CASES)
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument("--record", type=Path, metavar="CASSETTE", help="call the API and record every request")
+    mode.add_argument("--replay", type=Path, metavar="CASSETTE", help="serve recorded responses, no network")
+    mode.add_argument("--auto", type=Path, metavar="CASSETTE", help="replay what is recorded, record the rest")
+    ap.add_argument("--match", choices=["exact", "user"], default="exact",
+                    help="'user' replays across system-prompt/context changes")
+    ap.add_argument("--replay-latency", action="store_true", help="sleep the recorded latency on replay")
+    ap.add_argument("--standin", action="store_true", help="record against the local OpenAI stand-in")
+    ap.add_argument("--data", choices=["synthetic", "supabase"], default="synthetic")
+    ap.add_argument("--rows", default="20k", help="synthetic rows")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=4, help="cases run in parallel")
+    ap.add_argument("--fail-under", type=float, default=0.0, help="exit 1 if result_match is below this")
+    ap.add_argument("--json", type=Path, help="write the report here")
+    args = ap.parse_args(argv)
+
+    cases = load_cases(args.cases)
+    with ExitStack() as stack:
+        if args.data == "synthetic":
+            root = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+            df = use_synthetic_data(_parse_size(args.rows), args.seed, root)
+            print(f"# {len(df):,} synthetic rows, {len(cases)} cases", file=sys.stderr)
+        if args.standin:
+            from benchmarks.standins import OpenAIStandIn, StandInConfig
+            ai = stack.enter_context(OpenAIStandIn(StandInConfig(latency_ms=50.0, seed=args.seed)))
+            os.environ.update(ai.env())
+
+        cassette = None
+        path, cassette_mode = next(((p, m) for p, m in ((args.record, "record"), (args.replay, "replay"),
+                                                         (args.auto, "auto")) if p), (None, None))
+        if path:
+            cassette = stack.enter_context(use_cassette(path, cassette_mode, match=args.match,
+                                                        replay_latency=args.replay_latency))
+        get_openai_client()  # the SDK import would otherwise land in the first cases' plan_s
+        report = run_evals(cases, args.workers)
+        report["config"] = {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()}
+        if cassette is not None:
+            report["cassette"] = cassette.stats()
+
+    _print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, default=str) + "\n")
+        print(f"# report written to {args.json}", file=sys.stderr)
+    return 1 if report["result_match"] < args.fail_under else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+# benchmarks/load_test.py
+# ----------------------------------------------------
+# Offline load test: N concurrent sessions run the page-03 flow
+#   plan (route_to_tool) -> execute_plan -> run_pandas_code (when the plan translates)
+# against the local PostgREST / OpenAI stand-ins (benchmarks/standins.py), with a
+# conversation per session so follow-ups refine the previous result. Sessions are
+# threads, like Streamlit script runs. Reports per-stage latency percentiles,
+# errors, scheduler queueing, retries/hedges and stand-in traffic.
+#
+#   python -m benchmarks.load_test --sessions 16 --queries 10
+#   python -m benchmarks.load_test --sessions 32 --openai-error-rate 0.05 --pg-max-rows 500 --no-cache
+# ----------------------------------------------------
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:  # allow `python benchmarks/load_test.py`
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.run_benchmarks import _parse_size
+from benchmarks.standins import OpenAIStandIn, PostgrestStandIn, StandInConfig
+from benchmarks.synthetic_data import DATASET, make_player_stats
+from llm_clients.metering import get_meter, metering_session
+from llm_clients.router import PLANNER_SYSTEM, get_tier_stats, route_to_tool
+from llm_clients.scheduler import get_scheduler
+from tools import snapshot_store
+from tools.conversation import ConversationState, build_planner_context
+from tools.pandas_compiler import run_pandas_code
+from tools.registry import acquire_plan_base, execute_plan, validate_plan
+from tools.resilience import get_latency_tracker
+from tools.specs import PLANNER_TOOL_SPECS
+from tools.table_cache import get_table_cache
+
+QUERY_MIX = [
+    "Top 10 Real Madrid forwards by points",
+    "Best 5 Betis defenders",
+    "Latest snapshot: top 5 goalkeepers",
+    "Most expensive Barcelona midfielders",
+    "Average points per team for midfielders",
+    "Compare average value per team",
+    "Top 20 players by points per match",
+    "Of those, only the top 3",
+    "From those, show Sevilla and Valencia players",
+]
+
+STAGES = ["plan", "execute_plan", "run_code", "query"]
+
+
+def _percentiles(xs: List[float]) -> Dict[str, Optional[float]]:
+    if not xs:
+        return {"n": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    xs = sorted(xs)
+    q = lambda p: round(xs[min(len(xs) - 1, int(p * len(xs)))] * 1000, 1)
+    return {"n": len(xs), "p50_ms": q(0.50), "p95_ms": q(0.95), "p99_ms": q(0.99), "max_ms": round(xs[-1] * 1000, 1)}
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: Dict[str, List[float]] = {s: [] for s in STAGES}
+        self.errors: Dict[str, Dict[str, int]] = {s: {} for s in STAGES}
+        self.engines: Dict[str, int] = {}
+
+    def ok(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.latency[stage].append(seconds)
+
+    def error(self, stage: str, exc: BaseException) -> None:
+        with self._lock:
+            c = self.errors[stage]
+            c[type(exc).__name__] = c.get(type(exc).__name__, 0) + 1
+
+    def engine(self, name: str) -> None:
+        with self._lock:
+            self.engines[name] = self.engines.get(name, 0) + 1
+
+
+def run_session(session_id: int, queries: List[str], rec: Recorder, think_s: float, no_cache: bool) -> None:
+    """One user: plan -> execute -> (run code), keeping the conversation like page 03 does."""
+    conversation = ConversationState(table=DATASET)
+    with metering_session(f"session-{session_id}"):
+        _run_queries(conversation, queries, rec, think_s, no_cache)
+
+
+def _run_queries(conversation: ConversationState, queries: List[str], rec: Recorder, think_s: float,
+                 no_cache: bool) -> None:
+    for text in queries:
+        if no_cache:
+            get_table_cache().cache_clear()
+        t_query = time.perf_counter()
+        stage = "plan"
+        try:
+            t0 = time.perf_counter()
+            call = route_to_tool(text, PLANNER_TOOL_SPECS, context=build_planner_context(DATASET, conversation),
+                                 force_tool_name="make_plan", system_override=PLANNER_SYSTEM, validate=validate_plan)
+            rec.ok(stage, time.perf_counter() - t0)
+
+            stage = "execute_plan"
+            t0 = time.perf_counter()
+            result = execute_plan(call.args, previous=conversation.last_result)
+            rec.ok(stage, time.perf_counter() - t0)
+
+            if isinstance(result, dict) and "python_code" in result:
+                stage = "run_code"
+                t0 = time.perf_counter()
+                refines = any(s.get("tool") == "use_previous_result" for s in call.args.get("steps", []))
+                df_in = conversation.previous_frame() if refines and conversation.has_previous \
+                    else acquire_plan_base(call.args).frame()
+                result, engine = run_pandas_code(result["python_code"], df_in)
+                rec.engine(engine)
+                rec.ok(stage, time.perf_counter() - t0)
+
+            conversation.remember(text, call.args, result)
+            rec.ok("query", time.perf_counter() - t_query)
+        except Exception as e:  # a failed query is a data point, not a crash
+            rec.error(stage, e)
+            rec.error("query", e)
+        if think_s:
+            time.sleep(think_s * random.uniform(0.5, 1.5))
+
+
+def run_load(sessions: int, queries: int, *, think_s: float, ramp_s: float, no_cache: bool, seed: int) -> Dict[str, Any]:
+    rec = Recorder()
+    rng = random.Random(seed)
+    plans = [[rng.choice(QUERY_MIX[:-2]) if q == 0 else rng.choice(QUERY_MIX) for q in range(queries)]
+             for _ in range(sessions)]
+    threads = []
+    t0 = time.perf_counter()
+    for i, qs in enumerate(plans):
+        th = threading.Thread(target=run_session, args=(i, qs, rec, think_s, no_cache), name=f"session-{i}")
+        th.start()
+        threads.append(th)
+        if ramp_s:
+            time.sleep(ramp_s / sessions)
+    for th in threads:
+        th.join()
+    wall = time.perf_counter() - t0
+    done = len(rec.latency["query"])
+    return {
+        "wall_s": round(wall, 3),
+        "queries_ok": done,
+        "queries_failed": sum(rec.errors["query"].values()),
+        "throughput_qps": round(done / wall, 3) if wall else None,
+        "stages": {s: {**_percentiles(rec.latency[s]), "errors": rec.errors[s]} for s in STAGES},
+        "engines": rec.engines,
+    }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"\n{report['queries_ok']} queries ok, {report['queries_failed']} failed in {report['wall_s']}s "
+          f"({report['throughput_qps']} q/s)")
+    print(f"{'stage':<14}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  errors")
+    for s, st in report["stages"].items():
+        fmt = lambda v: f"{v:>10.1f}" if v is not None else f"{'-':>10}"
+        print(f"{s:<14}{st['n']:>6}{fmt(st['p50_ms'])}{fmt(st['p95_ms'])}{fmt(st['p99_ms'])}{fmt(st['max_ms'])}  "
+              f"{st['errors'] or ''}")
+    for key in ("engines", "scheduler", "resilience", "tiers", "metering", "load_cache", "postgrest", "openai"):
+        if report.get(key):
+            print(f"{key}: {json.dumps(report[key], default=str)}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Offline load test of the page flows against local stand-ins.")
+    ap.add_argument("--sessions", type=int, default=8, help="concurrent sessions")
+    ap.add_argument("--queries", type=int, default=5, help="queries per session")
+    ap.add_argument("--think-ms", type=float, default=0.0, help="mean pause between a session's queries")
+    ap.add_argument("--ramp-s", type=float, default=0.0, help="spread session starts over this many seconds")
+    ap.add_argument("--rows", default="100k")
+    ap.add_argument("--no-cache", action="store_true", help="clear the table cache before every query")
+    ap.add_argument("--pg-max-rows", type=int, default=1000, help="PostgREST rows per response cap")
+    ap.add_argument("--pg-latency-ms", type=float, default=30.0)
+    ap.add_argument("--pg-tail-rate", type=float, default=0.0)
+    ap.add_argument("--pg-error-rate", type=float, default=0.0)
+    ap.add_argument("--openai-latency-ms", type=float, default=400.0)
+    ap.add_argument("--openai-ms-per-token", type=float, default=0.0, help="decode time per completion token")
+    ap.add_argument("--openai-tail-rate", type=float, default=0.0)
+    ap.add_argument("--openai-error-rate", type=float, default=0.0)
+    ap.add_argument("--openai-error-status", type=int, default=429)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", type=Path, help="write the report here")
+    args = ap.parse_args(argv)
+
+    df = make_player_stats(_parse_size(args.rows), seed=args.seed)
+    pg_cfg = StandInConfig(args.pg_latency_ms, jitter_ms=args.pg_latency_ms / 4, tail_rate=args.pg_tail_rate,
+                           tail_ms=args.pg_latency_ms * 20, error_rate=args.pg_error_rate, seed=args.seed)
+    ai_cfg = StandInConfig(args.openai_latency_ms, jitter_ms=args.openai_latency_ms / 4,
+                           tail_rate=args.openai_tail_rate, tail_ms=args.openai_latency_ms * 10,
+                           error_rate=args.openai_error_rate, error_status=args.openai_error_status, seed=args.seed)
+
+    with PostgrestStandIn({DATASET: df}, pg_cfg, max_rows=args.pg_max_rows) as pg, \
+            OpenAIStandIn(ai_cfg, ms_per_output_token=args.openai_ms_per_token) as ai, \
+            tempfile.TemporaryDirectory() as snapshot_root:
+        os.environ.update({**pg.env(), **ai.env()})
+        # keep the run's snapshot partitions out of data/snapshots
+        snapshot_store._STORES[DATASET] = snapshot_store.SnapshotStore(DATASET, root=Path(snapshot_root))
+
+        print(f"# {len(df):,} rows, {args.sessions} sessions x {args.queries} queries", file=sys.stderr)
+        report = run_load(args.sessions, args.queries, think_s=args.think_ms / 1000, ramp_s=args.ramp_s,
+                          no_cache=args.no_cache, seed=args.seed)
+
+        info = get_table_cache().cache_info()
+        report.update(
+            config=vars(args) | {"json": str(args.json) if args.json else None},
+            scheduler=get_scheduler().metrics(),
+            resilience=get_latency_tracker().stats(),
+            tiers=get_tier_stats(),
+            load_cache={"hits": info.hits, "misses": info.misses, "evictions": info.evictions},
+            metering={k: v for k, v in get_meter().stats().items() if k != "latency"},
+            postgrest=dict(pg.counters),
+            openai=dict(ai.counters),
+        )
+
+    _print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, default=str) + "\n")
+        print(f"# report written to {args.json}", file=sys.stderr)
+    return 0 if report["queries_ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+# benchmarks/run_benchmarks.py
+# ----------------------------------------------------
+# Micro/meso benchmarks for the query pipeline on synthetic data
+# (benchmarks/synthetic_data.py), no Supabase or OpenAI needed:
+#   apply_filters/<mix>     filter op mixes on the full table (column stats registered)
+#   build_dataframe         paged JSON -> DataFrame through the real loader (stub client)
+#   execute_plan/<plan>     planner IR end to end, loader tool stubbed in TOOL_REGISTRY
+#   run_code/<snippet>      generated pandas via the compiled engine and the sandbox
+#
+#   python -m benchmarks.run_benchmarks                          # 1k + 100k rows, compare to baseline
+#   python -m benchmarks.run_benchmarks --sizes 1k,1m,10m --only apply_filters
+#   python -m benchmarks.run_benchmarks --update-baseline        # accept current numbers
+# Results are written as JSON (--out); a case regresses when its median is more
+# than --threshold slower than the baseline (and by at least --min-delta-ms),
+# and its fastest run is slower by the same margin.
+# Exit code 1 when anything regressed.
+# ----------------------------------------------------
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:  # allow `python benchmarks/run_benchmarks.py`
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.synthetic_data import DATASET, make_player_stats, raw_columns, to_json_pages
+
+DEFAULT_SIZES = "1k,100k"
+DEFAULT_OUT = ROOT / "benchmarks" / "results.json"
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baseline.json"
+GROUPS = ["apply_filters", "build_dataframe", "execute_plan", "run_code"]
+
+Case = Tuple[str, Callable[[], Any]]
+
+
+# ---------- 1) Timing ----------
+def _parse_size(s: str) -> int:
+    s = s.strip().lower()
+    mult = {"k": 1_000, "m": 1_000_000}.get(s[-1:], 1)
+    return int(float(s[:-1] if mult > 1 else s) * mult)
+
+
+def time_case(fn: Callable[[], Any], repeat: int, warmup: int = 2) -> Dict[str, float]:
+    # warmup >= sandbox pool size, so every worker has attached the shared frame before timing
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return {
+        "median_ms": round(statistics.median(times), 3),
+        "min_ms": round(times[0], 3),
+        "p95_ms": round(times[min(len(times) - 1, int(round(0.95 * (len(times) - 1))))], 3),
+        "repeat": repeat,
+    }
+
+
+# ---------- 2) Cases ----------
+FILTER_MIXES: Dict[str, List[dict]] = {
+    "eq_categorical": [{"col": "team", "op": "==", "val": "Real Madrid"}],
+    "numeric_range": [{"col": "points", "op": ">=", "val": 40}, {"col": "value", "op": "<", "val": 5_000_000}],
+    "in_not_in": [{"col": "position", "op": "in", "val": ["Midfielder", "Forward"]},
+                  {"col": "status", "op": "not_in", "val": ["injured", "sanctioned"]}],
+    "contains": [{"col": "player_name", "op": "contains", "val": "00"}],
+    "mixed_selective": [{"col": "status", "op": "==", "val": "ok"},
+                        {"col": "points_per_match", "op": ">", "val": 5},
+                        {"col": "team", "op": "in", "val": ["Barcelona", "Girona"]},
+                        {"col": "as_of_date", "op": ">=", "val": "2025-12-01"}],
+}
+
+
+def filter_cases(df: pd.DataFrame) -> List[Case]:
+    from tools.column_stats import register_column_stats
+    from tools.dataframe_transformation_tools import apply_filters
+    register_column_stats(DATASET, df)  # as load_table() does; apply_filters orders by selectivity
+    return [(f"apply_filters/{name}", lambda f=filters: apply_filters(df, f))
+            for name, filters in FILTER_MIXES.items()]
+
+
+class _StubQuery:
+    def __init__(self, pages: List[List[dict]], page_size: int):
+        self._pages, self._page_size, self._range = pages, page_size, (0, 0)
+
+    def select(self, *_):
+        return self
+
+    def range(self, lo: int, hi: int):
+        self._range = (lo, hi)
+        return self
+
+    def execute(self):
+        i = self._range[0] // self._page_size
+        return type("Res", (), {"data": self._pages[i] if i < len(self._pages) else []})()
+
+
+class _StubSupabase:
+    def __init__(self, pages: List[List[dict]], page_size: int):
+        self._pages, self._page_size = pages, page_size
+
+    def table(self, _name: str) -> _StubQuery:
+        return _StubQuery(self._pages, self._page_size)
+
+
+def build_cases(df: pd.DataFrame, max_rows: int, page_size: int = 1000) -> List[Case]:
+    from tools import supabase_tools
+    if len(df) > max_rows:
+        return []
+    pages = to_json_pages(df[raw_columns()], page_size=page_size)
+    client = _StubSupabase(pages, page_size)
+
+    def run():
+        original = supabase_tools.get_supabase_client
+        supabase_tools.get_supabase_client = lambda: client
+        try:
+            out = supabase_tools._fetch_all_rows_from_supabase_raw(DATASET, page_size=page_size)
+        finally:
+            supabase_tools.get_supabase_client = original
+        return supabase_tools.materialize_derived_columns(out, DATASET)
+
+    return [("build_dataframe", run)]
+
+
+PLANS: Dict[str, dict] = {
+    "filter_top_k": {"steps": [
+        {"tool": "load_biwenger_player_stats", "args": {}},
+        {"tool": "filter_df", "args": {"filters": [{"col": "team", "op": "==", "val": "Real Madrid"},
+                                                   {"col": "points", "op": ">", "val": 30}]}},
+        {"tool": "top_k", "args": {"col": "points", "k": 10}},
+    ]},
+    "latest_select_sort": {"steps": [
+        {"tool": "load_biwenger_player_stats", "args": {"snapshot": "latest"}},
+        {"tool": "filter_df", "args": {"filters": [{"col": "position", "op": "in", "val": ["Defender", "Goalkeeper"]}]}},
+        {"tool": "select_columns", "args": {"columns": ["player_name", "team", "value", "points"]}},
+        {"tool": "sort_df", "args": {"by": ["value"], "ascending": False}},
+    ]},
+    "aggregate_by_team": {"steps": [
+        {"tool": "load_biwenger_player_stats", "args": {}},
+        {"tool": "filter_df", "args": {"filters": [{"col": "as_of_date", "op": ">=", "val": "2025-10-01"}]}},
+        {"tool": "aggregate_df", "args": {"group_by": ["team"], "metrics": [
+            {"col": "points", "agg": "mean"}, {"col": "value", "agg": "max"}, {"col": "player_name", "agg": "nunique"}]}},
+    ]},
+}
+
+
+def plan_cases(df: pd.DataFrame, snapshot_root: Path) -> List[Case]:
+    from tools import snapshot_store
+    from tools.registry import TOOL_REGISTRY, execute_plan
+
+    latest = df.loc[df["as_of_date"] == df["as_of_date"].max()]
+
+    def load_stub(snapshot: Optional[str] = None) -> pd.DataFrame:
+        return latest if snapshot == "latest" else df
+
+    TOOL_REGISTRY.register("load_biwenger_player_stats", lambda: load_stub)
+    # an empty store in a temp dir: the optimizer keeps the (stubbed) loader as the source
+    snapshot_store._STORES[DATASET] = snapshot_store.SnapshotStore(DATASET, root=snapshot_root)
+    return [(f"execute_plan/{name}", lambda p=plan: execute_plan(p)) for name, plan in PLANS.items()]
+
+
+CODE_SNIPPETS: Dict[str, str] = {
+    # compiles to deterministic steps (tools.pandas_compiler)
+    "compiled_filter_sort": (
+        "df_out = df_in[(df_in['team'] == 'Betis') & (df_in['points'] > 20)]"
+        ".sort_values('points', ascending=False).head(20)"
+    ),
+    # groupby/transform is outside the compiler's subset -> sandbox worker
+    "sandbox_groupby": (
+        "g = df_in.groupby('team')['points'].mean().reset_index()\n"
+        "df_out = g.sort_values('points', ascending=False)"
+    ),
+}
+
+
+def code_cases(df: pd.DataFrame, sandbox: bool) -> List[Case]:
+    from tools.pandas_compiler import run_pandas_code
+    cases = []
+    for name, code in CODE_SNIPPETS.items():
+        if name.startswith("sandbox") and not sandbox:
+            continue
+        cases.append((f"run_code/{name}", lambda c=code: run_pandas_code(c, df)))
+    return cases
+
+
+# ---------- 3) Baseline comparison ----------
+def _meta() -> Dict[str, Any]:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        rev = None
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_rev": rev,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": f"{platform.system()} {platform.machine()} / {os.cpu_count()} cpus",
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float,
+            min_delta_ms: float) -> List[dict]:
+    """One row per case: status is regressed / improved / ok / new."""
+    rows = []
+    for key, cur in results.items():
+        base = baseline.get(key)
+        row = {"case": key, "median_ms": cur["median_ms"], "baseline_ms": None, "ratio": None, "status": "new"}
+        if base:
+            ratio = cur["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+            min_ratio = cur["min_ms"] / base["min_ms"] if base.get("min_ms") else ratio
+            delta = cur["median_ms"] - base["median_ms"]
+            row.update(baseline_ms=base["median_ms"], ratio=round(ratio, 3))
+            # the best run must be slower too, so one noisy repeat does not flag a case
+            if ratio > 1 + threshold and min_ratio > 1 + threshold and delta >= min_delta_ms:
+                row["status"] = "regressed"
+            elif ratio < 1 / (1 + threshold) and -delta >= min_delta_ms:
+                row["status"] = "improved"
+            else:
+                row["status"] = "ok"
+        rows.append(row)
+    return rows
+
+
+def _print_report(rows: List[dict]) -> None:
+    width = max(len(r["case"]) for r in rows)
+    print(f"{'case':<{width}}  {'median ms':>10}  {'baseline':>10}  {'ratio':>6}  status")
+    for r in rows:
+        base = f"{r['baseline_ms']:.2f}" if r["baseline_ms"] is not None else "-"
+        ratio = f"{r['ratio']:.2f}" if r["ratio"] is not None else "-"
+        print(f"{r['case']:<{width}}  {r['median_ms']:>10.2f}  {base:>10}  {ratio:>6}  {r['status']}")
+
+
+# ---------- 4) Runner ----------
+def run(sizes: List[int], groups: List[str], repeat: int, seed: int, json_max_rows: int,
+        sandbox: bool) -> Dict[str, dict]:
+    results: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as snapshot_root:
+        for n in sizes:
+            t0 = time.perf_counter()
+            df = make_player_stats(n, seed=seed, derived=True)
+            print(f"# {n:,} rows generated in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+
+            cases: List[Case] = []
+            if "apply_filters" in groups:
+                cases += filter_cases(df)
+            if "build_dataframe" in groups:
+                cases += build_cases(df, json_max_rows)
+            if "execute_plan" in groups:
+                cases += plan_cases(df, Path(snapshot_root))
+            if "run_code" in groups:
+                cases += code_cases(df, sandbox)
+
+            for name, fn in cases:
+                key = f"{name}@{n}"
+                results[key] = {"case": name, "rows": n, **time_case(fn, repeat)}
+                print(f"  {key:<45} {results[key]['median_ms']:>10.2f} ms", file=sys.stderr)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark the query pipeline on synthetic data.")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated row counts, e.g. 1k,100k,1m,10m")
+    ap.add_argument("--only", default=",".join(GROUPS), help=f"comma-separated groups: {','.join(GROUPS)}")
+    ap.add_argument("--repeat", type=int, default=7)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json-max-rows", type=int, default=1_000_000,
+                    help="skip build_dataframe above this size (the JSON pages alone need several GB at 10M)")
+    ap.add_argument("--no-sandbox", action="store_true", help="skip the sandbox code case")
+    ap.add_argument("--out", type=Path, default=DEFAULT_OUT)
+    ap.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    ap.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore regressions smaller than this")
+    ap.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    args = ap.parse_args(argv)
+
+    groups = [g.strip() for g in args.only.split(",") if g.strip()]
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        ap.error(f"unknown groups: {sorted(unknown)}")
+    sizes = [_parse_size(s) for s in args.sizes.split(",") if s.strip()]
+
+    results = run(sizes, groups, args.repeat, args.seed, args.json_max_rows, not args.no_sandbox)
+    payload = {"meta": {**_meta(), "sizes": sizes, "repeat": args.repeat, "seed": args.seed}, "results": results}
+
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(payload, indent=2) + "\n")
+    print(f"# results written to {args.out}", file=sys.stderr)
+
+    if args.update_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {"results": {}}
+        baseline["meta"] = payload["meta"]
+        baseline["results"].update(results)  # keep cases/sizes that were not run this time
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"# baseline updated: {args.baseline}", file=sys.stderr)
+        return 0
+
+    if not args.baseline.exists():
+        print(f"# no baseline at {args.baseline}; run with --update-baseline to create one", file=sys.stderr)
+        return 0
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("meta", {}).get("machine") != payload["meta"]["machine"]:
+        print(f"# note: baseline was recorded on {baseline.get('meta', {}).get('machine')}", file=sys.stderr)
+    rows = compare(results, baseline.get("results", {}), args.threshold, args.min_delta_ms)
+    _print_report(rows)
+    regressed = [r["case"] for r in rows if r["status"] == "regressed"]
+    if regressed:
+        print(f"\n{len(regressed)} regression(s): {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,499 @@
+# benchmarks/standins.py
+# ----------------------------------------------------
+# Local stand-ins for Supabase (PostgREST) and OpenAI (chat completions), so the
+# loader, router and translator can be exercised offline with the real SDKs and
+# HTTP stack. Both are stdlib HTTP servers on 127.0.0.1 with configurable latency,
+# tail latency, error rate and (PostgREST) max rows per response.
+#
+#   with PostgrestStandIn({"biwenger_player_stats": df}) as pg, OpenAIStandIn() as ai:
+#       os.environ.update(pg.env() | ai.env())       # SUPABASE_URL, OPENAI_BASE_URL, ...
+#
+#   python -m benchmarks.standins --rows 100k --pg-port 54321 --openai-port 54322
+#   (then start streamlit with the printed env vars)
+# ----------------------------------------------------
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+import pandas as pd
+
+from tools.schema_catalog import _SCHEMA_REGISTRY
+
+# create_client() only accepts JWT-shaped keys
+STANDIN_KEY = "standin.standin.standin"
+
+
+# ---------- 1) Shared behaviour ----------
+@dataclass
+class StandInConfig:
+    latency_ms: float = 20.0          # typical service time per request
+    jitter_ms: float = 5.0            # +/- uniform jitter
+    tail_rate: float = 0.0            # share of requests that take tail_ms instead (hedging/timeouts)
+    tail_ms: float = 1000.0
+    error_rate: float = 0.0           # share of requests answered with error_status
+    error_status: int = 503
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    def draw(self) -> Tuple[float, bool]:
+        """(delay in seconds, fail?) for one request."""
+        with self._lock:
+            if self._rng.random() < self.tail_rate:
+                ms = self.tail_ms
+            else:
+                ms = self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+            return max(ms, 0.0) / 1000, self._rng.random() < self.error_rate
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class _StandIn:
+    """Runs a handler class in a background thread; counts requests per outcome."""
+
+    handler: type
+
+    def __init__(self, config: Optional[StandInConfig] = None, port: int = 0):
+        self.config = config or StandInConfig()
+        self._port = port
+        self._server: Optional[_Server] = None
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {}
+
+    def count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    @property
+    def url(self) -> str:
+        if self._server is None:
+            raise RuntimeError("Stand-in is not running.")
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "_StandIn":
+        handler = type(self.handler.__name__, (self.handler,), {"standin": self})
+        self._server = _Server(("127.0.0.1", self._port), handler)
+        threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    standin: _StandIn
+    protocol_version = "HTTP/1.1"    # keep-alive, like the real services
+
+    def log_message(self, *args):  # quiet
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json",
+              headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate(self) -> bool:
+        """Sleep the simulated service time; answer with an injected error if drawn. True if handled."""
+        delay, fail = self.standin.config.draw()
+        time.sleep(delay)
+        if fail:
+            self.standin.count(f"error_{self.standin.config.error_status}")
+            self._send_error(self.standin.config.error_status)
+            return True
+        return False
+
+    def _send_error(self, status: int) -> None:
+        """Injected error response; services override it with their own error shape."""
+        self._send(status, json.dumps({"message": f"Stand-in error {status}", "code": str(status)}).encode())
+
+
+# ---------- 2) PostgREST ----------
+# GET /rest/v1/<table>?select=a,b&<col>=<op>.<val>&order=col.desc&offset=&limit=
+# (or a `Range: a-b` header). Responses are capped at max_rows, like db-max-rows.
+_PG_OPS: Dict[str, Callable[[pd.Series, Any], pd.Series]] = {
+    "eq": lambda s, v: s == v, "neq": lambda s, v: s != v,
+    "gt": lambda s, v: s > v, "gte": lambda s, v: s >= v,
+    "lt": lambda s, v: s < v, "lte": lambda s, v: s <= v,
+    "in": lambda s, v: s.isin(v),
+}
+_RESERVED = {"select", "order", "offset", "limit"}
+
+
+def _coerce(s: pd.Series, raw: str) -> Any:
+    if pd.api.types.is_numeric_dtype(s):
+        try:
+            return float(raw)
+        except ValueError:
+            return raw
+    return raw
+
+
+def _pg_mask(df: pd.DataFrame, col: str, expr: str) -> pd.Series:
+    if col not in df.columns:
+        raise KeyError(col)
+    negate = expr.startswith("not.")
+    op, _, raw = (expr[4:] if negate else expr).partition(".")
+    s = df[col]
+    if op == "in":
+        items = [x.strip().strip('"') for x in raw.strip("()").split(",") if x.strip()]
+        mask = s.isin([_coerce(s, x) for x in items])
+    elif op in ("like", "ilike"):
+        pattern = "^" + re.escape(raw).replace(r"\*", ".*").replace("%", ".*") + "$"
+        mask = s.astype(str).str.match(pattern, case=op == "like")
+    elif op == "is":
+        mask = s.isna() if raw == "null" else s.astype(str).str.lower() == raw
+    elif op in _PG_OPS:
+        mask = _PG_OPS[op](s, _coerce(s, raw))
+    else:
+        raise ValueError(op)
+    return ~mask if negate else mask
+
+
+class _PostgrestHandler(_Handler):
+    standin: "PostgrestStandIn"
+
+    def _send_error(self, status: int) -> None:
+        if status == 503:  # PostgREST lost its database connection
+            body = {"code": "PGRST000", "message": "Could not connect with the database", "details": None, "hint": None}
+            self._send(status, json.dumps(body).encode())
+        else:              # gateway-style error: not JSON
+            self._send(status, f"upstream error {status}".encode(), "text/plain")
+
+    def _pg_error(self, status: int, code: str, message: str) -> None:
+        self.standin.count(f"error_{code}")
+        body = {"code": code, "message": message, "details": None, "hint": None}
+        self._send(status, json.dumps(body).encode())
+
+    def do_GET(self):
+        self.standin.count("requests")
+        parts = urlsplit(self.path)
+        m = re.fullmatch(r"/rest/v1/([A-Za-z0-9_]+)", parts.path)
+        if not m:
+            return self._pg_error(404, "PGRST125", f"Invalid path {parts.path}")
+        table = m.group(1)
+        if self._simulate():
+            return
+        df = self.standin.tables.get(table)
+        if df is None:
+            return self._pg_error(404, "42P01", f'relation "public.{table}" does not exist')
+
+        params = parse_qsl(parts.query, keep_blank_values=True)
+        try:
+            mask = None
+            for col, expr in params:
+                if col in _RESERVED:
+                    continue
+                m_ = _pg_mask(df, col, unquote(expr))
+                mask = m_ if mask is None else mask & m_
+            out = df if mask is None else df.loc[mask]
+
+            q = dict(params)
+            if q.get("order"):
+                by, asc = [], []
+                for term in q["order"].split(","):
+                    col, _, direction = term.partition(".")
+                    by.append(col)
+                    asc.append(not direction.startswith("desc"))
+                out = out.sort_values(by, ascending=asc, kind="stable")
+            select = q.get("select", "*")
+            if select and select != "*":
+                out = out[[c.strip() for c in select.split(",")]]
+        except KeyError as e:
+            return self._pg_error(400, "42703", f"column {e.args[0]} does not exist")
+        except ValueError as e:
+            return self._pg_error(400, "PGRST100", f"unsupported operator {e}")
+
+        lo, limit = int(q.get("offset", 0)), int(q["limit"]) if "limit" in q else None
+        rng = re.fullmatch(r"(\d+)-(\d*)", self.headers.get("Range", "") or "")
+        if rng:
+            lo = int(rng.group(1))
+            limit = int(rng.group(2)) - lo + 1 if rng.group(2) else None
+        limit = self.standin.max_rows if limit is None else min(limit, self.standin.max_rows)
+        page = out.iloc[lo:lo + limit]
+        self.standin.count("rows_served", len(page))
+        total = len(out) if "count=exact" in (self.headers.get("Prefer") or "") else "*"
+        end = f"{lo}-{lo + len(page) - 1}" if len(page) else "*"
+        self._send(200, page.to_json(orient="records", date_format="iso").encode(),
+                   headers={"Content-Range": f"{end}/{total}"})
+
+
+class PostgrestStandIn(_StandIn):
+    """PostgREST (Supabase REST) stand-in serving in-memory DataFrames as tables."""
+
+    handler = _PostgrestHandler
+
+    def __init__(self, tables: Dict[str, pd.DataFrame], config: Optional[StandInConfig] = None,
+                 *, max_rows: int = 1000, port: int = 0):
+        super().__init__(config, port)
+        self.tables = dict(tables)
+        self.max_rows = max_rows
+
+    def env(self) -> Dict[str, str]:
+        return {"SUPABASE_URL": self.url, "SUPABASE_ANON_KEY": STANDIN_KEY}
+
+
+# ---------- 3) OpenAI chat completions ----------
+# POST /v1/chat/completions (tool calls and plain content) and GET /v1/models/<id>.
+# Answers come from a responder(request) -> {"content": ...} | {"tool_call": (name, args)};
+# the default one plans/translates with keyword heuristics over the schema's value_hints.
+Responder = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+_POSITION_WORDS = {"goalkeeper": "Goalkeeper", "keeper": "Goalkeeper", "defender": "Defender",
+                   "midfielder": "Midfielder", "forward": "Forward", "striker": "Forward"}
+_TEAM_ALIASES = {"madrid": "Real Madrid", "atleti": "Atlético", "barça": "Barcelona", "barca": "Barcelona",
+                 "sociedad": "Real Sociedad", "rayo": "Rayo Vallecano", "oviedo": "Real Oviedo"}
+_TRANSLATE_WORDS = ("average", "per team", "group", "compare", "trend", "correlat")
+_FOLLOW_UP_WORDS = ("those", "them", "these", "of that")
+
+
+def _user_text(request: Dict[str, Any]) -> str:
+    msgs = [m for m in request.get("messages", []) if m.get("role") == "user"]
+    text = str(msgs[-1].get("content") or "") if msgs else ""
+    m = re.fullmatch(r'User: "(.*)"', text, re.S)                   # router request
+    if m:
+        return m.group(1)
+    m = re.search(r"USER REQUEST:\s*(.*)\Z", text, re.S)              # EnglishToPandas prompt
+    return m.group(1).strip() if m else text
+
+
+def _entities(text: str) -> Tuple[List[str], List[str], Optional[int]]:
+    t = text.lower()
+    teams = _SCHEMA_REGISTRY["biwenger_player_stats"]["value_hints"]["team"]["values"]
+    found = [name for name in teams if name.lower() in t]
+    found += [v for k, v in _TEAM_ALIASES.items() if k in t and v not in found and not any(v in f for f in found)]
+    positions = sorted({v for k, v in _POSITION_WORDS.items() if re.search(rf"\b{k}s?\b", t)})
+    k = re.search(r"\b(?:top|best|first)\s+(\d+)", t)
+    return found, positions, int(k.group(1)) if k else None
+
+
+def _sort_col(text: str) -> str:
+    t = text.lower()
+    if "value" in t or "expensive" in t:
+        return "value"
+    if "per match" in t:
+        return "points_per_match"
+    return "points"
+
+
+def heuristic_plan(text: str, has_previous: bool = False) -> Dict[str, Any]:
+    """A make_plan answer from keywords: teams/positions -> filters, 'top N' -> top_k."""
+    teams, positions, k = _entities(text)
+    t = text.lower()
+    follow_up = has_previous and any(w in t for w in _FOLLOW_UP_WORDS)
+    steps: List[Dict[str, Any]] = []
+    if follow_up:
+        steps.append({"tool": "use_previous_result", "args": {}})
+    else:
+        latest = any(w in t for w in ("latest", "current", "today", "now"))
+        steps.append({"tool": "load_biwenger_player_stats", "args": {"snapshot": "latest"} if latest else {}})
+    filters = []
+    if teams:
+        filters.append({"col": "team", "op": "==" if len(teams) == 1 else "in",
+                        "val": teams[0] if len(teams) == 1 else teams})
+    if positions:
+        filters.append({"col": "position", "op": "==" if len(positions) == 1 else "in",
+                        "val": positions[0] if len(positions) == 1 else positions})
+    if filters:
+        steps.append({"tool": "filter_df", "args": {"filters": filters}})
+    if any(w in t for w in _TRANSLATE_WORDS):
+        steps.append({"tool": "translate_to_pandas", "args": {"query": text}})
+    else:
+        steps.append({"tool": "top_k", "args": {"col": _sort_col(text), "k": k or 10,
+                                                "ascending": "cheap" in t or "lowest" in t}})
+    return {
+        "steps": steps,
+        "why": "Keyword plan from the stand-in planner.",
+        "assumptions": [] if (teams or positions) else ["No team or position recognised."],
+        "confidence": 0.9 if (teams or positions or k) else 0.5,
+    }
+
+
+def heuristic_code(text: str) -> str:
+    """A pandas snippet: group-bys go to the sandbox, plain filters compile."""
+    teams, positions, k = _entities(text)
+    col = _sort_col(text)
+    lines = ["import pandas as pd", "df = df_in.copy()"]
+    if teams:
+        lines.append(f"df = df[df['team'].isin({teams!r})]")
+    if positions:
+        lines.append(f"df = df[df['position'].isin({positions!r})]")
+    if "team" in text.lower() and any(w in text.lower() for w in ("average", "per team", "group")):
+        lines.append(f"df = df.groupby('team', as_index=False)['{col}'].mean()")
+    lines.append(f"df = df.sort_values('{col}', ascending=False).head({k or 20})")
+    lines.append("df_out = df")
+    return "\n".join(lines)
+
+
+def heuristic_responder(request: Dict[str, Any]) -> Dict[str, Any]:
+    tools = [t.get("function", t).get("name") for t in request.get("tools") or []]
+    text = _user_text(request)
+    if "make_plan" in tools:
+        context = " ".join(str(m.get("content") or "") for m in request.get("messages", []) if m.get("role") == "system")
+        return {"tool_call": ("make_plan", heuristic_plan(text, has_previous="previous_result" in context))}
+    return {"content": heuristic_code(text)}
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class _OpenAIHandler(_Handler):
+    standin: "OpenAIStandIn"
+
+    def _send_error(self, status: int) -> None:
+        kind = {429: ("rate_limit_exceeded", "requests")}.get(status, ("server_error", "server_error"))
+        body = {"error": {"message": f"Stand-in error {status}", "type": kind[1], "param": None, "code": kind[0]}}
+        self._send(status, json.dumps(body).encode())
+
+    def _read_json(self) -> Dict[str, Any]:
+        n = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(n) or b"{}")
+
+    def do_GET(self):
+        self.standin.count("requests")
+        m = re.fullmatch(r"/v1/models/(.+)", urlsplit(self.path).path)
+        if not m:
+            return self._send(404, b'{"error": {"message": "not found"}}')
+        if self._simulate():
+            return
+        self._send(200, json.dumps({"id": m.group(1), "object": "model", "created": 0,
+                                    "owned_by": "standin"}).encode())
+
+    def do_POST(self):
+        self.standin.count("requests")
+        if urlsplit(self.path).path != "/v1/chat/completions":
+            return self._send(404, b'{"error": {"message": "not found"}}')
+        request = self._read_json()
+        t0 = time.monotonic()
+        answer = self.standin.responder(request)
+        message: Dict[str, Any] = {"role": "assistant", "content": None}
+        if "tool_call" in answer:
+            name, args = answer["tool_call"]
+            arguments = json.dumps(args)
+            message["tool_calls"] = [{"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                                      "function": {"name": name, "arguments": arguments}}]
+            finish, out_text = "tool_calls", arguments
+        else:
+            message["content"] = out_text = answer.get("content", "")
+            finish = "stop"
+        prompt, cached = self.standin.prompt_tokens(request)
+        completion = _tokens(out_text)
+
+        # service time: base latency (+ tail / errors) plus decoding time per output token
+        if self._simulate():
+            return
+        remaining = completion * self.standin.ms_per_output_token / 1000 - (time.monotonic() - t0)
+        if remaining > 0:
+            time.sleep(remaining)
+        self.standin.count("completions")
+        body = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "standin"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish, "logprobs": None}],
+            "usage": {"prompt_tokens": prompt, "completion_tokens": completion,
+                      "total_tokens": prompt + completion,
+                      "prompt_tokens_details": {"cached_tokens": cached}},
+        }
+        self._send(200, json.dumps(body).encode())
+
+
+class OpenAIStandIn(_StandIn):
+    """
+    Chat-completions stand-in. Usage mimics prompt caching: a repeated prefix
+    (system messages + tools) of >= 1024 tokens is reported as cached in 128-token blocks.
+    """
+
+    handler = _OpenAIHandler
+
+    def __init__(self, config: Optional[StandInConfig] = None, *, responder: Responder = heuristic_responder,
+                 ms_per_output_token: float = 0.0, port: int = 0):
+        super().__init__(config, port)
+        self.responder = responder
+        self.ms_per_output_token = ms_per_output_token
+        self._prefixes: set = set()
+
+    def prompt_tokens(self, request: Dict[str, Any]) -> Tuple[int, int]:
+        msgs = request.get("messages", [])
+        prefix = json.dumps([m for m in msgs if m.get("role") == "system"], sort_keys=True) + \
+            json.dumps(request.get("tools") or [], sort_keys=True)
+        total = _tokens(json.dumps(msgs) + json.dumps(request.get("tools") or []))
+        prefix_tokens = _tokens(prefix)
+        key = hashlib.sha1(prefix.encode()).hexdigest()
+        with self._lock:
+            seen = key in self._prefixes
+            self._prefixes.add(key)
+        cached = (prefix_tokens // 128) * 128 if seen and prefix_tokens >= 1024 else 0
+        return total, min(cached, total)
+
+    def env(self, fast_model: str = "standin-mini", strong_model: str = "standin-large") -> Dict[str, str]:
+        return {"OPENAI_BASE_URL": f"{self.url}/v1", "OPENAI_API_KEY": "sk-standin",
+                "OPENAI_MODEL": fast_model, "OPENAI_FAST_MODEL": fast_model, "OPENAI_STRONG_MODEL": strong_model}
+
+
+# ---------- 4) CLI: serve both for a local app run ----------
+def main(argv: Optional[List[str]] = None) -> int:
+    from benchmarks.run_benchmarks import _parse_size
+    from benchmarks.synthetic_data import DATASET, make_player_stats
+
+    ap = argparse.ArgumentParser(description="Serve local PostgREST and OpenAI stand-ins.")
+    ap.add_argument("--rows", default="100k", help="synthetic biwenger_player_stats rows")
+    ap.add_argument("--pg-port", type=int, default=54321)
+    ap.add_argument("--openai-port", type=int, default=54322)
+    ap.add_argument("--max-rows", type=int, default=1000, help="PostgREST rows per response cap")
+    ap.add_argument("--pg-latency-ms", type=float, default=30.0)
+    ap.add_argument("--openai-latency-ms", type=float, default=400.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    args = ap.parse_args(argv)
+
+    df = make_player_stats(_parse_size(args.rows))
+    pg = PostgrestStandIn({DATASET: df}, StandInConfig(args.pg_latency_ms, error_rate=args.error_rate),
+                          max_rows=args.max_rows, port=args.pg_port).start()
+    ai = OpenAIStandIn(StandInConfig(args.openai_latency_ms, jitter_ms=args.openai_latency_ms / 4,
+                                     error_rate=args.error_rate), port=args.openai_port).start()
+    print(f"# {len(df):,} rows in {DATASET}; point the app at the stand-ins with:")
+    for k, v in {**pg.env(), **ai.env()}.items():
+        print(f"export {k}={v}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pg.stop()
+        ai.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
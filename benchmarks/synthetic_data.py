@@ -0,0 +1,149 @@
+# benchmarks/synthetic_data.py
+# ----------------------------------------------------
+# Synthetic `biwenger_player_stats` that follows schema_catalog._SCHEMA_REGISTRY:
+# same columns and wire types as the Supabase rows (ints, floats, ISO strings),
+# teams / positions / season from value_hints, one row per player per daily
+# as_of_date snapshot. Vectorized with numpy, so 10M rows build in seconds.
+#   df = make_player_stats(100_000, seed=0)
+#   pages = to_json_pages(df, page_size=1000)     # what the PostgREST pages look like
+# ----------------------------------------------------
+from __future__ import annotations
+import math
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from tools.dataframe_transformation_tools import materialize_derived_columns
+from tools.schema_catalog import _SCHEMA_REGISTRY
+
+DATASET = "biwenger_player_stats"
+SEASON_START = date(2025, 8, 15)
+MAX_SNAPSHOTS = 365          # one season of daily snapshots; beyond that, add players
+MIN_PLAYERS = 600            # roughly a LaLiga fantasy player pool
+CHUNK_ROWS = 500_000
+
+_POSITION_WEIGHTS = {"Goalkeeper": 0.10, "Defender": 0.35, "Midfielder": 0.35, "Forward": 0.20}
+_STATUSES = ["ok", "injured", "doubt", "sanctioned"]
+_STATUS_WEIGHTS = [0.85, 0.08, 0.04, 0.03]
+_STATUS_DETAILS = {"injured": "Muscle injury", "doubt": "Knock, late fitness test",
+                   "sanctioned": "Suspended (yellow cards)"}
+
+
+def _hint_values(column: str) -> List[str]:
+    return list(_SCHEMA_REGISTRY[DATASET]["value_hints"][column]["values"])
+
+
+def raw_columns() -> List[str]:
+    """Column names as stored in Supabase (no derived columns)."""
+    return [c["name"] for c in _SCHEMA_REGISTRY[DATASET]["columns"]]
+
+
+def shape_for(n_rows: int) -> tuple[int, int]:
+    """(players, snapshots) for a target size: grow snapshots up to a season, then players."""
+    players = max(min(MIN_PLAYERS, n_rows), math.ceil(n_rows / MAX_SNAPSHOTS))
+    return players, math.ceil(n_rows / players)
+
+
+def _player_attributes(rng: np.random.Generator, n_players: int) -> Dict[str, np.ndarray]:
+    """Per-player attributes, fixed across snapshots."""
+    teams = np.array(_hint_values("team"), dtype=object)
+    positions = np.array(list(_POSITION_WEIGHTS), dtype=object)
+    return {
+        "name": np.array([f"Player {i:05d}" for i in range(n_players)], dtype=object),
+        "team": teams[rng.integers(0, len(teams), n_players)],
+        "position": positions[rng.choice(len(positions), n_players, p=list(_POSITION_WEIGHTS.values()))],
+        "base_value": np.exp(rng.normal(14.5, 1.1, n_players)).clip(150_000, 60_000_000),
+        "rate": rng.gamma(2.0, 2.0, n_players),         # points per match played
+        "play": rng.beta(4, 2, n_players),               # share of matchdays played
+        "market": rng.gamma(1.2, 4.0, n_players),        # market popularity
+    }
+
+
+def _rows(rng: np.random.Generator, lo: int, hi: int, players: Dict[str, np.ndarray],
+          dates: np.ndarray, created: np.ndarray) -> pd.DataFrame:
+    """Rows [lo, hi) of the snapshot-major table."""
+    n, n_players = hi - lo, len(players["name"])
+    idx = np.arange(lo, hi)
+    d_idx = idx // n_players
+    pl = idx % n_players
+
+    matchdays = np.minimum(d_idx // 7, 38)
+    matches = np.floor(matchdays * players["play"][pl]).astype(np.int64)
+    points = np.round(matches * players["rate"][pl] + rng.normal(0, 1.5, n) * (matches > 0)).astype(np.int64)
+    points = np.maximum(points, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        average = np.where(matches > 0, np.round(points / matches, 2), 0.0)
+
+    base = players["base_value"][pl]
+    trend = (1 + 0.004 * points + rng.normal(0, 0.03, n)).clip(0.5, None)
+    value = np.round(base * trend, -4).astype(np.int64)
+    status = rng.choice(len(_STATUSES), n, p=_STATUS_WEIGHTS)
+    market = players["market"][pl]
+
+    cols: Dict[str, Any] = {
+        "id": idx + 1,
+        "created_at": created[d_idx],
+        "player_name": players["name"][pl],
+        "team": players["team"][pl],
+        "position": players["position"][pl],
+        "status": np.array(_STATUSES, dtype=object)[status],
+        "status_detail": np.array([_STATUS_DETAILS.get(x) for x in _STATUSES], dtype=object)[status],
+        "points": points,
+        "value": value,
+        "min_value": np.minimum(value, np.round(base * 0.8, -4).astype(np.int64)),
+        "max_value": np.maximum(value, np.round(base * 1.3, -4).astype(np.int64)),
+        "matches_played": matches,
+        "average": average,
+        "market_purchases_pct": np.round((market * rng.uniform(0.5, 1.5, n)).clip(0, 100), 2),
+        "market_sales_pct": np.round((market * rng.uniform(0.3, 1.2, n)).clip(0, 100), 2),
+        "market_usage_pct": np.round((players["play"][pl] * 60 + rng.normal(0, 5, n)).clip(0, 100), 2),
+        "season": np.full(n, _hint_values("season")[-1], dtype=object),
+        "as_of_date": dates[d_idx],
+    }
+    names = raw_columns()
+    missing = set(names) - set(cols)
+    if missing:  # keep the generator honest when the registry grows
+        raise ValueError(f"Generator does not produce registry columns: {sorted(missing)}")
+    return pd.DataFrame({name: cols[name] for name in names})
+
+
+def make_player_stats(n_rows: int, *, seed: int = 0, start: date = SEASON_START,
+                      derived: bool = False, chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    """
+    `n_rows` synthetic rows with the registry's columns, in snapshot order.
+    Built in chunks of `chunk_rows` so temporaries stay small next to the result.
+    derived=True also materializes the derived columns, like load_table() does.
+    """
+    if n_rows < 1:
+        raise ValueError("n_rows must be >= 1")
+    rng = np.random.default_rng(seed)
+    n_players, n_dates = shape_for(n_rows)
+    players = _player_attributes(rng, n_players)
+    dates = np.array([(start + timedelta(days=d)).isoformat() for d in range(n_dates)], dtype=object)
+    created = np.array([f"{s}T06:00:00+00:00" for s in dates], dtype=object)
+
+    # fill preallocated columns chunk by chunk: no concat, so no second copy of the table
+    cols: Dict[str, np.ndarray] = {}
+    for lo in range(0, n_rows, chunk_rows):
+        hi = min(lo + chunk_rows, n_rows)
+        chunk = _rows(rng, lo, hi, players, dates, created)
+        if derived:
+            chunk = materialize_derived_columns(chunk, DATASET)
+        for name, col in chunk.items():
+            arr = col.to_numpy()
+            if name not in cols:
+                cols[name] = np.empty(n_rows, dtype=arr.dtype)
+            elif cols[name].dtype != arr.dtype:  # e.g. an int column that got NaN in a later chunk
+                cols[name] = cols[name].astype(np.result_type(cols[name].dtype, arr.dtype))
+            cols[name][lo:hi] = arr
+    return pd.DataFrame(cols, copy=False)
+
+
+def to_json_pages(df: pd.DataFrame, page_size: int = 1000, limit: Optional[int] = None) -> List[List[dict]]:
+    """Split into PostgREST-style pages of JSON rows (None for missing values)."""
+    if limit is not None:
+        df = df.iloc[:limit]
+    records = df.astype(object).where(df.notna(), None).to_dict("records")
+    return [records[i:i + page_size] for i in range(0, len(records), page_size)]
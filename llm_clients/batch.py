@@ -0,0 +1,59 @@
+# llm_clients/batch.py
+from __future__ import annotations
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, List, Optional, Sequence
+
+DEFAULT_CONCURRENCY = 8
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one batch item: either `result` or `error` is set."""
+    index: int
+    item: Any
+    result: Any = None
+    error: Optional[str] = None
+    latency_s: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def arun_batch(
+    items: Sequence[Any],
+    fn: Callable[[Any], Awaitable[Any]],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> List[BatchResult]:
+    """
+    Run `await fn(item)` for every item with at most `concurrency` in flight.
+    Never raises for a single item: failures are reported per item.
+    Results keep the input order.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be >= 1")
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _one(i: int, item: Any) -> BatchResult:
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                res = await fn(item)
+                return BatchResult(i, item, result=res, latency_s=time.perf_counter() - t0)
+            except Exception as e:
+                return BatchResult(i, item, error=f"{type(e).__name__}: {e}", latency_s=time.perf_counter() - t0)
+
+    return list(await asyncio.gather(*(_one(i, it) for i, it in enumerate(items))))
+
+
+def run_blocking(coro: Awaitable[Any]) -> Any:
+    """Run a batch coroutine to completion from synchronous code (scripts, offline jobs)."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    coro.close()
+    raise RuntimeError("Blocking batch call inside a running event loop; await the async variant instead.")
@@ -0,0 +1,183 @@
+# llm_clients/cassette.py
+# ----------------------------------------------------
+# Record/replay of chat.completions calls (route_to_tool, generate_code and their
+# async/batch variants all go through llm_clients.scheduler.scheduled_create).
+#   record: call the API and append {request, response, latency} to a JSONL cassette
+#   replay: serve responses from the cassette, no network; a miss raises CassetteMiss
+#   auto:   replay hits, record misses
+# Activate process-wide with LLM_CASSETTE=<path> (+ LLM_CASSETTE_MODE, LLM_CASSETTE_MATCH)
+# or `with use_cassette(path, mode="replay"): ...`.
+# Requests match exactly (model, messages, tools, tool_choice) or, with match="user",
+# on call name + model + tools + the last user message only (system prompt changes replay).
+# In replay mode the OpenAI config (models/tiers) comes from the cassette, so no
+# credentials are needed.
+# ----------------------------------------------------
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+MODES = ("record", "replay", "auto")
+MATCHES = ("exact", "user")
+
+
+class CassetteMiss(LookupError):
+    """Replay found no recorded response for a request."""
+
+
+def _to_obj(value: Any) -> Any:
+    """JSON -> attribute access, the shape the router / translator read from SDK responses."""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _to_obj(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_to_obj(v) for v in value]
+    return value
+
+
+def _to_json(value: Any) -> Any:
+    if hasattr(value, "model_dump"):  # openai SDK (pydantic) objects
+        return value.model_dump(mode="json")
+    if isinstance(value, SimpleNamespace):
+        return {k: _to_json(v) for k, v in vars(value).items()}
+    if isinstance(value, list):
+        return [_to_json(v) for v in value]
+    return value
+
+
+def _last_user_message(request: Dict[str, Any]) -> str:
+    users = [m for m in request.get("messages", []) if m.get("role") == "user"]
+    return str(users[-1].get("content") or "") if users else ""
+
+
+class Cassette:
+    def __init__(self, path: str | Path, mode: str = "replay", *, match: str = "exact",
+                 replay_latency: bool = False):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}' (expected one of {MODES})")
+        if match not in MATCHES:
+            raise ValueError(f"Unknown cassette match '{match}' (expected one of {MATCHES})")
+        self.path = Path(path)
+        self.mode, self.match, self.replay_latency = mode, match, replay_latency
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self.meta: Dict[str, Any] = {}
+        self.counters = {"hits": 0, "misses": 0, "recorded": 0}
+        self._load()
+
+    # --- storage ---
+    def _load(self) -> None:
+        if not self.path.exists():
+            if self.mode == "replay":
+                raise FileNotFoundError(f"Missing cassette: {self.path}")
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                if rec.get("type") == "meta":
+                    self.meta = rec
+                else:
+                    self._entries[self.key(rec["call"], rec["request"])] = rec  # last recording wins
+
+    def _append(self, rec: Dict[str, Any]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+
+    # --- matching ---
+    def key(self, call: str, request: Dict[str, Any]) -> str:
+        if self.match == "user":
+            tools = [t.get("function", t).get("name") for t in request.get("tools") or []]
+            basis: Any = [call.split(":")[0], request.get("model"), tools, _last_user_message(request)]
+        else:
+            basis = [call.split(":")[0], request]
+        return hashlib.sha256(json.dumps(basis, sort_keys=True, default=str).encode()).hexdigest()[:24]
+
+    def lookup(self, call: str, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._entries.get(self.key(call, request))
+
+    @property
+    def models(self) -> Optional[Dict[str, str]]:
+        """The OpenAI model config the cassette was recorded with."""
+        return self.meta.get("openai")
+
+    # --- replay / record ---
+    def replay(self, call: str, request: Dict[str, Any]) -> Tuple[Any, float]:
+        """(response, recorded latency in seconds); CassetteMiss if not recorded."""
+        rec = self.lookup(call, request)
+        with self._lock:
+            self.counters["hits" if rec else "misses"] += 1
+        if rec is None:
+            preview = _last_user_message(request)[:80]
+            raise CassetteMiss(f"No recording for {call} ({request.get('model')}): {preview!r} in {self.path}")
+        return _to_obj(rec["response"]), float(rec.get("latency_s") or 0.0)
+
+    def record(self, call: str, request: Dict[str, Any], response: Any, latency_s: float) -> None:
+        rec = {"type": "call", "call": call, "key": self.key(call, request), "recorded_at": time.time(),
+               "latency_s": round(latency_s, 4), "request": request, "response": _to_json(response)}
+        with self._lock:
+            if not self.meta:
+                from llm_clients.openai_client import _load_openai_config  # config of the recording run
+                cfg = _load_openai_config()
+                self.meta = {"type": "meta", "created_at": time.time(),
+                             "openai": {k: cfg[k] for k in ("model", "fast_model", "strong_model")}}
+                self._append(self.meta)
+            self._entries[rec["key"]] = rec
+            self._append(rec)
+            self.counters["recorded"] += 1
+
+    def serves(self, call: str, request: Dict[str, Any]) -> bool:
+        """True if this request is answered from the cassette (replay, or an auto-mode hit)."""
+        if self.mode == "replay":
+            return True
+        return self.mode == "auto" and self.lookup(call, request) is not None
+
+    def records(self) -> bool:
+        return self.mode in ("record", "auto")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"path": str(self.path), "mode": self.mode, "match": self.match,
+                    "entries": len(self._entries), **self.counters}
+
+
+# ---------- Process-wide active cassette ----------
+_ACTIVE: Optional[Cassette] = None
+_ENV_LOADED = False
+_ACTIVE_LOCK = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """The active cassette (LLM_CASSETTE env var on first use, or use_cassette()), else None."""
+    global _ACTIVE, _ENV_LOADED
+    with _ACTIVE_LOCK:
+        if not _ENV_LOADED:
+            _ENV_LOADED = True
+            path = os.getenv("LLM_CASSETTE")
+            if path and _ACTIVE is None:
+                _ACTIVE = Cassette(path, os.getenv("LLM_CASSETTE_MODE", "replay"),
+                                   match=os.getenv("LLM_CASSETTE_MATCH", "exact"),
+                                   replay_latency=os.getenv("LLM_CASSETTE_REPLAY_LATENCY", "0") == "1")
+        return _ACTIVE
+
+
+@contextmanager
+def use_cassette(path: str | Path, mode: str = "replay", **kwargs: Any) -> Iterator[Cassette]:
+    """Activate a cassette for every thread in the process until the block exits."""
+    global _ACTIVE, _ENV_LOADED
+    cassette = Cassette(path, mode, **kwargs)
+    with _ACTIVE_LOCK:
+        previous, _ACTIVE, _ENV_LOADED = _ACTIVE, cassette, True
+    try:
+        yield cassette
+    finally:
+        with _ACTIVE_LOCK:
+            _ACTIVE = previous
@@ -0,0 +1,233 @@
+# llm_clients/metering.py
+# ----------------------------------------------------
+# Token / cost / latency accounting for every OpenAI request sent, tagged by session and
+# pipeline stage. llm_clients.scheduler.scheduled_create records each attempt (retries,
+# hedges and abandoned timed-out attempts included, failed ones too); attempts whose
+# response carries no usage are charged the pre-call estimate ("estimated"):
+#   with metering_session(session_id): ...      # ui.trace_view.traced does this for pages/*
+#   get_meter().stats(session=session_id)        # rolling + all-time counters for the panels
+# Budgets (USD over a rolling window), per session and process-wide, degrade gracefully:
+#   spent >= LLM_BUDGET_SOFT x budget -> "economy":   cheapest model only (no escalation,
+#                                                      translations on the fast model)
+#   spent >= budget                   -> "exhausted": new translations are refused
+#                                                      (BudgetExceeded); planning stays on the cheapest model
+# A budget of 0 disables it. Prices are USD per 1M tokens (input, cached input, output);
+# override with LLM_PRICES='{"model": [in, cached, out]}'. Unknown models are priced like
+# gpt-4o so budgets err on the safe side.
+# ----------------------------------------------------
+from __future__ import annotations
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+METER_WINDOW_S = float(os.getenv("LLM_METER_WINDOW_S", "3600"))
+SESSION_BUDGET_USD = float(os.getenv("LLM_SESSION_BUDGET_USD", "0.50"))
+GLOBAL_BUDGET_USD = float(os.getenv("LLM_GLOBAL_BUDGET_USD", "10"))
+BUDGET_SOFT = float(os.getenv("LLM_BUDGET_SOFT", "0.8"))
+
+LEVEL_OK, LEVEL_ECONOMY, LEVEL_EXHAUSTED = "ok", "economy", "exhausted"
+
+MODEL_PRICES: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+}
+MODEL_PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("LLM_PRICES", "{}")).items()})
+_FALLBACK_PRICE = MODEL_PRICES["gpt-4o"]
+
+# scheduled_create call name (before ':') -> pipeline stage
+_STAGES = {"openai.plan": "plan", "openai.code": "translate"}
+
+
+class BudgetExceeded(RuntimeError):
+    """A session or the whole app spent its LLM budget for the current window."""
+
+
+def price_for(model: Optional[str]) -> Tuple[float, float, float]:
+    """Longest known prefix, so dated snapshots (gpt-4o-mini-2024-07-18) are priced too."""
+    model = model or ""
+    best = max((k for k in MODEL_PRICES if model.startswith(k)), key=len, default=None)
+    return MODEL_PRICES[best] if best else _FALLBACK_PRICE
+
+
+def call_cost(model: Optional[str], prompt: int, completion: int, cached: int) -> float:
+    p_in, p_cached, p_out = price_for(model)
+    return ((prompt - cached) * p_in + cached * p_cached + completion * p_out) / 1_000_000
+
+
+def _usage_counts(resp: Any) -> Optional[Tuple[int, int, int]]:
+    u = getattr(resp, "usage", None)
+    if u is None:
+        return None
+    details = getattr(u, "prompt_tokens_details", None)
+    return (getattr(u, "prompt_tokens", None) or 0, getattr(u, "completion_tokens", None) or 0,
+            getattr(details, "cached_tokens", None) or 0)
+
+
+# ---------- 1) Session tag ----------
+_SESSION: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_session", default=None)
+
+
+def current_session() -> Optional[str]:
+    return _SESSION.get()
+
+
+@contextmanager
+def metering_session(session_id: Optional[str]) -> Iterator[None]:
+    """Tag the OpenAI calls made in this block (and its asyncio tasks) with `session_id`."""
+    token = _SESSION.set(session_id)
+    try:
+        yield
+    finally:
+        _SESSION.reset(token)
+
+
+# ---------- 2) Meter ----------
+_FIELDS = ("calls", "prompt_tokens", "completion_tokens", "cached_tokens", "cost_usd", "latency_s",
+           "failed", "estimated")
+
+
+def _zero() -> Dict[str, float]:
+    return dict.fromkeys(_FIELDS, 0)
+
+
+def _add(acc: Dict[str, float], ev: Dict[str, Any], sign: int = 1) -> None:
+    acc["calls"] += sign
+    for k in _FIELDS[1:]:
+        acc[k] += sign * ev[k]
+
+
+class Meter:
+    """All-time totals plus rolling-window counters (global, per session/stage/model)."""
+
+    def __init__(self, window_s: float = METER_WINDOW_S):
+        self.window_s = window_s
+        self._lock = threading.Lock()
+        self._events: Deque[Dict[str, Any]] = deque()
+        self._window: Dict[str, Dict[str, Dict[str, float]]] = {"session": {}, "stage": {}, "model": {}}
+        self._window_total = _zero()
+        self._totals = _zero()
+        self._latency: Dict[str, Deque[float]] = {}
+
+    def _prune(self, now: float) -> None:
+        while self._events and now - self._events[0]["t"] > self.window_s:
+            ev = self._events.popleft()
+            _add(self._window_total, ev, -1)
+            for dim, acc in self._window.items():
+                key = ev[dim]
+                _add(acc[key], ev, -1)
+                if acc[key]["calls"] <= 0:
+                    del acc[key]
+
+    def record(self, call: str, model: Optional[str], resp: Any, latency_s: float,
+               session: Optional[str] = None, *, failed: bool = False,
+               estimate: Tuple[int, int] = (0, 0)) -> Dict[str, Any]:
+        """
+        One request. `estimate` (prompt, completion tokens) is charged when `resp` has no
+        usage (errors, timeouts, cancelled hedges): the request may still be billed.
+        """
+        counts = _usage_counts(resp)
+        estimated = counts is None
+        prompt, completion, cached = (*estimate, 0) if estimated else counts
+        ev = {
+            "t": time.monotonic(), "at": time.time(),
+            "session": session or current_session() or "-",
+            "stage": _STAGES.get(call.split(":")[0], call), "model": model or "?",
+            "prompt_tokens": prompt, "completion_tokens": completion, "cached_tokens": cached,
+            "cost_usd": call_cost(model, prompt, completion, cached), "latency_s": latency_s,
+            "failed": int(failed), "estimated": int(estimated),
+        }
+        with self._lock:
+            self._prune(ev["t"])
+            self._events.append(ev)
+            _add(self._window_total, ev)
+            _add(self._totals, ev)
+            for dim, acc in self._window.items():
+                _add(acc.setdefault(ev[dim], _zero()), ev)
+            lat = self._latency.setdefault(ev["stage"], deque(maxlen=500))
+            lat.append(latency_s)
+        return ev
+
+    def spent(self, session: Optional[str] = None) -> Tuple[float, float]:
+        """(session, global) USD spent in the rolling window."""
+        with self._lock:
+            self._prune(time.monotonic())
+            mine = self._window["session"].get(session, {}).get("cost_usd", 0.0) if session else 0.0
+            return mine, self._window_total["cost_usd"]
+
+    def level(self, session: Optional[str] = None) -> str:
+        session = session or current_session()
+        mine, total = self.spent(session)
+        ratio = max(mine / SESSION_BUDGET_USD if SESSION_BUDGET_USD > 0 and session else 0.0,
+                    total / GLOBAL_BUDGET_USD if GLOBAL_BUDGET_USD > 0 else 0.0)
+        if ratio >= 1:
+            return LEVEL_EXHAUSTED
+        return LEVEL_ECONOMY if ratio >= BUDGET_SOFT else LEVEL_OK
+
+    def stats(self, session: Optional[str] = None) -> Dict[str, Any]:
+        def fmt(acc: Dict[str, float]) -> Dict[str, Any]:
+            out = {k: int(acc[k]) for k in _FIELDS[:4]}
+            out["cost_usd"] = round(acc["cost_usd"], 6)
+            out["latency_s"] = round(acc["latency_s"], 3)
+            out["failed"], out["estimated"] = int(acc["failed"]), int(acc["estimated"])
+            return out
+
+        session = session or current_session()
+        with self._lock:
+            self._prune(time.monotonic())
+            latency = {}
+            for stage, xs in self._latency.items():
+                s = sorted(xs)
+                latency[stage] = {"p50_s": round(s[len(s) // 2], 3),
+                                  "p95_s": round(s[min(len(s) - 1, int(0.95 * len(s)))], 3)}
+            out = {
+                "window_s": self.window_s,
+                "window": fmt(self._window_total),
+                "all_time": fmt(self._totals),
+                "by_stage": {k: fmt(v) for k, v in self._window["stage"].items()},
+                "by_model": {k: fmt(v) for k, v in self._window["model"].items()},
+                "sessions": len(self._window["session"]),
+                "latency": latency,
+            }
+            if session:
+                out["session"] = fmt(self._window["session"].get(session, _zero()))
+        out["budget"] = {"level": self.level(session), "session_usd": SESSION_BUDGET_USD,
+                         "global_usd": GLOBAL_BUDGET_USD, "soft": BUDGET_SOFT}
+        return out
+
+    def recent(self, session: Optional[str] = None, n: int = 50) -> List[Dict[str, Any]]:
+        """Last `n` calls in the window (optionally of one session), newest first."""
+        with self._lock:
+            evs = [e for e in reversed(self._events) if session is None or e["session"] == session]
+        return [{k: v for k, v in e.items() if k != "t"} for e in evs[:n]]
+
+
+# ---------- 3) Process-wide meter and budget checks ----------
+_METER = Meter()
+
+
+def get_meter() -> Meter:
+    return _METER
+
+
+def budget_tiers(tiers: List[str]) -> List[str]:
+    """Planning tiers allowed by the budget: the cheapest one only once economy starts."""
+    return tiers[:1] if _METER.level() != LEVEL_OK else tiers
+
+
+def translation_model(default: str, cheapest: str) -> str:
+    """Model for a new translation; BudgetExceeded once the budget is spent."""
+    level = _METER.level()
+    if level == LEVEL_EXHAUSTED:
+        session = current_session()
+        scope = "this session" if session and _METER.spent(session)[0] >= SESSION_BUDGET_USD > 0 else "the app"
+        raise BudgetExceeded(f"LLM budget for {scope} is spent for now; new pandas translations are paused "
+                             f"(window {METER_WINDOW_S / 60:.0f} min).")
+    return cheapest if level == LEVEL_ECONOMY else default
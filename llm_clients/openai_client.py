@@ -1,9 +1,15 @@
 # llm_clients/openai_client.py
 from __future__ import annotations
 import os
+import threading
 import tomllib
 from pathlib import Path
-from openai import OpenAI
+from typing import TYPE_CHECKING
+
+from llm_clients.cassette import get_cassette
+
+if TYPE_CHECKING:  # openai is imported when the first client is created (slow import)
+    from openai import OpenAI, AsyncOpenAI
 
 # ---------- 1) Configuration loader ----------
 def _load_openai_config() -> dict:
@@ -13,10 +19,22 @@ def _load_openai_config() -> dict:
         [openai]
         api_key = "sk-..."
         model = "gpt-4o-mini"
+        fast_model = "gpt-4o-mini"     # optional, planning tier 1 (defaults to model)
+        strong_model = "gpt-4o"        # optional, escalation tier
+        base_url = "http://..."        # optional, e.g. a local stand-in (benchmarks/standins.py)
+    While a cassette replays (llm_clients.cassette), the models it was recorded with are
+    used and no key is needed: requests must match the recorded ones, nothing is sent.
     """
+    cassette = get_cassette()
+    if cassette is not None and cassette.mode == "replay" and cassette.models:
+        return {"api_key": "cassette-replay", "base_url": None, **cassette.models}
+
     # 1️⃣ Try environment variable first
     api_key = os.getenv("OPENAI_API_KEY")
     model = os.getenv("OPENAI_MODEL")
+    fast_model = os.getenv("OPENAI_FAST_MODEL")
+    strong_model = os.getenv("OPENAI_STRONG_MODEL")
+    base_url = os.getenv("OPENAI_BASE_URL")
 
     # 2️⃣ If missing, fall back to secrets file
     if not api_key:
@@ -27,18 +45,47 @@ def _load_openai_config() -> dict:
             config = tomllib.load(f)
         api_key = config["openai"].get("api_key")
         model = model or config["openai"].get("model")
+        fast_model = fast_model or config["openai"].get("fast_model")
+        strong_model = strong_model or config["openai"].get("strong_model")
+        base_url = base_url or config["openai"].get("base_url")
 
     if not api_key:
         raise ValueError("OpenAI API key not found (env var or secrets file).")
 
-    return {"api_key": api_key, "model": model or "gpt-4o-mini"}
+    model = model or "gpt-4o-mini"
+    return {
+        "api_key": api_key,
+        "model": model,
+        "fast_model": fast_model or model,
+        "strong_model": strong_model or "gpt-4o",
+        "base_url": base_url,
+    }
 
 
 # ---------- 2) Client factory ----------
+# Retries/timeouts are handled by tools.resilience (via llm_clients.scheduler),
+# so the SDK's own retry loop is disabled to avoid retrying twice.
+# The sync client is shared process-wide (it is thread-safe) so every call reuses
+# the same connection pool, including connections opened by tools.warmup.
+_CLIENT: "OpenAI | None" = None
+_CLIENT_LOCK = threading.Lock()
+
 def get_openai_client() -> OpenAI:
-    """Return an authenticated OpenAI client instance."""
+    """Return the shared, authenticated OpenAI client instance."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            from openai import OpenAI
+            cfg = _load_openai_config()
+            _CLIENT = OpenAI(api_key=cfg["api_key"], base_url=cfg["base_url"], max_retries=0)
+        return _CLIENT
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """Return an authenticated async OpenAI client (for batch / concurrent calls)."""
+    from openai import AsyncOpenAI
     cfg = _load_openai_config()
-    return OpenAI(api_key=cfg["api_key"])
+    return AsyncOpenAI(api_key=cfg["api_key"], base_url=cfg["base_url"], max_retries=0)
 
 
 # ---------- 3) Helper for default model ----------
@@ -46,6 +93,15 @@ def get_default_model() -> str:
     """Return the default model name from secrets or env."""
     return _load_openai_config()["model"]
 
+
+def get_model_tiers() -> list[str]:
+    """
+    Planning tiers, cheapest first: [fast_model, strong_model].
+    A single tier when both are the same model (no escalation).
+    """
+    cfg = _load_openai_config()
+    return list(dict.fromkeys([cfg["fast_model"], cfg["strong_model"]]))
+
 if __name__ == "__main__":
     cfg = _load_openai_config()
     print("✅ OpenAI config loaded.")
@@ -1,11 +1,17 @@
 # llm_clients/router.py
 from __future__ import annotations
-import json, re
-from typing import Dict, Any, List, Optional
+import json, os, re, threading, time
+from typing import Callable, Dict, Any, List, Optional, Union, TYPE_CHECKING
 from pydantic import BaseModel, Field, ValidationError
-from openai import OpenAI
 
-from llm_clients.openai_client import get_openai_client, get_default_model
+if TYPE_CHECKING:
+    from openai import OpenAI, AsyncOpenAI
+
+from llm_clients.openai_client import get_openai_client, get_async_openai_client, get_model_tiers
+from llm_clients.batch import BatchResult, arun_batch, run_blocking, DEFAULT_CONCURRENCY
+from llm_clients.metering import budget_tiers
+from llm_clients.scheduler import PRIORITY_INTERACTIVE, PRIORITY_BATCH, scheduled_create, ascheduled_create
+from tools.tracing import span
 
 class ToolCall(BaseModel):
     tool_name: str
@@ -49,44 +55,39 @@ PLANNER_SYSTEM = (
     "Use the provided CONTEXT_SCHEMA if present. "
     "Return a plan object with keys: steps, why, assumptions. "
     "Do NOT print free-form JSON or any content outside the function call. "
-    "Do NOT return top-level 'filters'. Use the exact key 'args' for step arguments."
+    "Do NOT return top-level 'filters'. Use the exact key 'args' for step arguments. "
+    "If the context has 'previous_result' and the user refines it, start with 'use_previous_result' "
+    "and plan only the new steps."
 )
 
-def route_to_tool(
+# Default router system (kept for non-planning use)
+ROUTER_SYSTEM = (
+    "You are a tool router. Choose exactly one function from the provided tools and "
+    "output STRICT JSON with keys:\n"
+    '  - \"tool_name\": string\n'
+    '  - \"args\": object\n'
+    '  - \"confidence\": number (0..1)\n'
+    '  - \"why\": short string (<=120 chars)\n'
+    '  - \"assumptions\": array of 0-3 short strings\n'
+    "No prose or explanations outside the JSON. Do NOT include chain-of-thought."
+)
+
+def _build_request(
     user_text: str,
     tool_specs: List[dict],
     *,
-    model: Optional[str] = None,
-    client: Optional[OpenAI] = None,
-    context: Optional[str] = None,           # <-- NEW
-    force_tool_name: Optional[str] = None,   # <-- NEW
-    system_override: Optional[str] = None,   # <-- NEW
-) -> ToolCall:
-    """
-    Single-shot router. Returns a ToolCall; does NOT execute the tool.
-    Raises ValueError if the model doesn't produce a valid plan.
-    """
+    model: str,
+    context: Optional[str] = None,
+    force_tool_name: Optional[str] = None,
+    system_override: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Validate inputs and build the chat.completions.create kwargs."""
     if not user_text.strip():
         raise ValueError("Empty user_text.")
     if not tool_specs:
         raise ValueError("No tool specs provided.")
 
-    client = client or get_openai_client()
-    model = model or get_default_model()
     tools = _to_chat_tools(tool_specs)
-
-    # Default router system (kept for non-planning use)
-    ROUTER_SYSTEM = (
-        "You are a tool router. Choose exactly one function from the provided tools and "
-        "output STRICT JSON with keys:\n"
-        '  - \"tool_name\": string\n'
-        '  - \"args\": object\n'
-        '  - \"confidence\": number (0..1)\n'
-        '  - \"why\": short string (<=120 chars)\n'
-        '  - \"assumptions\": array of 0-3 short strings\n'
-        "No prose or explanations outside the JSON. Do NOT include chain-of-thought."
-    )
-
     sys_prompt = system_override or ROUTER_SYSTEM
 
     messages = [{"role": "system", "content": sys_prompt}]
@@ -99,22 +100,21 @@ def route_to_tool(
     if force_tool_name:
         tool_choice = {"type": "function", "function": {"name": force_tool_name}}
 
-    resp = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        tools=tools,
-        tool_choice=tool_choice,
-    )
+    return {"model": model, "messages": messages, "tools": tools, "tool_choice": tool_choice}
 
+def _parse_response(resp) -> ToolCall:
     msg = resp.choices[0].message
 
     # Preferred: function call
     if msg.tool_calls:
         tc = msg.tool_calls[0]
+        args = json.loads(tc.function.arguments or "{}")
+        conf = args.get("confidence") if isinstance(args, dict) else None
         data = {
             "tool_name": tc.function.name,
-            "args": json.loads(tc.function.arguments or "{}"),
-            "confidence": 0.75,
+            "args": args,
+            # self-reported by the planner (make_plan.confidence) when present
+            "confidence": float(conf) if isinstance(conf, (int, float)) else 0.75,
         }
         return ToolCall(**data)
 
@@ -126,3 +126,189 @@ def route_to_tool(
         return ToolCall(**data)
     except ValidationError as e:
         raise ValueError(f"Invalid plan structure: {e}")
+
+# ---------- Tiered routing (cheap model first) ----------
+# Calls go to the fast model; the next tier is tried only when the answer is
+# unusable (unparsable, wrong tool, fails `validate`) or its confidence is low.
+ESCALATE_BELOW_CONFIDENCE = float(os.getenv("ROUTER_ESCALATE_BELOW_CONFIDENCE", "0.6"))
+
+class TierStats:
+    """Per-model counts (accepted / escalated / failed) and planning latency."""
+
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self._window = window
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._latency: Dict[str, List[float]] = {}
+
+    def record(self, model: str, outcome: str, latency_s: float) -> None:
+        with self._lock:
+            c = self._counts.setdefault(model, {})
+            c[outcome] = c.get(outcome, 0) + 1
+            xs = self._latency.setdefault(model, [])
+            xs.append(latency_s)
+            del xs[:-self._window]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            out = {}
+            for model, counts in self._counts.items():
+                xs = sorted(self._latency.get(model, []))
+                out[model] = {
+                    **counts,
+                    "p50_s": round(xs[len(xs) // 2], 3) if xs else None,
+                    "p95_s": round(xs[min(len(xs) - 1, int(0.95 * len(xs)))], 3) if xs else None,
+                }
+            return out
+
+_TIER_STATS = TierStats()
+
+def get_tier_stats() -> Dict[str, Dict[str, Any]]:
+    return _TIER_STATS.stats()
+
+def _check_call(call: ToolCall, tool_specs: List[dict], force_tool_name: Optional[str],
+                validate: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+    names = {t.get("function", t).get("name") for t in tool_specs}
+    if force_tool_name and call.tool_name != force_tool_name:
+        raise ValueError(f"Expected a call to '{force_tool_name}', got '{call.tool_name}'.")
+    if call.tool_name not in names:
+        raise ValueError(f"Unknown tool in response: '{call.tool_name}'.")
+    if validate is not None:
+        try:
+            validate(call.args)
+        except ValueError:
+            raise
+        except Exception as e:  # a malformed plan can trip any check; it is still just invalid
+            raise ValueError(f"Invalid arguments for '{call.tool_name}': {type(e).__name__}: {e}") from e
+
+def _settle(model: str, t0: float, outcome: Union[ToolCall, ValueError], is_last: bool) -> bool:
+    """Record one tier's outcome; True if routing stops here."""
+    latency = time.monotonic() - t0
+    if isinstance(outcome, ToolCall):
+        if outcome.confidence >= ESCALATE_BELOW_CONFIDENCE or is_last:
+            _TIER_STATS.record(model, "accepted", latency)
+            return True
+        _TIER_STATS.record(model, "escalated_low_confidence", latency)
+        return False
+    _TIER_STATS.record(model, "failed" if is_last else "escalated_invalid", latency)
+    return is_last
+
+def _result(outcome: Union[ToolCall, ValueError], fallback: Optional[ToolCall]) -> ToolCall:
+    if isinstance(outcome, ToolCall):
+        return outcome
+    if fallback is not None:
+        return fallback  # a valid low-confidence answer beats none
+    raise outcome
+
+def route_to_tool(
+    user_text: str,
+    tool_specs: List[dict],
+    *,
+    model: Optional[str] = None,
+    client: Optional[OpenAI] = None,
+    context: Optional[str] = None,           # <-- NEW
+    force_tool_name: Optional[str] = None,   # <-- NEW
+    system_override: Optional[str] = None,   # <-- NEW
+    priority: int = PRIORITY_INTERACTIVE,
+    validate: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> ToolCall:
+    """
+    Single-shot router. Returns a ToolCall; does NOT execute the tool.
+    Raises ValueError if the model doesn't produce a valid plan.
+    The call waits for admission by the global LLM scheduler (see llm_clients.scheduler).
+    Without `model`, the tiers from get_model_tiers() are tried cheapest first; the next
+    tier is used only if the answer fails `validate(args)` or has low confidence, and only
+    while the LLM budget allows it (llm_clients.metering).
+    """
+    tiers = [model] if model else budget_tiers(get_model_tiers())
+    request = _build_request(
+        user_text, tool_specs,
+        model=tiers[0],
+        context=context, force_tool_name=force_tool_name, system_override=system_override,
+    )
+    client = client or get_openai_client()
+    fallback = None
+    with span("route_to_tool", tiers=tiers) as sp:
+        for i, tier in enumerate(tiers):
+            t0 = time.monotonic()
+            try:
+                resp = scheduled_create(client, {**request, "model": tier}, priority=priority,
+                                        name=f"openai.plan:{tier}")
+                outcome = _parse_response(resp)
+                _check_call(outcome, tool_specs, force_tool_name, validate)
+                fallback = outcome
+            except ValueError as e:
+                outcome = e
+            if _settle(tier, t0, outcome, is_last=i == len(tiers) - 1):
+                break
+        sp.set(model=tier, escalations=i)
+        return _result(outcome, fallback)
+
+async def aroute_to_tool(
+    user_text: str,
+    tool_specs: List[dict],
+    *,
+    model: Optional[str] = None,
+    client: Optional[AsyncOpenAI] = None,
+    context: Optional[str] = None,
+    force_tool_name: Optional[str] = None,
+    system_override: Optional[str] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    validate: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> ToolCall:
+    """Async variant of route_to_tool (same arguments and tiering, AsyncOpenAI client)."""
+    tiers = [model] if model else budget_tiers(get_model_tiers())
+    request = _build_request(
+        user_text, tool_specs,
+        model=tiers[0],
+        context=context, force_tool_name=force_tool_name, system_override=system_override,
+    )
+    client = client or get_async_openai_client()
+    fallback = None
+    with span("route_to_tool", tiers=tiers) as sp:
+        for i, tier in enumerate(tiers):
+            t0 = time.monotonic()
+            try:
+                resp = await ascheduled_create(client, {**request, "model": tier}, priority=priority,
+                                               name=f"openai.plan:{tier}")
+                outcome = _parse_response(resp)
+                _check_call(outcome, tool_specs, force_tool_name, validate)
+                fallback = outcome
+            except ValueError as e:
+                outcome = e
+            if _settle(tier, t0, outcome, is_last=i == len(tiers) - 1):
+                break
+        sp.set(model=tier, escalations=i)
+        return _result(outcome, fallback)
+
+async def aroute_to_tool_batch(
+    queries: List[str],
+    tool_specs: List[dict],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    client: Optional[AsyncOpenAI] = None,
+    **kwargs,
+) -> List[BatchResult]:
+    """
+    Plan many queries concurrently (at most `concurrency` requests in flight).
+    Returns one BatchResult per query, in input order; `result` is a ToolCall.
+    Extra kwargs (model, context, force_tool_name, system_override, validate) apply to every query.
+    Requests are queued at batch priority, behind interactive ones.
+    """
+    client = client or get_async_openai_client()
+    kwargs.setdefault("priority", PRIORITY_BATCH)
+    return await arun_batch(
+        queries,
+        lambda q: aroute_to_tool(q, tool_specs, client=client, **kwargs),
+        concurrency=concurrency,
+    )
+
+def route_to_tool_batch(
+    queries: List[str],
+    tool_specs: List[dict],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    **kwargs,
+) -> List[BatchResult]:
+    """Blocking wrapper around aroute_to_tool_batch for offline jobs (cache pre-warm, evals)."""
+    return run_blocking(aroute_to_tool_batch(queries, tool_specs, concurrency=concurrency, **kwargs))
@@ -0,0 +1,351 @@
+# llm_clients/scheduler.py
+# ----------------------------------------------------
+# Process-wide admission control for OpenAI calls:
+#   - concurrency cap (max requests in flight)
+#   - token-bucket limit on tokens per minute
+#   - priority queue: interactive requests are admitted before batch/background work
+#   - queue-time metrics per priority
+# Every chat.completions.create in the app goes through scheduled_create(), which
+# also applies the deadline/retry/hedging policy from tools.resilience (each attempt
+# holds a slot until it really finishes, see _CallAttempts) and records /
+# replays calls when a cassette is active (llm_clients.cassette). Token usage, cost and
+# latency (queueing included) of every request sent go to llm_clients.metering.
+# ----------------------------------------------------
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, List, Optional
+
+from llm_clients.cassette import get_cassette
+from llm_clients.metering import current_session, get_meter
+from tools.resilience import (AttemptHooks, RetryPolicy, default_retryable, call_with_resilience,
+                              acall_with_resilience)
+from tools.tracing import span
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+DEFAULT_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+DEFAULT_COMPLETION_TOKENS = 512
+
+_METRIC_WINDOW = 500  # queue-time samples kept per priority
+
+# Per-call budgets for completions (total incl. retries / per attempt). Hedging sends a
+# duplicate completion (extra tokens), so it is opt-in.
+OPENAI_DEADLINE_S = float(os.getenv("OPENAI_DEADLINE_S", "90"))
+OPENAI_ATTEMPT_TIMEOUT_S = float(os.getenv("OPENAI_ATTEMPT_TIMEOUT_S", "45"))
+OPENAI_HEDGE = os.getenv("OPENAI_HEDGE", "0") == "1"
+
+
+def _openai_retryable(exc: BaseException) -> bool:
+    try:
+        import openai
+        if isinstance(exc, openai.APIConnectionError):  # includes APITimeoutError
+            return True
+    except ImportError:
+        pass
+    return default_retryable(exc)
+
+
+_OPENAI_RETRY = RetryPolicy(attempts=3, base_delay_s=0.5, max_delay_s=8.0, retryable=_openai_retryable)
+
+
+def estimate_tokens(request: Dict[str, Any], completion_tokens: int = DEFAULT_COMPLETION_TOKENS) -> int:
+    """Rough pre-call estimate (~4 chars/token) of prompt + tools + expected completion."""
+    chars = sum(len(str(m.get("content") or "")) for m in request.get("messages", []))
+    chars += len(str(request.get("tools") or ""))
+    return chars // 4 + completion_tokens
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` tokens, refilled continuously at capacity/60 per second."""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.tokens = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self._ts = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._ts) * self.rate)
+        self._ts = now
+
+    def wait_time(self, n: float) -> float:
+        """Seconds until `n` tokens are available (0 if available now)."""
+        self._refill()
+        return 0.0 if self.tokens >= n else (n - self.tokens) / self.rate
+
+    def take(self, n: float) -> None:
+        self._refill()
+        self.tokens -= n
+
+    def adjust(self, delta: float) -> None:
+        """Refund (delta > 0) or charge (delta < 0) after the real usage is known."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+
+class _Ticket:
+    __slots__ = ("priority", "tokens", "enqueued", "admitted")
+
+    def __init__(self, priority: int, tokens: int):
+        self.priority, self.tokens = priority, tokens
+        self.enqueued = time.monotonic()
+        self.admitted: Optional[float] = None
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be >= 1")
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(tokens_per_minute)
+        self._cond = threading.Condition()
+        self._queue: List[tuple] = []          # heap of (priority, seq, ticket)
+        self._seq = itertools.count()
+        self._inflight = 0
+        self._queue_times: Dict[int, List[float]] = {}
+        self._admitted: Dict[int, int] = {}
+
+    # --- admission ---
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE, tokens: int = DEFAULT_COMPLETION_TOKENS) -> _Ticket:
+        """Block until this request may call the API. Lower priority value = admitted first."""
+        ticket = _Ticket(priority, min(tokens, int(self.bucket.capacity)))
+        with self._cond:
+            heapq.heappush(self._queue, (priority, next(self._seq), ticket))
+            while True:
+                head = self._queue[0][2]
+                if head is ticket and self._inflight < self.max_concurrency:
+                    wait = self.bucket.wait_time(ticket.tokens)
+                    if wait <= 0:
+                        break
+                    self._cond.wait(timeout=wait)
+                else:
+                    self._cond.wait(timeout=1.0)
+            heapq.heappop(self._queue)
+            self.bucket.take(ticket.tokens)
+            self._inflight += 1
+            ticket.admitted = time.monotonic()
+            samples = self._queue_times.setdefault(priority, [])
+            samples.append(ticket.admitted - ticket.enqueued)
+            del samples[:-_METRIC_WINDOW]
+            self._admitted[priority] = self._admitted.get(priority, 0) + 1
+            self._cond.notify_all()  # the next head may be admissible too
+        return ticket
+
+    async def aacquire(self, priority: int = PRIORITY_INTERACTIVE, tokens: int = DEFAULT_COMPLETION_TOKENS) -> _Ticket:
+        """acquire() for coroutines. The waiting thread cannot be interrupted: if the task is
+        cancelled while queued, the slot it is eventually granted is handed straight back."""
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self.acquire, priority, tokens))
+        try:
+            return await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            acquiring.add_done_callback(self._release_abandoned)
+            raise
+
+    def occupy(self, priority: int = PRIORITY_INTERACTIVE, tokens: int = DEFAULT_COMPLETION_TOKENS) -> _Ticket:
+        """Take a slot and tokens now, without queueing (extra attempts of an admitted call).
+        May push in-flight over max_concurrency; new requests then wait until it drops."""
+        ticket = _Ticket(priority, min(tokens, int(self.bucket.capacity)))
+        with self._cond:
+            self.bucket.take(ticket.tokens)
+            self._inflight += 1
+            ticket.admitted = time.monotonic()
+        return ticket
+
+    def release(self, ticket: _Ticket, actual_tokens: Optional[int] = None) -> None:
+        with self._cond:
+            self._inflight -= 1
+            if actual_tokens is not None:
+                self.bucket.adjust(ticket.tokens - actual_tokens)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_INTERACTIVE, tokens: int = DEFAULT_COMPLETION_TOKENS):
+        ticket = self.acquire(priority, tokens)
+        usage: Dict[str, Any] = {"total_tokens": None, "queue_s": ticket.admitted - ticket.enqueued}
+        try:
+            yield usage
+        finally:
+            self.release(ticket, usage["total_tokens"])
+
+    @asynccontextmanager
+    async def aslot(self, priority: int = PRIORITY_INTERACTIVE, tokens: int = DEFAULT_COMPLETION_TOKENS):
+        ticket = await self.aacquire(priority, tokens)
+        usage: Dict[str, Any] = {"total_tokens": None, "queue_s": ticket.admitted - ticket.enqueued}
+        try:
+            yield usage
+        finally:
+            self.release(ticket, usage["total_tokens"])
+
+    def _release_abandoned(self, acquiring: "asyncio.Future") -> None:
+        if not acquiring.cancelled() and acquiring.exception() is None:
+            self.release(acquiring.result(), 0)  # nothing was sent: refund the estimate
+
+    # --- metrics ---
+    def metrics(self) -> Dict[str, Any]:
+        def _pct(xs: List[float], q: float) -> Optional[float]:
+            if not xs:
+                return None
+            xs = sorted(xs)
+            return round(xs[min(len(xs) - 1, int(q * len(xs)))], 4)
+
+        with self._cond:
+            queued: Dict[int, int] = {}
+            for p, _, _ in self._queue:
+                queued[p] = queued.get(p, 0) + 1
+            return {
+                "inflight": self._inflight,
+                "max_concurrency": self.max_concurrency,
+                "tokens_available": int(self.bucket.tokens),
+                "tokens_per_minute": int(self.bucket.capacity),
+                "by_priority": {
+                    p: {
+                        "admitted": self._admitted.get(p, 0),
+                        "queued": queued.get(p, 0),
+                        "queue_s_p50": _pct(xs, 0.50),
+                        "queue_s_p95": _pct(xs, 0.95),
+                        "queue_s_max": round(max(xs), 4) if xs else None,
+                    }
+                    for p, xs in sorted(self._queue_times.items())
+                },
+            }
+
+
+# ---------- Process-wide scheduler ----------
+_SCHEDULER = LLMScheduler()
+
+
+def get_scheduler() -> LLMScheduler:
+    return _SCHEDULER
+
+
+def _usage_total(resp) -> Optional[int]:
+    usage = getattr(resp, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage is not None else None
+
+
+def _trace_usage(sp, resp, queue_s: float) -> None:
+    u = getattr(resp, "usage", None)
+    sp.set(queue_s=round(queue_s, 4),
+           tokens_in=getattr(u, "prompt_tokens", None), tokens_out=getattr(u, "completion_tokens", None))
+
+
+def _http_status(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    return status if isinstance(status, int) else getattr(getattr(exc, "response", None), "status_code", None)
+
+
+class _CallAttempts(AttemptHooks):
+    """
+    Scheduler slots and metering for the attempts of one call. The admitted ticket goes
+    to the first attempt; retries and hedges take a slot of their own without queueing.
+    Every slot is held until its attempt really finishes, so a timed-out attempt whose
+    thread is still waiting on the network keeps counting against max_concurrency and
+    the token bucket. Every attempt is metered, failed and abandoned ones included.
+    """
+
+    def __init__(self, scheduler: LLMScheduler, ticket: _Ticket, name: str, request: Dict[str, Any],
+                 completion_tokens: int):
+        self._scheduler = scheduler
+        self._lock = threading.Lock()
+        self._admitted: Optional[_Ticket] = ticket
+        self.priority, self.tokens = ticket.priority, ticket.tokens
+        self.queue_s = ticket.admitted - ticket.enqueued
+        self._name, self._model = name, request.get("model")
+        self._session = current_session()  # attempts run on pool threads, outside this context
+        self._estimate = (max(0, ticket.tokens - completion_tokens), completion_tokens)
+
+    def started(self) -> _Ticket:
+        with self._lock:
+            ticket, self._admitted = self._admitted, None
+        if ticket is None:
+            ticket = self._scheduler.occupy(self.priority, self.tokens)
+        return ticket
+
+    def finished(self, ticket: _Ticket, result: Any, exc: Optional[BaseException], latency_s: float) -> None:
+        self._scheduler.release(ticket, _usage_total(result) if exc is None else None)
+        status = _http_status(exc) if exc is not None else None
+        rejected = status is not None and status < 500 and status != 408  # refused before generating
+        get_meter().record(self._name, self._model, result, latency_s + (ticket.admitted - ticket.enqueued),
+                           self._session, failed=exc is not None,
+                           estimate=(0, 0) if rejected else self._estimate)
+
+    def close(self) -> None:
+        """Hand back the admitted ticket if no attempt ever used it (deadline already spent)."""
+        with self._lock:
+            ticket, self._admitted = self._admitted, None
+        if ticket is not None:
+            self._scheduler.release(ticket, 0)
+
+
+def scheduled_create(client, request: Dict[str, Any], *, priority: int = PRIORITY_INTERACTIVE,
+                     completion_tokens: int = DEFAULT_COMPLETION_TOKENS, name: str = "openai.chat"):
+    """
+    client.chat.completions.create(**request), admitted by the global scheduler and
+    run with deadlines/retries (and hedging if OPENAI_HEDGE=1). `name` keys the latency stats.
+    """
+    cassette = get_cassette()
+    if cassette is not None and cassette.serves(name, request):
+        with span("llm.request", call=name, model=request.get("model"), priority=priority, replayed=True) as sp:
+            resp, latency_s = cassette.replay(name, request)
+            if cassette.replay_latency:
+                time.sleep(latency_s)
+            _trace_usage(sp, resp, 0.0)
+        return resp
+
+    est = estimate_tokens(request, completion_tokens)
+    with span("llm.request", call=name, model=request.get("model"), priority=priority, tokens_est=est) as sp:
+        attempts = _CallAttempts(_SCHEDULER, _SCHEDULER.acquire(priority, est), name, request, completion_tokens)
+        t0 = time.monotonic()
+        try:
+            resp = call_with_resilience(
+                lambda: client.chat.completions.create(**request, timeout=OPENAI_ATTEMPT_TIMEOUT_S),
+                name=name, deadline_s=OPENAI_DEADLINE_S, attempt_timeout_s=OPENAI_ATTEMPT_TIMEOUT_S,
+                retry=_OPENAI_RETRY, hedge=OPENAI_HEDGE, hooks=attempts,
+            )
+        finally:
+            attempts.close()
+        _trace_usage(sp, resp, attempts.queue_s)
+    if cassette is not None and cassette.records():
+        cassette.record(name, request, resp, time.monotonic() - t0)
+    return resp
+
+
+async def ascheduled_create(client, request: Dict[str, Any], *, priority: int = PRIORITY_INTERACTIVE,
+                            completion_tokens: int = DEFAULT_COMPLETION_TOKENS, name: str = "openai.chat"):
+    """Async variant of scheduled_create (AsyncOpenAI client)."""
+    cassette = get_cassette()
+    if cassette is not None and cassette.serves(name, request):
+        with span("llm.request", call=name, model=request.get("model"), priority=priority, replayed=True) as sp:
+            resp, latency_s = cassette.replay(name, request)
+            if cassette.replay_latency:
+                await asyncio.sleep(latency_s)
+            _trace_usage(sp, resp, 0.0)
+        return resp
+
+    est = estimate_tokens(request, completion_tokens)
+    with span("llm.request", call=name, model=request.get("model"), priority=priority, tokens_est=est) as sp:
+        attempts = _CallAttempts(_SCHEDULER, await _SCHEDULER.aacquire(priority, est), name, request,
+                                 completion_tokens)
+        t0 = time.monotonic()
+        try:
+            resp = await acall_with_resilience(
+                lambda: client.chat.completions.create(**request, timeout=OPENAI_ATTEMPT_TIMEOUT_S),
+                name=name, deadline_s=OPENAI_DEADLINE_S, attempt_timeout_s=OPENAI_ATTEMPT_TIMEOUT_S,
+                retry=_OPENAI_RETRY, hedge=OPENAI_HEDGE, hooks=attempts,
+            )
+        finally:
+            attempts.close()
+        _trace_usage(sp, resp, attempts.queue_s)
+    if cassette is not None and cassette.records():
+        cassette.record(name, request, resp, time.monotonic() - t0)
+    return resp
@@ -2,11 +2,16 @@
 import streamlit as st
 
 from tools.specs import PLANNER_TOOL_SPECS
-from tools.registry import execute_plan
+from tools.registry import execute_plan, acquire_plan_base, validate_plan
+from tools.dataset_store import make_result_handle
+from ui.result_viewer import render_result
+from ui.warmup_status import render_warmup_status
+from ui.trace_view import traced, render_traces
 from llm_clients.router import route_to_tool
 
 st.set_page_config(page_title="EDA Chatbot", layout="wide")
 st.title("Phase R0: LLM Route to read data")
+render_warmup_status()
 
 
 with st.container(border=True):
@@ -33,12 +38,14 @@ with st.container(border=True):
     # Keep latest plan in session so routing and execution can be separate clicks
     if "llm_plan" not in st.session_state:
         st.session_state.llm_plan = None
+    if "result" not in st.session_state:
+        st.session_state.result = None
 
     # Route (plan) --------------------------------------
     if route_clicked or run_clicked:
         try:
-            with st.spinner("Planning…"):
-                plan_call = route_to_tool(user_text, PLANNER_TOOL_SPECS)  # ToolCall for make_plan
+            with traced("plan", query=user_text), st.spinner("Planning…"):
+                plan_call = route_to_tool(user_text, PLANNER_TOOL_SPECS, validate=validate_plan)  # ToolCall for make_plan
             plan_dict = plan_call.args  # <-- the Plan IR dict
             st.session_state.llm_plan = plan_dict
             st.success("Planned ✔")
@@ -51,14 +58,22 @@ with st.container(border=True):
     # Execute (run the plan steps) -----------------------
     if run_clicked and st.session_state.llm_plan:
         try:
-            with st.spinner("Executing plan…"):
+            with traced("execute_plan", query=user_text), st.spinner("Executing plan…"):
                 df = execute_plan(st.session_state.llm_plan)  # <-- run steps, not make_plan
             st.success(f"Executed plan → {len(df)} rows")
-            st.dataframe(df, use_container_width=True, height=480)
+            base = acquire_plan_base(st.session_state.llm_plan)
+            st.session_state.result = make_result_handle(base, df)
         except Exception as e:
             st.error("❌ Failed to execute plan")
             st.exception(e)
 
+    # Windowed viewer (kept across reruns so paging/sorting work)
+    if st.session_state.result is not None:
+        render_result(st.session_state.result, key="p01_result")
+
+with st.expander("Debug / traces"):
+    render_traces(key="p01")
+
 st.markdown("---")
 st.caption(
     "Notes: Left column calls the registry directly. Right column shows the LLM-facing tool specs and a "
@@ -2,11 +2,16 @@ import streamlit as st
 
 from llm_clients.router import route_to_tool, PLANNER_SYSTEM
 from tools.specs import PLANNER_TOOL_SPECS
-from tools.registry import execute_plan
+from tools.registry import execute_plan, acquire_plan_base, validate_plan
+from tools.dataset_store import make_result_handle
+from ui.result_viewer import render_result
+from ui.warmup_status import render_warmup_status
+from ui.trace_view import traced, render_traces
 from tools.schema_catalog import get_planner_context
 
 st.set_page_config(page_title="EDA Chatbot", layout="wide")
 st.title("Phase 2 - Plan multistep: read + filter")
+render_warmup_status()
 
 with st.container(border=True):
     st.subheader("LLM Planner")
@@ -24,18 +29,21 @@ with st.container(border=True):
 
     if "llm_plan" not in st.session_state:
         st.session_state.llm_plan = None
+    if "result" not in st.session_state:
+        st.session_state.result = None
 
     # PLAN
     if plan_clicked:
         try:
-            with st.spinner("Planning…"):
+            with traced("plan", query=user_text), st.spinner("Planning…"):
                 schema_json = get_planner_context("biwenger_player_stats")
                 plan_call = route_to_tool(
                     user_text,
                     PLANNER_TOOL_SPECS,
                     context=schema_json,
                     force_tool_name="make_plan",  # <-- force the function call
-                    system_override=PLANNER_SYSTEM  # <-- use planner system
+                    system_override=PLANNER_SYSTEM,  # <-- use planner system
+                    validate=validate_plan  # <-- escalate to the strong model if the plan can't run
                 )
             plan = plan_call.args  # STRICT JSON plan (dict with steps, why, assumptions)
             st.session_state.llm_plan = plan
@@ -62,12 +70,20 @@ with st.container(border=True):
                     st.stop()
 
         try:
-            with st.spinner("Executing plan…"):
+            with traced("execute_plan", query=user_text), st.spinner("Executing plan…"):
                 df = execute_plan(plan)  # your registry’s executor chains load -> filter_df
             st.success(f"Executed plan → {len(df)} rows")
-            st.dataframe(df, use_container_width=True, height=480)
+            base = acquire_plan_base(plan)
+            st.session_state.result = make_result_handle(base, df)
         except Exception as e:
             st.error("Execution failed.")
             st.exception(e)
 
+    # Windowed viewer (kept across reruns so paging/sorting work)
+    if st.session_state.result is not None:
+        render_result(st.session_state.result, key="p02_result")
+
+with st.expander("Debug / traces"):
+    render_traces(key="p02")
+
 st.caption("This page runs the LLM plan through the deterministic pandas executor.")
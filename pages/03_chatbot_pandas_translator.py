@@ -1,18 +1,31 @@
 # pages/04_planner_translate_execute.py
 import json
 import re
-import pandas as pd
 import streamlit as st
 
-from llm_clients.router import route_to_tool, PLANNER_SYSTEM
+from llm_clients.router import route_to_tool, PLANNER_SYSTEM, get_tier_stats
 from tools.specs import PLANNER_TOOL_SPECS
-from tools.registry import execute_plan, execute_tool  # <-- NEW: we'll call load_* directly for df_in
+from tools.registry import execute_plan, acquire_plan_base, validate_plan  # <-- NEW: we'll call load_* directly for df_in
 from tools.schema_catalog import get_planner_context
+from tools.conversation import ConversationState, build_planner_context
+from tools.code_sandbox import SandboxTimeout
+from tools.pandas_compiler import run_pandas_code
+from tools.dataset_store import make_result_handle, get_dataset_registry
+from tools.table_cache import get_table_cache
+from llm_clients.scheduler import get_scheduler
+from tools.resilience import get_latency_tracker
+from ui.result_viewer import render_result
+from ui.warmup_status import render_warmup_status
+from ui.trace_view import traced, render_traces
+from ui.usage_view import render_budget_status, render_usage
+from llm_clients.metering import BudgetExceeded
 
 TABLE = "biwenger_player_stats"
 
 st.set_page_config(page_title="EDA Chatbot — Plan + Translate + Execute", layout="wide")
 st.title("Phase 3 — Plan → Pandas code → Execute (MVP)")
+render_warmup_status()
+render_budget_status()
 
 with st.container(border=True):
     st.subheader("1) Plan with the LLM")
@@ -22,11 +35,12 @@ with st.container(border=True):
         "Real Madrid players in Oct 2025, return player_name, value, points; sort by value desc"
     )
 
-    colA, colB = st.columns([1, 1])
+    colA, colB, colC = st.columns([1, 1, 1])
     plan_clicked = colA.button("Plan with LLM", type="primary")
     exec_plan_clicked = colB.button("Execute plan (show DF or code)")
+    reset_clicked = colC.button("New conversation")
 
-    # Session state
+    # Session state: df_in / df_out hold shared-dataset handles, not private DataFrame copies
     if "llm_plan" not in st.session_state:
         st.session_state.llm_plan = None
     if "python_code" not in st.session_state:
@@ -35,12 +49,27 @@ with st.container(border=True):
         st.session_state.df_in = None
     if "df_out" not in st.session_state:
         st.session_state.df_out = None
+    if "conversation" not in st.session_state:
+        st.session_state.conversation = ConversationState(table=TABLE)
+    conversation = st.session_state.conversation
+
+    if reset_clicked:
+        conversation.reset()
+        st.session_state.llm_plan = None
+        st.session_state.python_code = None
+        st.session_state.df_in = None
+        st.session_state.df_out = None
+
+    if conversation.has_previous:
+        st.caption(f"Follow-ups can refine the previous result ({len(conversation.previous_frame())} rows "
+                   f"from: “{conversation.last_query}”).")
 
     # ---- PLAN ----
     if plan_clicked:
         try:
-            with st.spinner("Planning…"):
-                schema_ctx = get_planner_context(TABLE)
+            with traced("plan", query=user_text), st.spinner("Planning…"):
+                # schema + (if any) a summary of the previous result, so follow-ups can refine it
+                schema_ctx = build_planner_context(TABLE, conversation)
                 # Some implementations return a JSON string; normalize to dict if so.
                 if isinstance(schema_ctx, str):
                     try:
@@ -53,7 +82,8 @@ with st.container(border=True):
                     PLANNER_TOOL_SPECS,
                     context=schema_ctx,
                     force_tool_name="make_plan",
-                    system_override=PLANNER_SYSTEM
+                    system_override=PLANNER_SYSTEM,
+                    validate=validate_plan
                 )
             st.session_state.llm_plan = plan_call.args
             st.session_state.python_code = None
@@ -75,19 +105,21 @@ with st.container(border=True):
     # ---- EXECUTE PLAN (non-destructive) ----
     if exec_plan_clicked and st.session_state.llm_plan:
         try:
-            with st.spinner("Executing plan…"):
-                result = execute_plan(st.session_state.llm_plan)
+            with traced("execute_plan", query=user_text), st.spinner("Executing plan…"):
+                result = execute_plan(st.session_state.llm_plan, previous=conversation.last_result)
+            refines = any(s.get("tool") == "use_previous_result"
+                          for s in st.session_state.llm_plan.get("steps", []))
 
             st.success("Plan executed ✔")
 
             # Case A: deterministic path returned a DataFrame
             if hasattr(result, "head"):
-                st.session_state.df_out = result
+                base = acquire_plan_base(st.session_state.llm_plan, TABLE)
+                st.session_state.df_out = make_result_handle(base, result)
                 st.session_state.python_code = None
+                conversation.remember(user_text, st.session_state.llm_plan, st.session_state.df_out)
 
-                st.markdown("**Result (deterministic DataFrame):**")
-                st.dataframe(result, use_container_width=True, height=480)
-                st.caption(f"{len(result)} rows × {result.shape[1]} cols")
+                st.caption(f"Deterministic DataFrame: {len(result)} rows × {result.shape[1]} cols (see Result below)")
 
             # Case B: translator path returned a code dict
             elif isinstance(result, dict) and "python_code" in result:
@@ -98,24 +130,29 @@ with st.container(border=True):
                 st.code(st.session_state.python_code, language="python")
                 st.caption("This is code only; not executed yet.")
 
-                # NEW: preload df_in so we can run code locally after translation
-                st.session_state.df_in = execute_tool("load_biwenger_player_stats", {})
+                # preload df_in so we can run code after translation (the previous result for refinements)
+                if refines and conversation.has_previous:
+                    st.session_state.df_in = conversation.last_result
+                else:
+                    st.session_state.df_in = acquire_plan_base(st.session_state.llm_plan, TABLE)
                 st.info(f"Loaded df_in for execution: {len(st.session_state.df_in)} rows")
 
             else:
                 st.warning("Executor returned an unexpected type.")
                 st.write(result)
 
+        except BudgetExceeded as e:
+            st.warning(str(e))
         except Exception as e:
             st.error("Execution failed.")
             st.exception(e)
 
 with st.container(border=True):
-    st.subheader("2) Run generated pandas code locally (Option 1: simple exec)")
+    st.subheader("2) Run generated pandas code in the sandbox")
 
     run_clicked = st.button("Run code against df_in", type="primary", disabled=st.session_state.python_code is None)
 
-    # --- Lightweight, explicit execution path (Option 1) ---
+    # --- Sandboxed execution path (worker pool with CPU/memory limits) ---
     if run_clicked:
         if st.session_state.python_code is None:
             st.error("No pandas code to execute. Plan and execute first.")
@@ -125,7 +162,7 @@ with st.container(border=True):
             st.stop()
 
         code_str = st.session_state.python_code
-        df_in = st.session_state.df_in
+        df_in = st.session_state.df_in.frame()
 
         # 2.1 (Optional) strip triple fences
         if code_str.startswith("```"):
@@ -148,39 +185,60 @@ with st.container(border=True):
         except Exception:
             pass  # keep going; this is only a hint
 
-        # 2.3 Execute with minimal namespace
+        # 2.3 Execute: compiled to deterministic filters when possible, else the process-pool sandbox
         try:
-            globals_ns = {"pd": pd}       # only pandas in globals
-            locals_ns = {"df_in": df_in}  # df_in is provided here
-
-            with st.spinner("Running code…"):
-                exec(code_str, globals_ns, locals_ns)
+            with traced("run_code", query=user_text), st.spinner("Running code…"):
+                df_out, engine = run_pandas_code(code_str, df_in)
 
-            df_out = locals_ns.get("df_out")
             if df_out is None:
                 st.error("Execution produced no 'df_out'.")
                 st.stop()
 
-            st.session_state.df_out = df_out
-            st.success("Code executed ✔")
-
-            st.dataframe(df_out, use_container_width=True, height=480)
-            st.caption(f"{len(df_out)} rows × {df_out.shape[1]} cols")
+            st.session_state.df_out = make_result_handle(st.session_state.df_in, df_out)
+            conversation.remember(user_text, st.session_state.llm_plan, st.session_state.df_out)
+            st.success(f"Code executed ✔ (engine: {engine})")
 
+        except SandboxTimeout as e:
+            st.error(f"Code execution was stopped: {e}")
         except Exception as e:
             st.error("Code execution failed.")
             st.exception(e)
 
+with st.container(border=True):
+    st.subheader("Result")
+    if st.session_state.df_out is not None:
+        render_result(st.session_state.df_out, key="p03_result")
+    else:
+        st.caption("No result yet.")
+
 with st.expander("Debug / session state"):
     st.write({
         "has_plan": st.session_state.llm_plan is not None,
         "has_python_code": st.session_state.python_code is not None,
         "df_in_rows": (len(st.session_state.df_in) if st.session_state.df_in is not None else None),
         "df_out_rows": (len(st.session_state.df_out) if st.session_state.df_out is not None else None),
+        "df_out_is_shared_view": (st.session_state.df_out.is_view if st.session_state.df_out is not None else None),
     })
+    st.markdown("**Shared dataset versions (process-wide):**")
+    st.dataframe(get_dataset_registry().stats(), use_container_width=True)
+    info = get_table_cache().cache_info()
+    st.markdown(f"**Cached tables** ({info.bytes / 2**20:.0f} of {info.max_bytes / 2**20:.0f} MB, "
+                f"{info.evictions} evicted; least recently used first):")
+    st.dataframe(get_table_cache().stats(), use_container_width=True)
+    st.markdown("**LLM scheduler (queue times in seconds; priority 0 = interactive):**")
+    st.json(get_scheduler().metrics(), expanded=False)
+    st.markdown("**Remote calls (retries, hedges, timeouts, latency):**")
+    st.json(get_latency_tracker().stats(), expanded=False)
+    st.markdown("**Planner model tiers (accepted / escalated, latency):**")
+    st.json(get_tier_stats(), expanded=False)
+    st.markdown("**LLM usage (tokens, cost, latency; budgets):**")
+    render_usage()
+    st.markdown("**Latency breakdown (this session's traces):**")
+    render_traces(key="p03")
 
 st.caption(
     "This page: (1) plans with the LLM, (2) executes via registry to get either a DataFrame or pandas code, "
-    "and (3) runs the code locally with a minimal exec (Option 1). "
-    "When ready, you can harden this by adding timeouts, a subprocess sandbox, or AST allowlisting."
+    "and (3) runs the code: simple filter/select/sort snippets are compiled to the deterministic "
+    "apply_filters engine; anything else runs in a pre-warmed worker-process sandbox with CPU-time and memory limits. "
+    "df_in is shared with the workers through shared memory instead of being pickled per run."
 )
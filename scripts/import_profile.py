@@ -0,0 +1,106 @@
+# scripts/import_profile.py
+# ----------------------------------------------------
+# Import-time profile for the app's entry modules.
+# Each target is imported in a fresh interpreter with `python -X importtime`;
+# the report lists the total import time and the slowest imported packages, and
+# fails (exit 1) when a budget is exceeded or a lazily-imported library is loaded eagerly.
+#
+#   python scripts/import_profile.py
+#   python scripts/import_profile.py --budget-ms 900 --json import_profile.json
+# ----------------------------------------------------
+from __future__ import annotations
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_TARGETS = [
+    "tools.registry",
+    "llm_clients.router",
+    "tools.english_to_pandas",
+    "tools.supabase_tools",
+    "tools.pandas_compiler",
+]
+
+# Libraries that must only load on first use (see tools.registry / openai_client / supabase_tools)
+DEFAULT_FORBIDDEN = ["supabase", "openai", "streamlit"]
+
+_PROBE = (
+    "import sys, importlib; importlib.import_module({target!r}); "
+    "print('__LOADED__' + ','.join(sorted(m for m in {forbidden!r} if m in sys.modules)))"
+)
+
+
+def profile_import(target: str, forbidden: List[str], repeat: int = 3) -> Dict:
+    """Best-of-`repeat` import time (ms) of `target` plus the packages that spend the most of it."""
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _PROBE.format(target=target, forbidden=forbidden)],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"Importing {target} failed:\n{proc.stderr[-2000:]}")
+        rows = []
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+            if not cum_us.strip().isdigit():
+                continue  # header line
+            # nesting is encoded as 2 spaces per level after the single separator space
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            rows.append((name.strip(), int(self_us), int(cum_us), depth))
+        total_us = sum(cum for _, _, cum, depth in rows if depth == 0)
+        packages: Dict[str, int] = {}  # exclusive (self) time per top-level package
+        for name, self_t, _, _ in rows:
+            top = name.split(".")[0]
+            packages[top] = packages.get(top, 0) + self_t
+        loaded = proc.stdout.rsplit("__LOADED__", 1)[-1].strip()
+        run = {
+            "target": target,
+            "total_ms": round(total_us / 1000, 1),
+            "top_packages_ms": {k: round(v / 1000, 1)
+                                for k, v in sorted(packages.items(), key=lambda kv: -kv[1])[:8]},
+            "eager_forbidden": [m for m in loaded.split(",") if m],
+        }
+        if best is None or run["total_ms"] < best["total_ms"]:
+            best = run
+    return best
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("targets", nargs="*", default=DEFAULT_TARGETS)
+    ap.add_argument("--budget-ms", type=float, default=None, help="fail if any target exceeds this")
+    ap.add_argument("--forbid", default=",".join(DEFAULT_FORBIDDEN),
+                    help="comma-separated modules that must not be imported eagerly ('' to disable)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--json", dest="json_path", default=None, help="also write the report here")
+    args = ap.parse_args(argv)
+
+    forbidden = [m for m in args.forbid.split(",") if m]
+    report = [profile_import(t, forbidden, args.repeat) for t in args.targets]
+
+    failed = False
+    for r in report:
+        flags = []
+        if args.budget_ms is not None and r["total_ms"] > args.budget_ms:
+            flags.append(f"over budget ({args.budget_ms:.0f} ms)")
+        if r["eager_forbidden"]:
+            flags.append(f"eager imports: {', '.join(r['eager_forbidden'])}")
+        failed |= bool(flags)
+        top = ", ".join(f"{k} {v:.0f}" for k, v in r["top_packages_ms"].items())
+        print(f"{r['target']:<28} {r['total_ms']:>8.1f} ms   [{top}]" + (f"   !! {'; '.join(flags)}" if flags else ""))
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +1,15 @@
+# streamlit_app.py
+# Entry point: `streamlit run streamlit_app.py`. The phases live in pages/*.
+import streamlit as st
 
+from tools.warmup import start_warmup
+from ui.warmup_status import render_warmup_status
+
+# Opt-in (APP_WARMUP=1): load data, open the OpenAI connection and start the
+# sandbox pool in a background thread, once per server process.
+start_warmup()
+
+st.set_page_config(page_title="Biwenger EDA Chatbot", layout="wide")
+st.title("Biwenger EDA Chatbot")
+render_warmup_status()
+st.markdown("Pick a phase from the sidebar: read data, plan + filter, or plan + translate + execute.")
@@ -0,0 +1,360 @@
+# tools/code_sandbox.py
+# ----------------------------------------------------
+# Process-pool sandbox for LLM-generated pandas code.
+# Snippets run in pre-warmed worker processes with CPU / memory limits;
+# df_in is published once into shared memory and attached by the workers.
+# ----------------------------------------------------
+from __future__ import annotations
+import atexit
+import gc
+import logging
+import multiprocessing as mp
+import os
+import pickle
+import queue
+import signal
+import threading
+import time
+import traceback
+import weakref
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+try:  # POSIX only; on other platforms limits fall back to the wall-clock timeout
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+# ---------- 0) Defaults ----------
+DEFAULT_POOL_SIZE = int(os.getenv("SANDBOX_POOL_SIZE", "2"))
+DEFAULT_CPU_SECONDS = int(os.getenv("SANDBOX_CPU_SECONDS", "10"))
+DEFAULT_MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", "2048"))
+DEFAULT_WALL_TIMEOUT = float(os.getenv("SANDBOX_WALL_TIMEOUT", "30"))
+
+_MAX_FRAMES_PER_WORKER = 2
+_RESPAWN_ATTEMPTS = 3
+
+_log = logging.getLogger(__name__)
+
+
+class SandboxError(RuntimeError):
+    """Generated code failed inside the sandbox (exception, crash or limit)."""
+
+
+class SandboxTimeout(SandboxError):
+    """Generated code exceeded its CPU-time or wall-clock budget."""
+
+
+# ---------- 1) Shared-memory frames ----------
+class SharedFrame:
+    """
+    A DataFrame serialized ONCE into a shared-memory block.
+    Layout: [pickle stream][out-of-band buffer 0][buffer 1]...
+    Numeric column blocks travel as pickle-5 out-of-band buffers, so workers
+    rebuild them as zero-copy (read-only) views over the shared block.
+    """
+
+    def __init__(self, df):
+        buffers: List[pickle.PickleBuffer] = []
+        meta = pickle.dumps(df, protocol=5, buffer_callback=buffers.append)
+        raws = [b.raw() for b in buffers]
+
+        size = len(meta) + sum(r.nbytes for r in raws)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.shm.buf[: len(meta)] = meta
+
+        spans: List[Tuple[int, int]] = []
+        offset = len(meta)
+        for r in raws:
+            self.shm.buf[offset: offset + r.nbytes] = r.cast("B")
+            spans.append((offset, r.nbytes))
+            offset += r.nbytes
+
+        self.layout = {"name": self.shm.name, "meta_len": len(meta), "buffers": spans}
+
+    def close(self) -> None:
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _attach_frame(layout: dict) -> Tuple[shared_memory.SharedMemory, Any]:
+    """Worker side: map the block and rebuild the DataFrame without copying numeric data."""
+    # track=False: the parent owns the block's lifetime (unlink), not the worker
+    try:
+        shm = shared_memory.SharedMemory(name=layout["name"], track=False)
+    except TypeError:  # Python < 3.13: workers share the parent's resource tracker
+        shm = shared_memory.SharedMemory(name=layout["name"])
+    ro = shm.buf.toreadonly()
+    meta = ro[: layout["meta_len"]]
+    buffers = [ro[o: o + n] for o, n in layout["buffers"]]
+    return shm, pickle.loads(meta, buffers=buffers)
+
+
+# ---------- 2) Worker process ----------
+def _address_space_bytes() -> Optional[int]:
+    """Current virtual memory size (Linux), used as the base for RLIMIT_AS."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _set_limits(cpu_seconds: int, memory_mb: int) -> None:
+    if resource is None:
+        return
+    used = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_used = int(used.ru_utime + used.ru_stime) + 1
+    _, cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_used + cpu_seconds, cpu_hard))
+
+    base = _address_space_bytes()
+    if base is not None:
+        _, as_hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (base + memory_mb * 1024 * 1024, as_hard))
+
+
+def _clear_limits() -> None:
+    if resource is None:
+        return
+    for lim in (resource.RLIMIT_CPU, resource.RLIMIT_AS):
+        _, hard = resource.getrlimit(lim)
+        resource.setrlimit(lim, (hard, hard))
+
+
+def _worker_main(conn, cpu_seconds: int, memory_mb: int) -> None:
+    """
+    Worker loop. pandas is imported before the first request (pre-warm).
+    Request:  {"code": str, "frame": layout, "cpu_seconds": int, "memory_mb": int}
+    Response: ("ok", df_out) | ("error", formatted traceback)
+    """
+    import pandas as pd
+
+    frames: Dict[str, Tuple[shared_memory.SharedMemory, Any]] = {}
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+        if msg is None:
+            break
+
+        try:
+            layout = msg["frame"]
+            if layout["name"] not in frames:
+                if len(frames) >= _MAX_FRAMES_PER_WORKER:
+                    _drop_oldest_frame(frames)
+                frames[layout["name"]] = _attach_frame(layout)
+            df_in = frames[layout["name"]][1]
+
+            globals_ns = {"pd": pd}
+            locals_ns = {"df_in": df_in}
+            _set_limits(msg.get("cpu_seconds", cpu_seconds), msg.get("memory_mb", memory_mb))
+            try:
+                exec(msg["code"], globals_ns, locals_ns)
+            finally:
+                _clear_limits()
+
+            conn.send(("ok", locals_ns.get("df_out")))
+        except MemoryError:
+            _clear_limits()
+            conn.send(("error", "MemoryError: snippet exceeded the sandbox memory limit."))
+        except BaseException:
+            _clear_limits()
+            conn.send(("error", traceback.format_exc(limit=-2)))
+
+    globals_ns = locals_ns = df_in = None
+    while frames:
+        _drop_oldest_frame(frames)
+
+
+def _drop_oldest_frame(frames: Dict[str, Tuple[shared_memory.SharedMemory, Any]]) -> None:
+    name = next(iter(frames))
+    shm, df = frames.pop(name)
+    del df
+    gc.collect()  # release the numpy views before unmapping
+    try:
+        shm.close()
+    except BufferError:
+        pass  # views still referenced somewhere; the mapping goes away with the worker
+
+
+class _Worker:
+    def __init__(self, ctx, cpu_seconds: int, memory_mb: int):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(
+            target=_worker_main, args=(child, cpu_seconds, memory_mb), daemon=True
+        )
+        self.proc.start()
+        child.close()
+        self.conn.recv()  # block until pandas is imported
+
+    def kill(self) -> None:
+        try:
+            self.proc.kill()
+            self.proc.join(timeout=5)
+        finally:
+            self.conn.close()
+
+
+# ---------- 3) Pool ----------
+class CodeSandbox:
+    """
+    Fixed-size pool of pre-warmed worker processes.
+
+    run(code, df_in) executes one snippet on an idle worker and returns df_out.
+    A worker that times out, crashes or hits its CPU limit is killed and
+    replaced in the background; the other workers keep serving.
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_POOL_SIZE,
+        *,
+        cpu_seconds: int = DEFAULT_CPU_SECONDS,
+        memory_mb: int = DEFAULT_MEMORY_MB,
+        wall_timeout: float = DEFAULT_WALL_TIMEOUT,
+    ):
+        if size < 1:
+            raise ValueError("Sandbox pool size must be >= 1")
+        methods = mp.get_all_start_methods()
+        if "forkserver" in methods:
+            # the fork server imports pandas once; every (re)spawned worker inherits it
+            self._ctx = mp.get_context("forkserver")
+            self._ctx.set_forkserver_preload(["pandas", "tools.code_sandbox"])
+        else:
+            self._ctx = mp.get_context("spawn")
+
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.wall_timeout = wall_timeout
+
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._frames: Dict[int, SharedFrame] = {}
+        self._frames_lock = threading.Lock()
+        self._closed = False
+
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._ctx, self.cpu_seconds, self.memory_mb)
+
+    def _respawn_async(self) -> None:
+        def _bg():
+            for attempt in range(_RESPAWN_ATTEMPTS):
+                if self._closed:
+                    return
+                try:
+                    self._idle.put(self._spawn())
+                    return
+                except Exception:
+                    _log.warning("Sandbox worker respawn failed (attempt %d/%d)",
+                                 attempt + 1, _RESPAWN_ATTEMPTS, exc_info=True)
+                    time.sleep(0.5 * 2 ** attempt)
+            _log.error("Giving up respawning a sandbox worker; the pool is one worker short")
+        threading.Thread(target=_bg, name="sandbox-respawn", daemon=True).start()
+
+    # --- shared frames: one block per live DataFrame object ---
+    def _publish(self, df) -> SharedFrame:
+        key = id(df)
+        with self._frames_lock:
+            frame = self._frames.get(key)
+            if frame is None:
+                frame = SharedFrame(df)
+                self._frames[key] = frame
+                # unlink the block when the source frame is garbage-collected
+                weakref.finalize(df, self._release, key)
+            return frame
+
+    def _release(self, key: int) -> None:
+        with self._frames_lock:
+            frame = self._frames.pop(key, None)
+        if frame is not None:
+            frame.close()
+
+    # --- execution ---
+    def run(self, code: str, df_in, *, timeout: Optional[float] = None) -> Any:
+        """
+        Execute `code` against `df_in` in a worker and return its `df_out`.
+        Raises SandboxTimeout on CPU/wall-clock overrun, SandboxError otherwise.
+        """
+        if self._closed:
+            raise SandboxError("Sandbox has been shut down.")
+        frame = self._publish(df_in)
+        timeout = self.wall_timeout if timeout is None else timeout
+
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise SandboxError(f"No sandbox worker became available within {timeout:.0f}s.") from None
+        healthy = False
+        try:
+            worker.conn.send({
+                "code": code,
+                "frame": frame.layout,
+                "cpu_seconds": self.cpu_seconds,
+                "memory_mb": self.memory_mb,
+            })
+            if not worker.conn.poll(timeout):
+                raise SandboxTimeout(f"Snippet exceeded the {timeout:.0f}s wall-clock limit.")
+            try:
+                status, payload = worker.conn.recv()
+            except EOFError:
+                worker.proc.join(timeout=1)
+                if worker.proc.exitcode == -getattr(signal, "SIGXCPU", 0):
+                    raise SandboxTimeout(f"Snippet exceeded the {self.cpu_seconds}s CPU-time limit.")
+                raise SandboxError(f"Sandbox worker died (exit code {worker.proc.exitcode}).")
+
+            healthy = True
+            if status != "ok":
+                raise SandboxError(payload)
+            return payload
+        finally:
+            if healthy:
+                self._idle.put(worker)
+            else:
+                worker.kill()
+                self._respawn_async()
+
+    def shutdown(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                w = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                w.conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+            w.kill()
+        with self._frames_lock:
+            frames, self._frames = list(self._frames.values()), {}
+        for f in frames:
+            f.close()
+
+
+# ---------- 4) Process-wide singleton ----------
+_SANDBOX: Optional[CodeSandbox] = None
+_SANDBOX_LOCK = threading.Lock()
+
+
+def get_sandbox() -> CodeSandbox:
+    """Return the shared sandbox, starting (and pre-warming) it on first use."""
+    global _SANDBOX
+    with _SANDBOX_LOCK:
+        if _SANDBOX is None:
+            _SANDBOX = CodeSandbox()
+            atexit.register(_SANDBOX.shutdown)
+        return _SANDBOX
+
+
+def run_generated_code(code: str, df_in, *, timeout: Optional[float] = None) -> Any:
+    """Convenience wrapper: run a generated snippet on the shared sandbox."""
+    return get_sandbox().run(code, df_in, timeout=timeout)
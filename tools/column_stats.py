@@ -0,0 +1,212 @@
+# tools/column_stats.py
+# ----------------------------------------------------
+# Per-column statistics computed (vectorized) whenever a table version is loaded:
+#   null_frac, cardinality, min/max, distinct values + counts (low-cardinality
+#   columns) and equi-width histograms (numeric / datetime columns).
+# Used for filter selectivity ordering (apply_filters) and for always-current
+# canonical values in the planner context (schema_catalog).
+# ----------------------------------------------------
+from __future__ import annotations
+import threading
+import weakref
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_DISTINCT = 50   # keep distinct values + counts up to this cardinality
+DEFAULT_BINS = 16
+
+# Used when a filter's selectivity cannot be estimated from stats
+_DEFAULT_SELECTIVITY = {
+    "==": 0.1, "in": 0.2, "<": 0.33, "<=": 0.33, ">": 0.33, ">=": 0.33,
+    "contains": 0.5, "!=": 0.9, "not_in": 0.8,
+}
+
+
+def _py(v: Any) -> Any:
+    """numpy/pandas scalars -> plain Python (JSON-friendly) values."""
+    if isinstance(v, pd.Timestamp):
+        return v.isoformat()
+    return v.item() if hasattr(v, "item") else v
+
+
+def _column_stats(s: pd.Series, nulls: int, n: int, max_distinct: int, bins: int) -> Dict[str, Any]:
+    nonnull = s.dropna()
+    cs: Dict[str, Any] = {"dtype": str(s.dtype), "null_frac": round(nulls / n, 6) if n else 0.0}
+    try:
+        vc = nonnull.value_counts(sort=False)
+    except TypeError:  # unhashable cells (lists/dicts)
+        cs["cardinality"] = None
+        return cs
+    cs["cardinality"] = int(len(vc))
+    if len(vc) <= max_distinct:
+        pairs = [(_py(v), int(c)) for v, c in vc.items()]
+        try:
+            pairs.sort(key=lambda p: p[0])
+        except TypeError:
+            pairs.sort(key=lambda p: -p[1])
+        cs["values"] = pairs
+
+    kind = None
+    if pd.api.types.is_datetime64_any_dtype(s):
+        kind, arr = "datetime", nonnull.astype("int64").to_numpy()
+        cs["tz"] = getattr(s.dt, "tz", None) is not None
+    elif pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        kind, arr = "numeric", nonnull.to_numpy(dtype="float64")
+    if kind is not None:
+        cs["kind"] = kind
+        if len(arr):
+            counts, edges = np.histogram(arr, bins=bins)
+            cs["histogram"] = {"counts": counts.tolist(), "edges": edges.tolist()}
+            lo, hi = arr.min(), arr.max()
+            if kind == "datetime":
+                cs["min"], cs["max"] = pd.Timestamp(lo).isoformat(), pd.Timestamp(hi).isoformat()
+            else:
+                cs["min"], cs["max"] = _py(lo), _py(hi)
+    elif len(vc):
+        try:
+            cs["min"], cs["max"] = _py(nonnull.min()), _py(nonnull.max())
+        except TypeError:
+            pass
+    return cs
+
+
+def compute_column_stats(df: pd.DataFrame, *, max_distinct: int = DEFAULT_MAX_DISTINCT,
+                         bins: int = DEFAULT_BINS) -> Dict[str, Any]:
+    """Stats for every column of `df`: {"rows": n, "columns": {name: {...}}}."""
+    n = len(df)
+    nulls = df.isna().sum()
+    return {
+        "rows": n,
+        "columns": {
+            str(col): _column_stats(df[col], int(nulls[col]), n, max_distinct, bins)
+            for col in df.columns
+        },
+    }
+
+
+# ---------- 1) Selectivity estimates ----------
+def _compare(a: Any, op: str, b: Any) -> bool:
+    if op == "==":
+        return a == b
+    if op == "!=":
+        return a != b
+    if op == ">":
+        return a > b
+    if op == ">=":
+        return a >= b
+    if op == "<":
+        return a < b
+    if op == "<=":
+        return a <= b
+    if op == "in":
+        return a in b
+    if op == "not_in":
+        return a not in b
+    if op == "contains":
+        return str(b).lower() in str(a).lower()
+    raise ValueError(f"unsupported op '{op}'")
+
+
+def _fraction_below(hist: Dict[str, List[float]], x: float) -> float:
+    """Fraction of values < x, interpolating linearly inside a bin."""
+    counts, edges = np.asarray(hist["counts"], float), np.asarray(hist["edges"], float)
+    total = counts.sum()
+    if total == 0:
+        return 0.0
+    if x <= edges[0]:
+        return 0.0
+    if x > edges[-1]:
+        return 1.0
+    i = min(int(np.searchsorted(edges, x, side="right")) - 1, len(counts) - 1)
+    width = edges[i + 1] - edges[i]
+    part = (x - edges[i]) / width if width > 0 else 1.0
+    return float((counts[:i].sum() + counts[i] * part) / total)
+
+
+def _scalar_for(cs: Dict[str, Any], val: Any) -> float:
+    if cs.get("kind") == "datetime":
+        ts = pd.Timestamp(val)
+        if cs.get("tz") and ts.tzinfo is None:
+            ts = ts.tz_localize("UTC")
+        elif not cs.get("tz") and ts.tzinfo is not None:
+            ts = ts.tz_convert(None)
+        return float(ts.value)
+    return float(val)
+
+
+def estimate_selectivity(cs: Optional[Dict[str, Any]], op: str, val: Any) -> float:
+    """Estimated fraction of rows (0..1) that pass `col <op> val`, given that column's stats."""
+    if not cs:
+        return _DEFAULT_SELECTIVITY.get(op, 0.5)
+    present = 1.0 - cs.get("null_frac", 0.0)   # comparisons never match nulls
+    try:
+        values = cs.get("values")
+        if values is not None:
+            total = sum(c for _, c in values)
+            if total == 0:
+                return 0.0
+            arg = set(val) if op in {"in", "not_in"} else val
+            hit = sum(c for v, c in values if _compare(v, op, arg))
+            return present * hit / total
+        card = cs.get("cardinality") or 0
+        if op in {"==", "in"} and card:
+            k = len(val) if op == "in" else 1
+            return present * min(1.0, k / card)
+        if op in {"!=", "not_in"} and card:
+            k = len(val) if op == "not_in" else 1
+            return present * max(0.0, 1.0 - k / card)
+        hist = cs.get("histogram")
+        if hist is not None and op in {"<", "<=", ">", ">="}:
+            below = _fraction_below(hist, _scalar_for(cs, val))
+            return present * (below if op in {"<", "<="} else 1.0 - below)
+    except (TypeError, ValueError):
+        pass
+    return _DEFAULT_SELECTIVITY.get(op, 0.5)
+
+
+def order_filters(filters: List[Dict[str, Any]], stats: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Most selective filter first (stable for ties)."""
+    cols = (stats or {}).get("columns", {})
+    return sorted(filters, key=lambda f: estimate_selectivity(cols.get(f["col"]), f["op"], f["val"]))
+
+
+# ---------- 2) Catalog of the loaded table versions ----------
+class _Entry:
+    __slots__ = ("ref", "stats")
+
+    def __init__(self, df: pd.DataFrame, stats: Dict[str, Any]):
+        self.ref, self.stats = weakref.ref(df), stats
+
+
+_CATALOG: Dict[str, _Entry] = {}
+_LOCK = threading.Lock()
+
+
+def register_column_stats(table: str, df: pd.DataFrame, **kwargs) -> Dict[str, Any]:
+    """Compute stats for a freshly loaded table version and make them current for `table`."""
+    with _LOCK:
+        entry = _CATALOG.get(table)
+        if entry is not None and entry.ref() is df:
+            return entry.stats
+    stats = compute_column_stats(df, **kwargs)
+    with _LOCK:
+        _CATALOG[table] = _Entry(df, stats)
+    return stats
+
+
+def get_column_stats(table: str) -> Optional[Dict[str, Any]]:
+    """Stats of the most recently loaded version of `table` (None if never loaded)."""
+    with _LOCK:
+        entry = _CATALOG.get(table)
+        return entry.stats if entry is not None else None
+
+
+def stats_for_frame(df: pd.DataFrame) -> Optional[Dict[str, Any]]:
+    """Stats if `df` is exactly a registered table version, else None."""
+    with _LOCK:
+        for entry in _CATALOG.values():
+            if entry.ref() is df:
+                return entry.stats
+    return None
@@ -0,0 +1,72 @@
+# tools/conversation.py
+# ----------------------------------------------------
+# Per-session conversation state for multi-turn refinement.
+# The last plan and its result are kept (as a shared-dataset handle) so that
+# follow-ups like "now only midfielders" run only the new steps on it.
+# ----------------------------------------------------
+from __future__ import annotations
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from tools.schema_catalog import get_catalog_summary, get_schema_dict
+
+# Cap what we show the planner about the previous result
+_MAX_PREVIOUS_STEPS = 8
+
+
+@dataclass
+class ConversationState:
+    table: str = "biwenger_player_stats"
+    last_query: Optional[str] = None
+    last_plan: Optional[dict] = None
+    last_result: Any = None             # ResultHandle / DatasetHandle / DataFrame
+    history: List[str] = field(default_factory=list)
+
+    def remember(self, query: str, plan: dict, result: Any) -> None:
+        """Store the turn's plan and result as the base for the next refinement."""
+        self.last_query = query
+        self.last_plan = plan
+        self.last_result = result
+        self.history.append(query)
+
+    def reset(self) -> None:
+        self.last_query = self.last_plan = self.last_result = None
+        self.history.clear()
+
+    @property
+    def has_previous(self) -> bool:
+        return self.last_result is not None
+
+    def previous_frame(self):
+        r = self.last_result
+        return r.frame() if hasattr(r, "frame") else r
+
+    def previous_summary(self) -> Optional[Dict[str, Any]]:
+        """What the planner needs to decide whether (and how) to refine the last result."""
+        if not self.has_previous:
+            return None
+        df = self.previous_frame()
+        steps = (self.last_plan or {}).get("steps", [])[:_MAX_PREVIOUS_STEPS]
+        return {
+            "query": self.last_query,
+            "steps": steps,
+            "columns": [str(c) for c in getattr(df, "columns", [])],
+            "rows": len(df) if hasattr(df, "__len__") else None,
+        }
+
+
+def build_planner_context(table: str, conversation: Optional[ConversationState] = None) -> str:
+    """
+    Schema context for the planner: the main table in full, the other catalog tables
+    as a compact `datasets` list (name, loader, columns), plus a `previous_result`
+    block when the conversation has a result that a follow-up could refine.
+    """
+    ctx = dict(get_schema_dict(table))
+    others = get_catalog_summary(exclude=table)
+    if others:
+        ctx["datasets"] = others
+    prev = conversation.previous_summary() if conversation is not None else None
+    if prev is not None:
+        ctx["previous_result"] = prev
+    return json.dumps(ctx, ensure_ascii=False, indent=2, default=str)
@@ -1,6 +1,38 @@
-from typing import List, Dict, Any, Iterable
+from typing import List, Dict, Any, Iterable, Optional
+import numpy as np
 import pandas as pd
 
+from tools.schema_catalog import get_derived_columns
+from tools.column_stats import order_filters, stats_for_frame
+
+# ==============================================
+# DERIVED COLUMNS
+# ==============================================
+def materialize_derived_columns(df: pd.DataFrame, dataset: str) -> pd.DataFrame:
+    """
+    Add the dataset's derived columns (see schema_catalog._DERIVED_COLUMNS).
+    Vectorized; meant to run once per load, with the result cached alongside the table.
+    Definitions whose inputs are missing are skipped.
+    """
+    new_cols = {}
+    for d in get_derived_columns(dataset):
+        if d["left"] not in df.columns or d["right"] not in df.columns:
+            continue
+        a = pd.to_numeric(df[d["left"]], errors="coerce").to_numpy(dtype="float64")
+        b = pd.to_numeric(df[d["right"]], errors="coerce").to_numpy(dtype="float64")
+        if d["op"] == "div":
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out = np.where(b != 0, a / b, np.nan)
+        elif d["op"] == "sub":
+            out = a - b
+        else:
+            raise ValueError(f"Unknown derived op '{d['op']}' for column '{d['name']}'")
+        if d["dtype"].startswith("int") and not np.isnan(out).any():
+            out = out.astype("int64")
+        new_cols[d["name"]] = out
+    return df.assign(**new_cols) if new_cols else df
+
+
 # ==============================================
 # FILTERING
 # ==============================================
@@ -34,37 +66,216 @@ def validate_filters(filters: List[Dict[str, Any]], columns: Iterable[str]) -> N
             if not isinstance(val, (list, tuple, set)):
                 raise ValueError(f"filters[{i}].val must be a list/tuple/set for op '{op}'")
 
+def _filter_mask(s: pd.Series, op: str, val: Any) -> np.ndarray:
+    if op == "==":
+        m = (s == val)
+    elif op == "!=":
+        m = (s != val)
+    elif op == ">":
+        m = (s > val)
+    elif op == ">=":
+        m = (s >= val)
+    elif op == "<":
+        m = (s < val)
+    elif op == "<=":
+        m = (s <= val)
+    elif op == "in":
+        m = s.isin(list(val))
+    elif op == "not_in":
+        m = ~s.isin(list(val))
+    elif op == "contains":
+        # Case-insensitive substring match; safe on non-strings
+        m = s.astype(str).str.contains(str(val), case=False, na=False)
+    else:
+        raise ValueError(f"unsupported op '{op}'")
+    return m.fillna(False).to_numpy(dtype=bool)
+
 def apply_filters(df: pd.DataFrame, filters: List[Dict[str, Any]]) -> pd.DataFrame:
     """
     Deterministic, pandas-only filtering.
     Assumes df dtypes are already clean (dates are datetime64, numerics are numeric).
     Executes only the whitelisted ops defined above.
+    Filters run most selective first (column_stats estimates when df is a loaded
+    table version, else per-op defaults); each one only evaluates the rows that
+    survived the previous ones. Every filter is validated up front, and filters
+    skipped once no rows are left are still checked on one row, so an invalid
+    filter raises whatever the order.
     """
     validate_filters(filters, df.columns)
 
-    mask = pd.Series(True, index=df.index)
-    for f in filters:
-        col, op, val = f["col"], f["op"], f["val"]
-        s = df[col]
-
-        if op == "==":
-            mask &= (s == val)
-        elif op == "!=":
-            mask &= (s != val)
-        elif op == ">":
-            mask &= (s > val)
-        elif op == ">=":
-            mask &= (s >= val)
-        elif op == "<":
-            mask &= (s < val)
-        elif op == "<=":
-            mask &= (s <= val)
-        elif op == "in":
-            mask &= s.isin(list(val))
-        elif op == "not_in":
-            mask &= ~s.isin(list(val))
-        elif op == "contains":
-            # Case-insensitive substring match; safe on non-strings
-            mask &= s.astype(str).str.contains(str(val), case=False, na=False)
-
-    return df.loc[mask]
+    ordered = order_filters(filters, stats_for_frame(df))
+    pos: Optional[np.ndarray] = None
+    for i, f in enumerate(ordered):
+        s = df[f["col"]] if pos is None else df[f["col"]].iloc[pos]
+        m = _filter_mask(s, f["op"], f["val"])
+        pos = np.flatnonzero(m) if pos is None else pos[m]
+        if len(pos) == 0:
+            for rest in ordered[i + 1:]:
+                _filter_mask(df[rest["col"]].iloc[:1], rest["op"], rest["val"])
+            break
+
+    return df.iloc[pos]
+
+
+# ==============================================
+# PROJECTION / SORTING / TOP-K
+# ==============================================
+def _require_columns(df: pd.DataFrame, cols: Iterable[str], what: str) -> None:
+    missing = [c for c in cols if c not in df.columns]
+    if missing:
+        raise ValueError(f"{what}: unknown column(s) {missing}")
+
+def select_columns(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Keep only `columns`, in the given order."""
+    if not isinstance(columns, list) or not columns:
+        raise ValueError("columns must be a non-empty list")
+    _require_columns(df, columns, "select_columns")
+    return df[columns]
+
+def sort_df(df: pd.DataFrame, by: List[str], ascending: Any = True) -> pd.DataFrame:
+    """
+    Full sort by one or more columns. `ascending` is a bool or one bool per key.
+    NaNs always go last.
+    """
+    if isinstance(by, str):
+        by = [by]
+    if not by:
+        raise ValueError("by must be a non-empty list")
+    _require_columns(df, by, "sort_df")
+    if isinstance(ascending, (list, tuple)):
+        if len(ascending) != len(by):
+            raise ValueError("ascending must have one entry per 'by' column")
+        ascending = [bool(a) for a in ascending]
+    else:
+        ascending = bool(ascending)
+    return df.sort_values(by=by, ascending=ascending, kind="stable", na_position="last")
+
+def top_k(df: pd.DataFrame, col: str, k: int, ascending: bool = False) -> pd.DataFrame:
+    """
+    The k rows with the largest (or smallest, ascending=True) `col`, ordered.
+    Numeric columns use partial selection (np.partition, O(n)) and only sort the
+    k winners; ties at the cut-off keep the earliest rows. NaNs rank last.
+    """
+    _require_columns(df, [col], "top_k")
+    if not isinstance(k, int) or k < 0:
+        raise ValueError("k must be a non-negative int")
+    n = len(df)
+    if k == 0:
+        return df.iloc[:0]
+    s = df[col]
+    if k >= n or not pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+        return sort_df(df, [col], ascending).head(k)
+
+    key = s.to_numpy(dtype="float64", na_value=np.nan)
+    if not ascending:
+        key = -key
+    key = np.where(np.isnan(key), np.inf, key)
+
+    kth = np.partition(key, k - 1)[k - 1]
+    less = np.flatnonzero(key < kth)
+    ties = np.flatnonzero(key == kth)[: k - len(less)]
+    idx = np.concatenate([less, ties])
+    idx = idx[np.lexsort((idx, key[idx]))]  # by key, then original position (stable)
+    return df.iloc[idx]
+
+
+# ==============================================
+# AGGREGATION
+# ==============================================
+ALLOWED_AGGS = {"sum", "mean", "median", "min", "max", "count", "nunique", "std"}
+
+def validate_metrics(metrics: List[Dict[str, Any]], columns: Iterable[str]) -> None:
+    """
+    Validate aggregate metrics: a non-empty list of {col, agg[, as]}.
+    Raises ValueError with a precise message on any problem.
+    """
+    if not isinstance(metrics, list) or not metrics:
+        raise ValueError("metrics must be a non-empty list")
+    colset = set(columns)
+    seen = set()
+    for i, m in enumerate(metrics):
+        if not isinstance(m, dict):
+            raise ValueError(f"metrics[{i}] must be a dict")
+        for k in ("col", "agg"):
+            if k not in m:
+                raise ValueError(f"metrics[{i}] missing required key '{k}'")
+        if m["col"] not in colset:
+            raise ValueError(f"metrics[{i}]: unknown column '{m['col']}'")
+        if m["agg"] not in ALLOWED_AGGS:
+            raise ValueError(f"metrics[{i}]: unsupported agg '{m['agg']}'")
+        alias = m.get("as") or f"{m['agg']}_{m['col']}"
+        if alias in seen:
+            raise ValueError(f"metrics[{i}]: duplicate output name '{alias}'")
+        seen.add(alias)
+
+def aggregate_df(
+    df: pd.DataFrame,
+    metrics: List[Dict[str, Any]],
+    group_by: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Vectorized group-by aggregation.
+    Output: one row per group (or a single row without group_by), with the
+    group keys as columns followed by one column per metric named `as`
+    (default '<agg>_<col>'). Groups appear in order of first occurrence.
+    """
+    group_by = [group_by] if isinstance(group_by, str) else list(group_by or [])
+    _require_columns(df, group_by, "aggregate_df")
+    validate_metrics(metrics, df.columns)
+
+    named = {(m.get("as") or f"{m['agg']}_{m['col']}"): (m["col"], m["agg"]) for m in metrics}
+    if not group_by:
+        return pd.DataFrame({alias: [df[col].agg(agg)] for alias, (col, agg) in named.items()})
+    out = df.groupby(group_by, sort=False, dropna=False, observed=True).agg(**named)
+    return out.reset_index()
+
+
+# ==============================================
+# JOIN / LOOKUP
+# ==============================================
+ALLOWED_JOINS = {"inner", "left"}
+
+def _as_list(v: Any) -> List[str]:
+    return [v] if isinstance(v, str) else list(v or [])
+
+def join_df(
+    df: pd.DataFrame,
+    right: pd.DataFrame,
+    on: Any = None,
+    left_on: Any = None,
+    right_on: Any = None,
+    how: str = "inner",
+    columns: Optional[List[str]] = None,
+    suffix: str = "_right",
+) -> pd.DataFrame:
+    """
+    Vectorized hash join of `df` with `right` (the build side). `on` names keys shared by
+    both sides, or use `left_on`/`right_on`. Brings `columns` from `right` (default: all
+    but its keys); names already in `df` get `suffix`. how="left" keeps unmatched rows
+    (NaN right values). Left row order is kept; the index is reset.
+    The build side's hash table is cached per table version (tools.hash_join).
+    """
+    from tools.hash_join import hash_join
+
+    left_on = _as_list(left_on or on)
+    right_on = _as_list(right_on or on)
+    if not left_on or len(left_on) != len(right_on):
+        raise ValueError("join_df requires 'on', or 'left_on' and 'right_on' of the same length")
+    if how not in ALLOWED_JOINS:
+        raise ValueError(f"join_df: unsupported how '{how}' (use one of {sorted(ALLOWED_JOINS)})")
+    _require_columns(df, left_on, "join_df (left)")
+    _require_columns(right, right_on, "join_df (right)")
+    bring = [c for c in right.columns if c not in right_on] if columns is None else _as_list(columns)
+    _require_columns(right, bring, "join_df (right)")
+
+    left_pos, right_pos = hash_join(df, right, left_on, right_on, how)
+    out = df.take(left_pos).reset_index(drop=True)
+    matched = right_pos >= 0
+    if len(right):
+        picked = right[bring].take(np.maximum(right_pos, 0)).reset_index(drop=True)
+    else:
+        picked = right[bring].reindex(range(len(right_pos)))  # all NaN
+    if not matched.all():
+        picked = picked.where(pd.Series(matched))  # unmatched left rows: NaN
+    new_cols = {(f"{c}{suffix}" if c in out.columns else c): picked[c].to_numpy() for c in bring}
+    return out.assign(**new_cols)
@@ -0,0 +1,165 @@
+# tools/dataset_store.py
+# ----------------------------------------------------
+# Process-wide, reference-counted registry of read-only dataset versions.
+# Streamlit sessions keep small handles (and row-position arrays for their
+# results) instead of private DataFrame copies in st.session_state.
+# ----------------------------------------------------
+from __future__ import annotations
+import threading
+import weakref
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class _Version:
+    __slots__ = ("name", "key", "df", "refs")
+
+    def __init__(self, name: str, key: int, df: pd.DataFrame):
+        self.name, self.key, self.df, self.refs = name, key, df, 0
+
+
+class DatasetRegistry:
+    """
+    One entry per (dataset, loaded frame). The newest version of each dataset
+    stays registered even with no references; older versions are dropped as
+    soon as their last handle goes away.
+
+    Frames are shared and must be treated as read-only: consumers copy before mutating.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[int, _Version] = {}   # id(df) -> version (the strong ref pins the id)
+        self._latest: Dict[str, int] = {}
+
+    def acquire(self, name: str, df: pd.DataFrame) -> "DatasetHandle":
+        """Register `df` as the current version of `name` (if new) and return a handle to it."""
+        key = id(df)
+        with self._lock:
+            v = self._versions.get(key)
+            if v is None:
+                v = _Version(name, key, df)
+                self._versions[key] = v
+                prev = self._latest.get(name)
+                self._latest[name] = key
+                if prev is not None and prev != key and self._versions[prev].refs == 0:
+                    del self._versions[prev]
+            v.refs += 1
+        return DatasetHandle(self, v)
+
+    def _release(self, key: int) -> None:
+        with self._lock:
+            v = self._versions.get(key)
+            if v is None:
+                return
+            v.refs -= 1
+            if v.refs <= 0 and self._latest.get(v.name) != key:
+                del self._versions[key]
+
+    def forget(self, name: str) -> None:
+        """
+        Unpin the newest version of `name` (e.g. its table left the cache); it is
+        dropped now if unreferenced, else when its last handle goes away.
+        """
+        with self._lock:
+            key = self._latest.pop(name, None)
+            v = self._versions.get(key) if key is not None else None
+            if v is not None and v.refs <= 0:
+                del self._versions[key]
+
+    def stats(self) -> List[dict]:
+        """Registered versions with their reference counts and memory (for debug panels)."""
+        with self._lock:
+            return [
+                {
+                    "dataset": v.name,
+                    "version": f"{v.key:x}",
+                    "latest": self._latest.get(v.name) == v.key,
+                    "refs": v.refs,
+                    "rows": len(v.df),
+                    "bytes": int(v.df.memory_usage(deep=False).sum()),
+                }
+                for v in self._versions.values()
+            ]
+
+
+class DatasetHandle:
+    """A counted reference to a shared dataset version; released on release() or GC."""
+
+    def __init__(self, registry: DatasetRegistry, version: _Version):
+        self.name = version.name
+        self._version = version
+        self._finalizer = weakref.finalize(self, registry._release, version.key)
+
+    def frame(self) -> pd.DataFrame:
+        return self._version.df
+
+    def release(self) -> None:
+        self._finalizer()
+
+    def __len__(self) -> int:
+        return len(self._version.df)
+
+
+class ResultHandle:
+    """
+    A query result expressed against a shared dataset: row positions + columns.
+    Falls back to owning a private frame when the result is not a row/column
+    subset of the base (e.g. aggregations or computed columns).
+    """
+
+    def __init__(self, base: Optional[DatasetHandle], positions: Optional[np.ndarray] = None,
+                 columns: Optional[List[str]] = None, owned: Optional[pd.DataFrame] = None):
+        self.base = base
+        self.positions = positions
+        self.columns = columns
+        self._owned = owned
+
+    @property
+    def is_view(self) -> bool:
+        return self._owned is None
+
+    def frame(self) -> pd.DataFrame:
+        if self._owned is not None:
+            return self._owned
+        return self.base.frame().iloc[self.positions][self.columns]
+
+    def __len__(self) -> int:
+        return len(self._owned) if self._owned is not None else len(self.positions)
+
+
+def make_result_handle(base: Optional[DatasetHandle], df_out: Any) -> ResultHandle:
+    """
+    Express `df_out` as positions into `base` when it is an unmodified row/column
+    subset of it (verified), otherwise keep it as a private frame.
+    """
+    if isinstance(base, ResultHandle):
+        # refinement of an earlier result: index labels still refer to its dataset
+        base = base.base if base.is_view else None
+    if base is None or not isinstance(df_out, pd.DataFrame):
+        return ResultHandle(None, owned=df_out)
+
+    src = base.frame()
+    cols = list(df_out.columns)
+    if src.index.is_unique and not df_out.columns.has_duplicates and set(cols) <= set(src.columns):
+        pos = src.index.get_indexer(df_out.index)
+        if len(pos) == 0 or pos.min() >= 0:
+            pos = pos.astype(np.int32 if len(src) < 2**31 else np.int64)
+            if src.iloc[pos][cols].equals(df_out):
+                return ResultHandle(base, positions=pos, columns=cols)
+    return ResultHandle(None, owned=df_out)
+
+
+# ---------- Process-wide registry ----------
+_REGISTRY = DatasetRegistry()
+
+
+def get_dataset_registry() -> DatasetRegistry:
+    return _REGISTRY
+
+
+def acquire_dataset(name: str, df: pd.DataFrame) -> DatasetHandle:
+    """Shortcut for get_dataset_registry().acquire(name, df)."""
+    return _REGISTRY.acquire(name, df)
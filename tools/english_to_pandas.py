@@ -1,8 +1,15 @@
 # tools/english_to_pandas.py
 from __future__ import annotations
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
 import textwrap
-from llm_clients.openai_client import get_openai_client, get_default_model
+from llm_clients.openai_client import get_openai_client, get_async_openai_client, get_default_model, get_model_tiers
+from llm_clients.metering import translation_model
+from llm_clients.batch import BatchResult, arun_batch, run_blocking, DEFAULT_CONCURRENCY
+from llm_clients.scheduler import PRIORITY_INTERACTIVE, PRIORITY_BATCH, scheduled_create, ascheduled_create
+from tools.tracing import span
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
 # Optional: normalize dtypes just for the prompt (keeps it short & clear)
 _DTYPE_MAP = {
@@ -15,6 +22,10 @@ _DTYPE_MAP = {
 def _norm_dtype(d: str) -> str:
     return _DTYPE_MAP.get(d, d)
 
+def _code_model() -> str:
+    """Default model, the cheapest tier under budget pressure; BudgetExceeded once it is spent."""
+    return translation_model(get_default_model(), get_model_tiers()[0])
+
 class EnglishToPandas:
     """
     NL -> pandas code (string). Assumes df_in already exists (loaded elsewhere).
@@ -24,19 +35,13 @@ class EnglishToPandas:
     def __init__(self):
         pass
 
-    def generate_code(
+    def build_messages(
         self,
         user_query: str,
-        schema_spec: Dict[str, Any],          # <- pass _SCHEMA_REGISTRY[table]
+        schema_spec: Dict[str, Any],
         alias_hints: Optional[Dict[str, str]] = None
-    ) -> str:
-        """
-        Returns a pandas snippet as a string. The snippet MUST:
-          - import pandas as pd
-          - start with: df = df_in.copy()
-          - coerce date columns before comparisons if used
-          - end with: df_out = df
-        """
+    ) -> List[Dict[str, str]]:
+        """Build the chat messages for one translation (shared by sync, async and batch calls)."""
 
         # --- derive prompt context directly from your registry shape ---
         # columns: list of {"name","dtype"} -> dict name->dtype (normalized for readability)
@@ -54,6 +59,9 @@ class EnglishToPandas:
         season_canon = (vh.get("season", {}) or {}).get("values", [])
 
         columns_block = "\n".join(f"- {name}: {dtype}" for name, dtype in cols.items()) or "None"
+        derived_str = ", ".join(
+            f"{c['name']} = {c['formula']}" for c in cols_list if c.get("derived")
+        ) or "None"
         alias_hints = alias_hints or {}
         alias_str = ", ".join(f"{k} -> {v}" for k, v in alias_hints.items()) or "None"
 
@@ -72,6 +80,7 @@ class EnglishToPandas:
                 - Use ONLY these columns and dtypes:
                 {columns_block}
                 - Date columns: {date_cols}
+                - Precomputed derived columns (use them directly; do NOT recompute): {derived_str}
                 - {canon_block}
                 - Alias hints: {alias_str}
                 - Categorical policy:
@@ -94,21 +103,39 @@ class EnglishToPandas:
                 {user_query}
                 """).strip()
 
-        # --- Call OpenAI directly (simple + explicit) ---
-        client = get_openai_client()
-        model = get_default_model()
-
-        messages = [
+        return [
             {"role": "system", "content": "You output ONLY valid Python pandas code — no prose."},
             {"role": "user", "content": prompt},
         ]
 
-        resp = client.chat.completions.create(
-            model=model,
-            messages=messages,
-        )
+    def generate_code(
+        self,
+        user_query: str,
+        schema_spec: Dict[str, Any],          # <- pass _SCHEMA_REGISTRY[table]
+        alias_hints: Optional[Dict[str, str]] = None,
+        *,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> str:
+        """
+        Returns a pandas snippet as a string. The snippet MUST:
+          - import pandas as pd
+          - start with: df = df_in.copy()
+          - coerce date columns before comparisons if used
+          - end with: df_out = df
+        Raises llm_clients.metering.BudgetExceeded when the LLM budget is spent.
+        """
+        with span("generate_code") as sp:
+            messages = self.build_messages(user_query, schema_spec, alias_hints)
+
+            # --- Call OpenAI directly (simple + explicit) ---
+            client = get_openai_client()
+            model = _code_model()
 
-        raw = (resp.choices[0].message.content or "").strip()
+            resp = scheduled_create(client, {"model": model, "messages": messages},
+                                    priority=priority, name="openai.code")
+
+            raw = (resp.choices[0].message.content or "").strip()
+            sp.set(model=model, code_chars=len(raw))
 
         # # tolerate fenced responses (``` or ```python/```json)
         # if raw.startswith("```"):
@@ -119,3 +146,59 @@ class EnglishToPandas:
         #     raw = raw.strip()
 
         return raw
+
+
+    async def agenerate_code(
+        self,
+        user_query: str,
+        schema_spec: Dict[str, Any],
+        alias_hints: Optional[Dict[str, str]] = None,
+        *,
+        client: Optional[AsyncOpenAI] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> str:
+        """Async variant of generate_code."""
+        with span("generate_code") as sp:
+            messages = self.build_messages(user_query, schema_spec, alias_hints)
+            client = client or get_async_openai_client()
+            model = _code_model()
+            resp = await ascheduled_create(
+                client, {"model": model, "messages": messages},
+                priority=priority, name="openai.code",
+            )
+            raw = (resp.choices[0].message.content or "").strip()
+            sp.set(model=model, code_chars=len(raw))
+        return raw
+
+    async def agenerate_code_batch(
+        self,
+        user_queries: List[str],
+        schema_spec: Dict[str, Any],
+        alias_hints: Optional[Dict[str, str]] = None,
+        *,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> List[BatchResult]:
+        """
+        Translate many queries concurrently (at most `concurrency` in flight).
+        One BatchResult per query, in input order; `result` is the code string.
+        Requests are queued at batch priority, behind interactive ones.
+        """
+        client = get_async_openai_client()
+        return await arun_batch(
+            user_queries,
+            lambda q: self.agenerate_code(q, schema_spec, alias_hints, client=client, priority=PRIORITY_BATCH),
+            concurrency=concurrency,
+        )
+
+    def generate_code_batch(
+        self,
+        user_queries: List[str],
+        schema_spec: Dict[str, Any],
+        alias_hints: Optional[Dict[str, str]] = None,
+        *,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> List[BatchResult]:
+        """Blocking wrapper around agenerate_code_batch for offline jobs."""
+        return run_blocking(
+            self.agenerate_code_batch(user_queries, schema_spec, alias_hints, concurrency=concurrency)
+        )
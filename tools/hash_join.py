@@ -0,0 +1,101 @@
+# tools/hash_join.py
+# ----------------------------------------------------
+# Vectorized hash join for join_df, with the build side cached per table version.
+#   HashIndex(right, keys)     hash table of the key values (a pandas Index) plus the
+#                              right-row positions grouped by key (one-to-many safe)
+#   get_hash_index(right, keys) cached: built once per (frame version, keys); repeated
+#                              joins against the same loaded table only probe
+#   hash_join(left, right, ...) -> (left positions, right positions; -1 = no match)
+# Entries hold a weak reference to the frame (like tools.column_stats), so a table that
+# leaves the cache (tools.table_cache) takes its hash index with it.
+# ----------------------------------------------------
+from __future__ import annotations
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+MAX_CACHED_INDEXES = 16
+
+
+def _key_values(df: pd.DataFrame, keys: List[str]):
+    return df[keys[0]] if len(keys) == 1 else pd.MultiIndex.from_frame(df[keys])
+
+
+class HashIndex:
+    """Build side of a hash join: distinct keys -> rows of `df` holding them."""
+
+    def __init__(self, df: pd.DataFrame, keys: List[str]):
+        self.keys = list(keys)
+        self.rows = len(df)
+        codes, uniques = pd.factorize(_key_values(df, self.keys))  # NaN keys -> -1, never match
+        self.uniques = pd.Index(uniques)
+        self.uniques.get_indexer(self.uniques[:1])  # build the Index's hash table now, not on first probe
+        valid = codes >= 0
+        self.counts = np.bincount(codes[valid], minlength=len(self.uniques))
+        self.starts = np.concatenate([[0], np.cumsum(self.counts)[:-1]]).astype(np.int64)
+        self.order = np.flatnonzero(valid)[np.argsort(codes[valid], kind="stable")]  # rows grouped by key
+        self.unique_keys = bool(len(self.counts) == 0 or self.counts.max() <= 1)
+
+    def probe(self, left: pd.DataFrame, left_keys: List[str], how: str = "inner") -> Tuple[np.ndarray, np.ndarray]:
+        """Matching (left position, right position) pairs in left order; -1 on the right for unmatched left rows."""
+        codes = self.uniques.get_indexer(_key_values(left, left_keys))
+        hit = codes >= 0
+        n = len(codes)
+        if self.unique_keys:
+            right = np.where(hit, self.order[self.starts[np.where(hit, codes, 0)]] if len(self.order) else -1, -1)
+            if how == "left":
+                return np.arange(n), right
+            return np.flatnonzero(hit), right[hit]
+
+        per_row = np.where(hit, self.counts[np.where(hit, codes, 0)], 0)
+        if how == "left":
+            per_row = np.maximum(per_row, 1)  # unmatched rows are kept once
+        total = int(per_row.sum())
+        left_pos = np.repeat(np.arange(n), per_row)
+        offsets = np.arange(total) - np.repeat(np.cumsum(per_row) - per_row, per_row)
+        row_codes = np.repeat(codes, per_row)
+        matched = row_codes >= 0
+        right_pos = np.full(total, -1, dtype=np.int64)
+        right_pos[matched] = self.order[self.starts[row_codes[matched]] + offsets[matched]]
+        return left_pos, right_pos
+
+
+# ---------- Cache: one index per (frame version, keys) ----------
+_LOCK = threading.Lock()
+_INDEXES: "OrderedDict[Tuple[int, tuple], Tuple[weakref.ref, HashIndex]]" = OrderedDict()
+_COUNTS: Dict[str, int] = {"hits": 0, "builds": 0}
+
+
+def get_hash_index(df: pd.DataFrame, keys: List[str]) -> HashIndex:
+    cache_key = (id(df), tuple(keys))
+    with _LOCK:
+        entry = _INDEXES.get(cache_key)
+        if entry is not None and entry[0]() is df:
+            _INDEXES.move_to_end(cache_key)
+            _COUNTS["hits"] += 1
+            return entry[1]
+    index = HashIndex(df, keys)
+    with _LOCK:
+        _INDEXES[cache_key] = (weakref.ref(df), index)
+        _COUNTS["builds"] += 1
+        for k in [k for k, (ref, _) in _INDEXES.items() if ref() is None]:
+            del _INDEXES[k]  # frames that were dropped since
+        while len(_INDEXES) > MAX_CACHED_INDEXES:
+            _INDEXES.popitem(last=False)
+    return index
+
+
+def hash_index_stats() -> Dict[str, int]:
+    with _LOCK:
+        live = sum(ref() is not None for ref, _ in _INDEXES.values())
+        return {**_COUNTS, "cached": live}
+
+
+def hash_join(left: pd.DataFrame, right: pd.DataFrame, left_on: List[str], right_on: List[str],
+              how: str = "inner") -> Tuple[np.ndarray, np.ndarray]:
+    """Row positions of the join result; the right side's hash index is cached."""
+    return get_hash_index(right, right_on).probe(left, left_on, how)
@@ -0,0 +1,412 @@
+# tools/pandas_compiler.py
+# ----------------------------------------------------
+# Compile simple translate_to_pandas snippets (boolean filters, column
+# selection, sort, head) into deterministic steps executed with
+# apply_filters. Anything else falls back to the sandboxed exec.
+# ----------------------------------------------------
+from __future__ import annotations
+import ast
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from tools.dataframe_transformation_tools import apply_filters
+from tools.tracing import span
+
+# Compiled program = list of plan-like steps: {"tool": ..., "args": {...}}
+#   coerce_datetime  {"columns": [...]}
+#   filter_df        {"filters": [{col, op, val}, ...]}   (same IR as the planner)
+#   select_columns   {"columns": [...]}
+#   sort_df          {"by": [...], "ascending": [...]}
+#   limit_df         {"n": int}
+#   reset_index      {}
+
+
+class UnsupportedCode(ValueError):
+    """The snippet uses a construct the deterministic engine cannot express."""
+
+
+_CMP_OPS = {
+    ast.Eq: "==", ast.NotEq: "!=",
+    ast.Gt: ">", ast.GtE: ">=",
+    ast.Lt: "<", ast.LtE: "<=",
+}
+_FLIPPED = {"==": "==", "!=": "!=", ">": "<", ">=": "<=", "<": ">", "<=": ">="}
+_NEGATED = {"==": "!=", "!=": "==", "in": "not_in", "not_in": "in"}
+
+_SOURCE = "df_in"
+
+
+# ---------- 1) Expression helpers ----------
+def _literal(node: ast.AST) -> Any:
+    """Literal value, also accepting pd.Timestamp('...') / pd.to_datetime('...') as ISO strings."""
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == "pd"
+        and node.func.attr in {"Timestamp", "to_datetime"}
+        and len(node.args) == 1
+        and not node.keywords
+    ):
+        node = node.args[0]
+    try:
+        val = ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError):
+        raise UnsupportedCode(f"non-literal value: {ast.unparse(node)}")
+    if isinstance(val, (tuple, set)):
+        val = list(val)
+    return val
+
+
+def _column_of(node: ast.AST, frame: str) -> str:
+    """df['col'] / df.col on the given frame variable -> 'col'."""
+    if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == frame:
+        key = node.slice
+        if isinstance(key, ast.Constant) and isinstance(key.value, str):
+            return key.value
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == frame:
+        return node.attr
+    raise UnsupportedCode(f"not a column reference: {ast.unparse(node)}")
+
+
+def _is_column(node: ast.AST, frame: str) -> bool:
+    try:
+        _column_of(node, frame)
+        return True
+    except UnsupportedCode:
+        return False
+
+
+def _kwargs(call: ast.Call) -> Dict[str, Any]:
+    return {k.arg: _literal(k.value) for k in call.keywords if k.arg}
+
+
+def _str_list(node: ast.AST) -> List[str]:
+    val = _literal(node)
+    if isinstance(val, str):
+        val = [val]
+    if not isinstance(val, list) or not all(isinstance(v, str) for v in val):
+        raise UnsupportedCode(f"expected column name(s): {ast.unparse(node)}")
+    return val
+
+
+# ---------- 2) Boolean masks -> filters ----------
+class _MaskCompiler:
+    def __init__(self, frame: str, named_masks: Dict[str, List[dict]]):
+        self.frame = frame
+        self.named_masks = named_masks
+
+    def compile(self, node: ast.AST) -> List[dict]:
+        if isinstance(node, ast.Name) and node.id in self.named_masks:
+            return list(self.named_masks[node.id])
+
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitAnd):
+            return self.compile(node.left) + self.compile(node.right)
+
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+            return [self._or_to_in(node)]
+
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Invert):
+            inner = self.compile(node.operand)
+            if len(inner) != 1 or inner[0]["op"] not in _NEGATED:
+                raise UnsupportedCode("negation of a compound mask")
+            f = inner[0]
+            return [{"col": f["col"], "op": _NEGATED[f["op"]], "val": f["val"]}]
+
+        if isinstance(node, ast.Compare):
+            return [self._compare(node)]
+
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            return self._method(node)
+
+        raise UnsupportedCode(f"unsupported mask: {ast.unparse(node)}")
+
+    def _compare(self, node: ast.Compare) -> dict:
+        if len(node.ops) != 1 or type(node.ops[0]) not in _CMP_OPS:
+            raise UnsupportedCode("chained or unsupported comparison")
+        op = _CMP_OPS[type(node.ops[0])]
+        left, right = node.left, node.comparators[0]
+        if _is_column(left, self.frame):
+            return {"col": _column_of(left, self.frame), "op": op, "val": _literal(right)}
+        if _is_column(right, self.frame):
+            return {"col": _column_of(right, self.frame), "op": _FLIPPED[op], "val": _literal(left)}
+        raise UnsupportedCode("comparison without a column")
+
+    def _method(self, node: ast.Call) -> List[dict]:
+        attr = node.func.attr
+        target = node.func.value
+
+        if attr == "isin" and len(node.args) == 1 and not node.keywords:
+            val = _literal(node.args[0])
+            if not isinstance(val, list):
+                raise UnsupportedCode("isin() needs a literal list")
+            return [{"col": _column_of(target, self.frame), "op": "in", "val": val}]
+
+        if attr == "between" and len(node.args) == 2:
+            inclusive = _kwargs(node).get("inclusive", "both")
+            if inclusive != "both":
+                raise UnsupportedCode("between() with non-inclusive bounds")
+            col = _column_of(target, self.frame)
+            return [
+                {"col": col, "op": ">=", "val": _literal(node.args[0])},
+                {"col": col, "op": "<=", "val": _literal(node.args[1])},
+            ]
+
+        # df['col'].str.contains('x', case=False[, na=False])  (apply_filters is case-insensitive)
+        if (
+            attr == "contains"
+            and isinstance(target, ast.Attribute)
+            and target.attr == "str"
+            and len(node.args) == 1
+        ):
+            kw = _kwargs(node)
+            if kw.get("case", True) is not False or kw.get("na", False) is not False:
+                raise UnsupportedCode("str.contains() must be case=False, na=False")
+            if set(kw) - {"case", "na", "regex"}:
+                raise UnsupportedCode("unsupported str.contains() options")
+            if kw.get("regex", True) is not True:
+                raise UnsupportedCode("str.contains(regex=False): filter_df 'contains' matches a regex")
+            val = _literal(node.args[0])
+            return [{"col": _column_of(target.value, self.frame), "op": "contains", "val": val}]
+
+        raise UnsupportedCode(f"unsupported method in mask: .{attr}()")
+
+    def _or_to_in(self, node: ast.BinOp) -> dict:
+        """(df.c == a) | (df.c == b) | ...  ->  {c in [a, b, ...]}"""
+        parts: List[dict] = []
+
+        def _walk(n: ast.AST):
+            if isinstance(n, ast.BinOp) and isinstance(n.op, ast.BitOr):
+                _walk(n.left)
+                _walk(n.right)
+            else:
+                branch = self.compile(n)
+                if len(branch) != 1:  # an AND inside an OR branch is not a value list
+                    raise UnsupportedCode("OR branch with more than one condition")
+                parts.extend(branch)
+
+        _walk(node)
+        cols = {p["col"] for p in parts}
+        if len(cols) != 1 or any(p["op"] not in {"==", "in"} for p in parts):
+            raise UnsupportedCode("OR across different columns or ops")
+        vals: List[Any] = []
+        for p in parts:
+            vals.extend(p["val"] if p["op"] == "in" else [p["val"]])
+        return {"col": cols.pop(), "op": "in", "val": vals}
+
+
+# ---------- 3) Statement compiler ----------
+class _Compiler:
+    def __init__(self):
+        self.steps: List[dict] = []
+        self.frame: Optional[str] = None         # variable currently holding the working frame
+        self.masks: Dict[str, Tuple[int, List[dict]]] = {}  # name -> (frame version, filters)
+        self.version = 0
+        self.done = False
+
+    def _emit(self, tool: str, **args) -> None:
+        # merge adjacent filters into one filter_df step
+        if tool == "filter_df" and self.steps and self.steps[-1]["tool"] == "filter_df":
+            self.steps[-1]["args"]["filters"].extend(args["filters"])
+        else:
+            self.steps.append({"tool": tool, "args": args})
+        self.version += 1
+
+    def _live_masks(self) -> Dict[str, List[dict]]:
+        return {k: f for k, (v, f) in self.masks.items() if v == self.version}
+
+    def chain(self, node: ast.AST) -> None:
+        """Compile an expression producing a new frame from the working frame."""
+        if isinstance(node, ast.Name):
+            if node.id == self.frame or (self.frame is None and node.id == _SOURCE):
+                self.frame = self.frame or node.id
+                return
+            raise UnsupportedCode(f"unknown frame variable: {node.id}")
+
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            attr = node.func.attr
+            self.chain(node.func.value)
+
+            if attr == "copy" and not node.args:
+                return
+            if attr == "reset_index" and _kwargs(node) == {"drop": True} and not node.args:
+                self._emit("reset_index")
+                return
+            if attr == "head":
+                n = _literal(node.args[0]) if node.args else _kwargs(node).get("n", 5)
+                if not isinstance(n, int) or n < 0:
+                    raise UnsupportedCode("head() needs a non-negative int")
+                self._emit("limit_df", n=n)
+                return
+            if attr == "sort_values":
+                kw = _kwargs(node)
+                if node.args:
+                    kw["by"] = _literal(node.args[0])
+                if set(kw) - {"by", "ascending"} or "by" not in kw:
+                    raise UnsupportedCode("unsupported sort_values() options")
+                by = [kw["by"]] if isinstance(kw["by"], str) else list(kw["by"])
+                asc = kw.get("ascending", True)
+                asc = list(asc) if isinstance(asc, list) else [bool(asc)] * len(by)
+                if len(asc) != len(by):
+                    raise UnsupportedCode("sort_values() ascending/by length mismatch")
+                self._emit("sort_df", by=by, ascending=asc)
+                return
+            raise UnsupportedCode(f"unsupported method: .{attr}()")
+
+        if isinstance(node, ast.Subscript):
+            base = node.value
+            if isinstance(base, ast.Attribute) and base.attr == "loc":
+                self.chain(base.value)
+                self._loc(node.slice)
+                return
+            self.chain(base)
+            self._getitem(node.slice)
+            return
+
+        raise UnsupportedCode(f"unsupported expression: {ast.unparse(node)}")
+
+    def _filters(self, node: ast.AST) -> List[dict]:
+        return _MaskCompiler(self.frame, self._live_masks()).compile(node)
+
+    def _getitem(self, key: ast.AST) -> None:
+        if isinstance(key, (ast.List, ast.Tuple)) or (
+            isinstance(key, ast.Constant) and isinstance(key.value, str)
+        ):
+            if isinstance(key, ast.Constant):
+                raise UnsupportedCode("single-column selection returns a Series")
+            self._emit("select_columns", columns=_str_list(key))
+            return
+        self._emit("filter_df", filters=self._filters(key))
+
+    def _loc(self, key: ast.AST) -> None:
+        rows, cols = key, None
+        if isinstance(key, ast.Tuple) and len(key.elts) == 2:
+            rows, cols = key.elts
+        if not (isinstance(rows, ast.Slice) and rows.lower is None and rows.upper is None and rows.step is None):
+            self._emit("filter_df", filters=self._filters(rows))
+        if cols is not None:
+            if not isinstance(cols, ast.List):
+                raise UnsupportedCode("df.loc[..., 'col'] returns a Series; only list column keys compile")
+            self._emit("select_columns", columns=_str_list(cols))
+
+    def statement(self, stmt: ast.stmt) -> None:
+        if self.done:
+            raise UnsupportedCode("statements after df_out assignment")
+
+        if isinstance(stmt, ast.Import):
+            if [(a.name, a.asname) for a in stmt.names] != [("pandas", "pd")]:
+                raise UnsupportedCode("only 'import pandas as pd' is allowed")
+            return
+        if isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant):
+            return  # docstring / bare string
+
+        if not isinstance(stmt, ast.Assign) or len(stmt.targets) != 1:
+            raise UnsupportedCode(f"unsupported statement: {ast.unparse(stmt)}")
+        target, value = stmt.targets[0], stmt.value
+
+        # df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        if isinstance(target, ast.Subscript) and self.frame is not None:
+            col = _column_of(target, self.frame)
+            if (
+                isinstance(value, ast.Call)
+                and ast.unparse(value.func) == "pd.to_datetime"
+                and len(value.args) == 1
+                and _is_column(value.args[0], self.frame)
+                and _column_of(value.args[0], self.frame) == col
+                and _kwargs(value) in ({}, {"errors": "coerce"})
+            ):
+                self._emit("coerce_datetime", columns=[col])
+                return
+            raise UnsupportedCode("column assignment")
+
+        if not isinstance(target, ast.Name):
+            raise UnsupportedCode("unsupported assignment target")
+
+        name = target.id
+        if name == "df_out":
+            self.chain(value)
+            self.done = True
+            return
+        if name == self.frame or (self.frame is None and name != _SOURCE):
+            if self.frame is None:
+                self.chain(value)   # must start from df_in
+                self.frame = name
+            else:
+                self.chain(value)
+            return
+        if self.frame is not None:
+            # a named boolean mask over the working frame (e.g. mask = (df.a > 1) & ...)
+            self.masks[name] = (self.version, self._filters(value))
+            return
+        raise UnsupportedCode(f"unsupported assignment to '{name}'")
+
+
+def compile_pandas_code(code: str) -> List[dict]:
+    """
+    Compile a generated snippet into deterministic steps.
+    Raises UnsupportedCode if any statement falls outside the supported subset.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        raise UnsupportedCode(f"syntax error: {e}")
+
+    c = _Compiler()
+    for stmt in tree.body:
+        c.statement(stmt)
+    if not c.done:
+        raise UnsupportedCode("snippet never assigns df_out")
+    return c.steps
+
+
+# ---------- 4) Execution ----------
+def run_compiled(df_in: pd.DataFrame, steps: List[dict]) -> pd.DataFrame:
+    """Execute a compiled program. Filters go through apply_filters."""
+    df = df_in
+    for step in steps:
+        tool, args = step["tool"], step["args"]
+        if tool == "coerce_datetime":
+            df = df.assign(**{c: pd.to_datetime(df[c], errors="coerce") for c in args["columns"]})
+        elif tool == "filter_df":
+            df = apply_filters(df, args["filters"])
+        elif tool == "select_columns":
+            missing = [c for c in args["columns"] if c not in df.columns]
+            if missing:
+                raise ValueError(f"select_columns: unknown columns {missing}")
+            df = df[args["columns"]]
+        elif tool == "sort_df":
+            df = df.sort_values(by=args["by"], ascending=args["ascending"])
+        elif tool == "limit_df":
+            df = df.head(args["n"])
+        elif tool == "reset_index":
+            df = df.reset_index(drop=True)
+        else:
+            raise ValueError(f"Unknown compiled step: {tool}")
+    return df
+
+
+def run_pandas_code(code: str, df_in: pd.DataFrame, *, timeout: Optional[float] = None) -> Tuple[Any, str]:
+    """
+    Run a generated snippet, preferring the deterministic engine.
+    Returns (df_out, engine) where engine is 'compiled' or 'sandbox'.
+    """
+    with span("run_pandas_code", rows_in=len(df_in)) as sp:
+        try:
+            steps = compile_pandas_code(code)
+        except UnsupportedCode:
+            steps = None
+
+        df_out, engine = None, None
+        if steps is not None:
+            try:
+                df_out, engine = run_compiled(df_in, steps), "compiled"
+            except (ValueError, KeyError, TypeError):
+                pass  # e.g. unknown column: let the sandbox surface the real error
+
+        if engine is None:
+            from tools.code_sandbox import run_generated_code
+            with span("sandbox.exec"):
+                df_out, engine = run_generated_code(code, df_in, timeout=timeout), "sandbox"
+        sp.set(engine=engine, rows_out=len(df_out) if hasattr(df_out, "__len__") else None)
+        return df_out, engine
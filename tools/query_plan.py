@@ -0,0 +1,426 @@
+# tools/query_plan.py
+# ----------------------------------------------------
+# Logical query plan for execute_plan:
+#   plan steps -> logical nodes (scan → filter → join → project → sort | top-k)
+#   -> optimizer rules -> physical execution.
+# New optimizations are added as rules in OPTIMIZER_RULES.
+# ----------------------------------------------------
+from __future__ import annotations
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from tools.tracing import span
+
+# ---------- 1) Logical nodes ----------
+@dataclass
+class Scan:
+    table: str
+    loader: str                                        # tool name in TOOL_REGISTRY
+    filters: List[dict] = field(default_factory=list)  # pushed-down filters
+    columns: Optional[List[str]] = None                # pushed-down projection
+    source: str = "loader"                             # picked by choose_source
+    snapshot: Optional[str] = None                     # "latest" -> newest as_of_date only
+
+
+@dataclass
+class Previous:
+    """The previous turn's result, refined by the following steps."""
+    table: str = "biwenger_player_stats"
+
+
+@dataclass
+class Filter:
+    filters: List[dict]
+
+
+@dataclass
+class Project:
+    columns: List[str]
+
+
+@dataclass
+class Sort:
+    by: List[str]
+    ascending: List[bool]
+
+
+@dataclass
+class TopK:
+    col: str
+    k: int
+    ascending: bool = False
+
+
+@dataclass
+class Aggregate:
+    metrics: List[dict]
+    group_by: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Join:
+    """Hash join with another catalog table; its hash index is cached (tools.hash_join)."""
+    table: str
+    loader: str                                        # tool name in TOOL_REGISTRY
+    left_on: List[str]
+    right_on: List[str]
+    how: str = "inner"                                 # "inner" | "left"
+    columns: Optional[List[str]] = None                # right columns to bring (None = all)
+    snapshot: Optional[str] = None
+
+
+@dataclass
+class Translate:
+    query: str
+
+
+Node = Union[Scan, Previous, Filter, Project, Sort, TopK, Aggregate, Join, Translate]
+_SOURCES_T = (Scan, Previous)
+RunTool = Callable[[str, dict], Any]
+
+# Loader tool -> dataset it scans (tools.registry adds one per catalog table)
+LOADER_TABLES: Dict[str, str] = {
+    "load_biwenger_player_stats": "biwenger_player_stats",
+}
+
+
+# ---------- 2) Plan steps -> logical plan ----------
+def _build_filter(args: dict) -> Node:
+    filters = args.get("filters")
+    if not filters:
+        raise ValueError("filter_df requires non-empty 'filters'.")
+    return Filter(filters=list(filters))
+
+
+def _build_translate(args: dict) -> Node:
+    return Translate(query=args.get("query", ""))
+
+
+def _build_project(args: dict) -> Node:
+    columns = args.get("columns")
+    if not columns:
+        raise ValueError("select_columns requires non-empty 'columns'.")
+    return Project(columns=list(columns))
+
+
+def _build_sort(args: dict) -> Node:
+    by = args.get("by")
+    if isinstance(by, str):
+        by = [by]
+    if not by:
+        raise ValueError("sort_df requires non-empty 'by'.")
+    asc = args.get("ascending", True)
+    asc = [bool(a) for a in asc] if isinstance(asc, list) else [bool(asc)] * len(by)
+    return Sort(by=list(by), ascending=asc)
+
+
+def _build_top_k(args: dict) -> Node:
+    if not args.get("col") or "k" not in args:
+        raise ValueError("top_k requires 'col' and 'k'.")
+    return TopK(col=args["col"], k=int(args["k"]), ascending=bool(args.get("ascending", False)))
+
+
+def _build_aggregate(args: dict) -> Node:
+    if not args.get("metrics"):
+        raise ValueError("aggregate_df requires non-empty 'metrics'.")
+    group_by = args.get("group_by") or []
+    return Aggregate(metrics=list(args["metrics"]), group_by=[group_by] if isinstance(group_by, str) else list(group_by))
+
+
+def _build_join(args: dict) -> Node:
+    table = args.get("table")
+    loader = next((tool for tool, t in LOADER_TABLES.items() if t == table), None)
+    if loader is None:
+        raise ValueError(f"join_df: unknown table '{table}'.")
+    as_list = lambda v: [v] if isinstance(v, str) else list(v or [])
+    left_on = as_list(args.get("left_on") or args.get("on"))
+    right_on = as_list(args.get("right_on") or args.get("on"))
+    if not left_on or len(left_on) != len(right_on):
+        raise ValueError("join_df requires 'on', or 'left_on' and 'right_on' of the same length.")
+    how = args.get("how", "inner")
+    if how not in ("inner", "left"):
+        raise ValueError(f"join_df: unsupported how '{how}'.")
+    columns = args.get("columns")
+    return Join(table=table, loader=loader, left_on=left_on, right_on=right_on, how=how,
+                columns=as_list(columns) if columns else None, snapshot=args.get("snapshot"))
+
+
+def _build_previous(args: dict) -> Node:
+    return Previous()
+
+
+# tool name -> builder(args) -> node. Loader tools are handled via LOADER_TABLES.
+STEP_BUILDERS: Dict[str, Callable[[dict], Node]] = {
+    "use_previous_result": _build_previous,
+    "filter_df": _build_filter,
+    "select_columns": _build_project,
+    "sort_df": _build_sort,
+    "top_k": _build_top_k,
+    "aggregate_df": _build_aggregate,
+    "join_df": _build_join,
+    "translate_to_pandas": _build_translate,
+}
+
+
+def build_logical_plan(plan: dict) -> List[Node]:
+    """Translate planner steps into a linear logical plan (no execution)."""
+    steps = plan.get("steps", [])
+    if not steps:
+        raise ValueError("Plan has no steps.")
+
+    nodes: List[Node] = []
+    for step in steps:
+        tool = step.get("tool")
+        args = step.get("args", {}) or {}
+
+        if tool in LOADER_TABLES:
+            nodes.append(Scan(table=LOADER_TABLES[tool], loader=tool, snapshot=args.get("snapshot")))
+        elif tool in STEP_BUILDERS:
+            node = STEP_BUILDERS[tool](args)
+            if not isinstance(node, _SOURCES_T + (Translate,)) and not any(isinstance(n, _SOURCES_T) for n in nodes):
+                raise ValueError(f"{tool} requires a DataFrame from a prior step.")
+            nodes.append(node)
+            if isinstance(node, Translate):
+                break  # translator returns code only; later steps never ran
+        else:
+            raise ValueError(f"Unknown tool: {tool}")
+    return nodes
+
+
+def check_columns(nodes: List[Node], columns_for: Callable[[str], List[str]]) -> None:
+    """
+    Raise ValueError if a step references a column that does not exist at that point
+    of the plan (dataset columns, then whatever aggregate/select/join steps leave).
+    Columns after 'use_previous_result' are unknown, so they are not checked.
+    """
+    cols: Optional[set] = None
+
+    def _need(names: List[str], what: str) -> None:
+        missing = [c for c in names if cols is not None and c not in cols]
+        if missing:
+            raise ValueError(f"{what}: unknown column(s) {missing}")
+
+    for node in nodes:
+        if isinstance(node, Scan):
+            cols = set(columns_for(node.table))
+        elif isinstance(node, Previous):
+            cols = None
+        elif isinstance(node, Filter):
+            _need([f.get("col") for f in node.filters], "filter_df")
+        elif isinstance(node, Sort):
+            _need(node.by, "sort_df")
+        elif isinstance(node, TopK):
+            _need([node.col], "top_k")
+        elif isinstance(node, Project):
+            _need(node.columns, "select_columns")
+            cols = set(node.columns) if cols is not None else None
+        elif isinstance(node, Aggregate):
+            _need([m.get("col") for m in node.metrics] + list(node.group_by), "aggregate_df")
+            if cols is not None:
+                cols = set(node.group_by) | {m.get("as") or f"{m.get('agg')}_{m.get('col')}" for m in node.metrics}
+        elif isinstance(node, Join):
+            _need(node.left_on, "join_df")
+            right = columns_for(node.table)
+            missing = [c for c in node.right_on + (node.columns or []) if c not in right]
+            if missing:
+                raise ValueError(f"join_df: unknown column(s) {missing} in '{node.table}'")
+            if cols is not None:
+                brought = node.columns or [c for c in right if c not in node.right_on]
+                cols = cols | {f"{c}_{node.table}" if c in cols else c for c in brought}
+
+
+# ---------- 3) Optimizer rules ----------
+def drop_redundant(nodes: List[Node]) -> List[Node]:
+    """
+    - everything before the last Scan / Previous is discarded by it
+    - a Translate ignores the frame built so far
+    - Sort→Sort / Sort→TopK keep only the later node when its keys include all of the
+      earlier sort's keys (sorts are stable: otherwise the earlier sort breaks ties);
+      Project→Project keeps the narrower one
+    """
+    last_scan = max((i for i, n in enumerate(nodes) if isinstance(n, _SOURCES_T)), default=0)
+    nodes = nodes[last_scan:]
+    if nodes and isinstance(nodes[-1], Translate):
+        return [n for n in nodes if isinstance(n, _SOURCES_T + (Translate,))]
+
+    out: List[Node] = []
+    for n in nodes:
+        prev = out[-1] if out else None
+        if isinstance(n, Filter) and not n.filters:
+            continue
+        if isinstance(n, (Sort, TopK)) and isinstance(prev, Sort):
+            keys = n.by if isinstance(n, Sort) else [n.col]
+            if set(prev.by) <= set(keys):
+                out[-1] = n  # rows tied on the later keys are tied on the earlier ones too
+                continue
+        if isinstance(n, Project) and isinstance(prev, Project) and set(n.columns) <= set(prev.columns):
+            out[-1] = n
+            continue
+        out.append(n)
+    return out
+
+
+def merge_filters(nodes: List[Node]) -> List[Node]:
+    """
+    Move filters towards the scan across Sort / Project (they commute: filtering first
+    means sorting fewer rows) and merge consecutive filters into one.
+    Filters never move past a TopK.
+    """
+    out: List[Node] = []
+    for n in nodes:
+        if isinstance(n, Filter):
+            i = len(out)
+            while i > 0 and isinstance(out[i - 1], (Sort, Project)):
+                if isinstance(out[i - 1], Project) and not {f["col"] for f in n.filters} <= set(out[i - 1].columns):
+                    break  # keep the error where the user wrote it
+                i -= 1
+            if i > 0 and isinstance(out[i - 1], Filter):
+                out[i - 1] = Filter(filters=out[i - 1].filters + n.filters)
+            else:
+                out.insert(i, Filter(filters=list(n.filters)))
+        else:
+            out.append(n)
+    return out
+
+
+def push_down(nodes: List[Node]) -> List[Node]:
+    """
+    Move a Project ahead of a Sort when the sort keys survive it, then fold a
+    leading Filter and a leading Project into the Scan.
+    """
+    if not nodes or not isinstance(nodes[0], Scan):
+        return nodes
+    nodes = list(nodes)
+    for i in range(1, len(nodes)):
+        n, prev = nodes[i], nodes[i - 1]
+        if isinstance(n, Project) and isinstance(prev, Sort) and set(prev.by) <= set(n.columns):
+            nodes[i - 1], nodes[i] = n, prev
+    scan, rest = nodes[0], nodes[1:]
+    if rest and isinstance(rest[0], Filter):
+        scan = replace(scan, filters=scan.filters + rest.pop(0).filters)
+    if rest and isinstance(rest[0], Project) and scan.columns is None:
+        scan = replace(scan, columns=list(rest.pop(0).columns))
+    return [scan] + rest
+
+
+# name -> (matches(scan) -> bool, load(scan, run_tool) -> DataFrame)
+# Sources are tried in registration order; the loader tool is the fallback.
+_SOURCES: Dict[str, tuple] = {}
+
+
+def register_source(
+    name: str,
+    matches: Callable[[Scan], bool],
+    load: Callable[[Scan, RunTool], Any],
+) -> None:
+    """Register an alternative (cached / indexed) source the optimizer may pick for a Scan."""
+    _SOURCES[name] = (matches, load)
+
+
+def choose_source(nodes: List[Node]) -> List[Node]:
+    out = []
+    for n in nodes:
+        if isinstance(n, Scan):
+            picked = next((name for name, (ok, _) in _SOURCES.items() if ok(n)), "loader")
+            n = replace(n, source=picked)
+        out.append(n)
+    return out
+
+
+OPTIMIZER_RULES: List[Callable[[List[Node]], List[Node]]] = [
+    drop_redundant,
+    merge_filters,
+    push_down,
+    choose_source,
+]
+
+
+def optimize(nodes: List[Node], max_passes: int = 4) -> List[Node]:
+    """Apply OPTIMIZER_RULES until the plan stops changing (one rule can enable another)."""
+    for _ in range(max_passes):
+        before = list(nodes)
+        for rule in OPTIMIZER_RULES:
+            nodes = rule(nodes)
+        if nodes == before:
+            break
+    return nodes
+
+
+def explain(nodes: List[Node]) -> str:
+    """One line per node, e.g. for a debug expander."""
+    return "\n".join(f"{i}: {n}" for i, n in enumerate(nodes))
+
+
+# ---------- 4) Physical execution ----------
+def _scan(node: Scan, run_tool: RunTool):
+    if node.source != "loader":
+        # the source receives the pushed-down filters/columns and may use them to read less
+        df = _SOURCES[node.source][1](node, run_tool)
+    else:
+        df = run_tool(node.loader, {"snapshot": node.snapshot} if node.snapshot else {})
+    if node.filters:
+        with span("filter_df", rows_in=len(df), filters=len(node.filters)) as sp:
+            df = run_tool("filter_df", {"df": df, "filters": node.filters})
+            sp.set(rows_out=len(df))
+    if node.columns is not None:
+        df = run_tool("select_columns", {"df": df, "columns": node.columns})
+    return df
+
+
+def uses_previous(nodes: List[Node]) -> bool:
+    return any(isinstance(n, Previous) for n in nodes)
+
+
+def execute_physical(nodes: List[Node], run_tool: RunTool, *, schema_for: Callable[[str], dict],
+                     previous: Any = None) -> Any:
+    """
+    Run an optimized plan. Returns a DataFrame, or {"python_code": ...} for translate plans.
+    `schema_for(table)` supplies the schema dict handed to the translator;
+    `previous` is the prior turn's result frame for refinement plans.
+    """
+    current = None
+    table = None
+    for node in nodes:
+        with span(f"op.{type(node).__name__.lower()}") as sp:
+            if current is not None:
+                sp.set(rows_in=len(current))
+            if isinstance(node, Scan):
+                sp.set(source=node.source, pushed_filters=len(node.filters))
+                table = node.table
+                current = _scan(node, run_tool)
+            elif isinstance(node, Previous):
+                if previous is None:
+                    raise ValueError("Plan refines a previous result, but there is none.")
+                table = node.table
+                current = previous
+            elif isinstance(node, Translate):
+                code = run_tool("translate_to_pandas", {
+                    "user_query": node.query,
+                    "schema_spec": schema_for(table or "biwenger_player_stats"),
+                })
+                return {"python_code": code}
+            elif isinstance(node, Filter):
+                current = run_tool("filter_df", {"df": current, "filters": node.filters})
+            elif isinstance(node, Project):
+                current = run_tool("select_columns", {"df": current, "columns": node.columns})
+            elif isinstance(node, Sort):
+                current = run_tool("sort_df", {"df": current, "by": node.by, "ascending": node.ascending})
+            elif isinstance(node, TopK):
+                current = run_tool("top_k", {"df": current, "col": node.col, "k": node.k, "ascending": node.ascending})
+            elif isinstance(node, Aggregate):
+                current = run_tool("aggregate_df", {"df": current, "metrics": node.metrics, "group_by": node.group_by})
+            elif isinstance(node, Join):
+                sp.set(table=node.table, how=node.how)
+                right = run_tool(node.loader, {"snapshot": node.snapshot} if node.snapshot else {})
+                current = run_tool("join_df", {
+                    "df": current, "right": right, "left_on": node.left_on, "right_on": node.right_on,
+                    "how": node.how, "columns": node.columns, "suffix": f"_{node.table}",
+                })
+            else:
+                raise ValueError(f"No physical operator for {type(node).__name__}")
+            if current is not None:
+                sp.set(rows_out=len(current))
+
+    if current is None:
+        raise ValueError("Plan produced no data.")
+    return current
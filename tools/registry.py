@@ -2,21 +2,105 @@
 # tools/registry.py
 # Central runtime registry for executing tools & plans
 # ----------------------------------------------------
-from typing import Callable, Dict, Any
+import functools
+import importlib
+import threading
+from collections.abc import Mapping
+from typing import Callable, Dict, Any, Iterator, Union
 
-# --- Import deterministic callables ---
-from tools.supabase_tools import load_biwenger_player_stats
-from tools.dataframe_transformation_tools import apply_filters
-from tools.english_to_pandas import EnglishToPandas
 import json
-from tools.schema_catalog import get_planner_context
+from tools.schema_catalog import get_planner_context, list_columns, list_datasets, loader_tool_name
+from tools.query_plan import (LOADER_TABLES, Join, Scan, build_logical_plan, check_columns, optimize, execute_physical,
+                              register_source)
+from tools import snapshot_store
+from tools.tracing import span
+
+# --- Lazy registry: tools (and their heavy imports) resolve on first use ---
+ToolRef = Union[str, Callable[[], Callable[..., Any]]]
+
+class LazyToolRegistry(Mapping):
+    """
+    name -> callable, where each entry is declared as "module:attribute" or a
+    zero-arg factory and is imported/built the first time it is looked up.
+    """
+
+    def __init__(self, refs: Dict[str, ToolRef]):
+        self._refs = dict(refs)
+        self._resolved: Dict[str, Callable[..., Any]] = {}
+        self._lock = threading.Lock()
+
+    def _resolve(self, ref: ToolRef) -> Callable[..., Any]:
+        if callable(ref):
+            return ref()
+        module, _, attr = ref.partition(":")
+        return getattr(importlib.import_module(module), attr)
+
+    def __getitem__(self, name: str) -> Callable[..., Any]:
+        fn = self._resolved.get(name)
+        if fn is None:
+            ref = self._refs[name]  # KeyError for unknown tools
+            with self._lock:
+                fn = self._resolved.get(name)
+                if fn is None:
+                    try:
+                        fn = self._resolved[name] = self._resolve(ref)
+                    except KeyError as e:  # must not read as "unknown tool" (Mapping.get / in)
+                        raise ImportError(f"Tool '{name}' failed to load: {e!r}") from e
+        return fn
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._refs  # without importing the tool
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._refs)
+
+    def __len__(self) -> int:
+        return len(self._refs)
+
+    def register(self, name: str, ref: ToolRef) -> None:
+        with self._lock:
+            self._refs[name] = ref
+            self._resolved.pop(name, None)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._resolved
+
+def _translate_to_pandas() -> Callable[..., Any]:
+    from tools.english_to_pandas import EnglishToPandas
+    return EnglishToPandas().generate_code
 
 # --- Core registry of callable tools ---
-TOOL_REGISTRY: Dict[str, Callable[..., Any]] = {
-    "load_biwenger_player_stats": load_biwenger_player_stats,
-    "filter_df": apply_filters,
-    "translate_to_pandas": EnglishToPandas().generate_code,
-}
+TOOL_REGISTRY: LazyToolRegistry = LazyToolRegistry({
+    "load_biwenger_player_stats": "tools.supabase_tools:load_biwenger_player_stats",
+    "filter_df": "tools.dataframe_transformation_tools:apply_filters",
+    "select_columns": "tools.dataframe_transformation_tools:select_columns",
+    "sort_df": "tools.dataframe_transformation_tools:sort_df",
+    "top_k": "tools.dataframe_transformation_tools:top_k",
+    "aggregate_df": "tools.dataframe_transformation_tools:aggregate_df",
+    "join_df": "tools.dataframe_transformation_tools:join_df",
+    "translate_to_pandas": _translate_to_pandas,
+})
+
+# --- Generic loader tools for the rest of the catalog (nothing loads until a plan scans them) ---
+def _dataset_loader(dataset: str) -> Callable[[], Callable[..., Any]]:
+    def factory() -> Callable[..., Any]:
+        from tools.supabase_tools import load_dataset
+        return functools.partial(load_dataset, dataset)
+    return factory
+
+def register_dataset(dataset: str) -> str:
+    """Expose a catalog dataset to plans as 'load_<dataset>'; returns the tool name."""
+    name = loader_tool_name(dataset)
+    LOADER_TABLES[name] = dataset
+    if name not in TOOL_REGISTRY:
+        TOOL_REGISTRY.register(name, _dataset_loader(dataset))
+    return name
+
+for _dataset in list_datasets():
+    register_dataset(_dataset)
+
+# --- Alternative scan sources picked by the plan optimizer ---
+register_source("snapshot_store", snapshot_store.scan_matches, snapshot_store.scan_load)
 
 # --- Unified executor for individual tools ---
 def execute_tool(tool_name: str, args: dict | None = None) -> Any:
@@ -24,50 +108,65 @@ def execute_tool(tool_name: str, args: dict | None = None) -> Any:
     Executes a registered tool by name.
     Raises a clear error if the tool name is unknown.
     """
-    fn = TOOL_REGISTRY.get(tool_name)
-    if not fn:
+    if tool_name not in TOOL_REGISTRY:
         raise ValueError(f"Unknown tool: {tool_name}")
-    return fn(**(args or {}))
+    return TOOL_REGISTRY[tool_name](**(args or {}))
 
 # --- Plan executor (for multi-step plans) ---
-def execute_plan(plan: dict):
-    steps = plan.get("steps", [])
-    if not steps:
-        raise ValueError("Plan has no steps.")
-    current = None
-    for step in steps:
-        tool = step.get("tool")
-        args = step.get("args", {}) or {}
-
-        if tool == "load_biwenger_player_stats":
-            current = execute_tool(tool, args)  # returns a DataFrame
-
-        elif tool == "filter_df":
-            if current is None:
-                raise ValueError("filter_df requires a DataFrame from a prior step.")
-            current = execute_tool(tool, {"df": current, **args})
-
-        elif tool == "translate_to_pandas":
-            # 1) get schema for the active table (here fixed; parameterize later if needed)
-            schema_spec = get_planner_context("biwenger_player_stats")
-            if isinstance(schema_spec, str):
-                try:
-                    schema_spec = json.loads(schema_spec)
-                except Exception:
-                    pass
-
-            # 2) run translator with correct argument names
-            code = EnglishToPandas().generate_code(
-                user_query=args.get("query", ""),
-                schema_spec=schema_spec,
-            )
-
-            # 3) return *code only* (no execution yet). Stop here.
-            return {"python_code": code}
-
-        else:
-            raise ValueError(f"Unknown tool: {tool}")
-
-    if current is None:
-        raise ValueError("Plan produced no data.")
-    return current
+def _schema_for(table: str) -> dict:
+    schema_spec = get_planner_context(table)
+    if isinstance(schema_spec, str):
+        try:
+            schema_spec = json.loads(schema_spec)
+        except Exception:
+            pass
+    return schema_spec
+
+def validate_plan(plan: dict) -> None:
+    """
+    Raise ValueError if a planner output cannot run: unknown tools, missing args,
+    steps without a data source, or columns that do not exist at that step.
+    Used by the router to decide whether a cheap-model plan must be escalated.
+    """
+    try:
+        check_columns(build_logical_plan(plan), list_columns)
+    except (KeyError, TypeError, AttributeError) as e:  # malformed plan JSON (missing keys, wrong types)
+        raise ValueError(f"Malformed plan: {type(e).__name__}: {e}") from e
+
+def plan_tables(plan: dict) -> list[str]:
+    """Catalog tables a plan scans or joins, in order (only these are loaded when it runs)."""
+    nodes = build_logical_plan(plan)
+    return list(dict.fromkeys(n.table for n in nodes if isinstance(n, (Scan, Join))))
+
+def plan_base_load(plan: dict, default: str = "biwenger_player_stats") -> tuple[str, dict]:
+    """(table, loader args) of the plan's first scan, e.g. its snapshot; the default table otherwise."""
+    scan = next((n for n in build_logical_plan(plan) if isinstance(n, Scan)), None)
+    if scan is None:
+        return default, {}
+    return scan.table, ({"snapshot": scan.snapshot} if scan.snapshot else {})
+
+def acquire_plan_base(plan: dict, default: str = "biwenger_player_stats"):
+    """Shared-dataset handle of the frame the plan's first scan loads, for result handles."""
+    from tools.dataset_store import acquire_dataset
+    table, args = plan_base_load(plan, default)
+    name = f"{table}@{args['snapshot']}" if args.get("snapshot", "all") != "all" else table
+    return acquire_dataset(name, execute_tool(loader_tool_name(table), args))
+
+def execute_plan(plan: dict, previous: Any = None):
+    """
+    Builds a lazy logical plan from the steps, optimizes it (merge/push down
+    filters and projections, drop redundant steps, pick a source) and runs it.
+    `previous` (a DataFrame or handle) feeds plans starting with 'use_previous_result'.
+    Returns a DataFrame, or {"python_code": ...} when the plan translates to pandas.
+    """
+    if previous is not None and hasattr(previous, "frame"):
+        previous = previous.frame()
+    with span("execute_plan", steps=len(plan.get("steps", []))) as sp:
+        with span("optimize"):
+            logical = build_logical_plan(plan)
+            physical = optimize(logical)
+        sp.set(physical_ops=[type(n).__name__ for n in physical])
+        result = execute_physical(physical, execute_tool, schema_for=_schema_for, previous=previous)
+        if hasattr(result, "__len__") and not isinstance(result, dict):
+            sp.set(rows_out=len(result))
+        return result
@@ -0,0 +1,315 @@
+# tools/resilience.py
+# ----------------------------------------------------
+# Deadlines, retries and hedging for remote calls (Supabase pages, OpenAI completions).
+#   - deadline_s: total time budget for the call, retries included
+#   - attempt_timeout_s: budget for a single attempt
+#   - RetryPolicy: exponential backoff with full jitter, retryable errors only
+#   - hedge=True: if an attempt is still running after the p95 latency seen for
+#     this call name, send a duplicate and take whichever answers first
+#   - hooks (AttemptHooks): callbacks around every attempt, for callers that account
+#     for requests actually on the wire (llm_clients.scheduler)
+# Only use hedging for idempotent calls.
+# ----------------------------------------------------
+from __future__ import annotations
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+_RETRYABLE_STATUS = {408, 425, 429}
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call (or one attempt of it) ran out of time."""
+
+
+def retryable_status(status: int) -> bool:
+    return status in _RETRYABLE_STATUS or status >= 500
+
+
+def default_retryable(exc: BaseException) -> bool:
+    """Timeouts, connection errors and 408/425/429/5xx responses are worth retrying."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return retryable_status(status)
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    try:
+        import httpx  # transport of both supabase and openai
+        return isinstance(exc, httpx.TransportError)
+    except ImportError:
+        return False
+
+
+@dataclass
+class RetryPolicy:
+    attempts: int = 3                 # total attempts, first one included
+    base_delay_s: float = 0.2
+    max_delay_s: float = 5.0
+    retryable: Callable[[BaseException], bool] = field(default=default_retryable)
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay before retry number `attempt` (1-based)."""
+        return random.uniform(0.0, min(self.max_delay_s, self.base_delay_s * (2 ** (attempt - 1))))
+
+
+NO_RETRY = RetryPolicy(attempts=1)
+
+
+class AttemptHooks:
+    """
+    Callbacks around every attempt of a call, retries and hedges included. They run on
+    the attempt's own thread / task, so a sync attempt that timed out or lost a hedge
+    (threads cannot be cancelled) reports when it really finishes, possibly after the
+    call has returned.
+    """
+
+    def started(self) -> Any:
+        """Before the attempt is sent; the return value is handed to finished()."""
+        return None
+
+    def finished(self, handle: Any, result: Any, exc: Optional[BaseException], latency_s: float) -> None:
+        """After the attempt returned `result` or raised `exc` (cancellation included)."""
+
+
+NO_HOOKS = AttemptHooks()
+
+
+# ---------- 1) Latency tracking (drives the hedge delay) ----------
+class LatencyTracker:
+    """Rolling window of successful attempt latencies and counters per call name."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self._lock = threading.Lock()
+        self._window, self.min_samples = window, min_samples
+        self._samples: Dict[str, List[float]] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, name: str, latency_s: float) -> None:
+        with self._lock:
+            xs = self._samples.setdefault(name, [])
+            xs.append(latency_s)
+            del xs[:-self._window]
+
+    def count(self, name: str, event: str) -> None:
+        with self._lock:
+            c = self._counts.setdefault(name, {})
+            c[event] = c.get(event, 0) + 1
+
+    def quantile(self, name: str, q: float) -> Optional[float]:
+        with self._lock:
+            xs = sorted(self._samples.get(name, []))
+        if len(xs) < self.min_samples:
+            return None
+        return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            names = set(self._samples) | set(self._counts)
+            counts = {n: dict(self._counts.get(n, {})) for n in names}
+        out = {}
+        for n in sorted(names):
+            p50, p95 = self.quantile(n, 0.50), self.quantile(n, 0.95)
+            out[n] = {**counts[n],
+                      "p50_s": round(p50, 4) if p50 is not None else None,
+                      "p95_s": round(p95, 4) if p95 is not None else None}
+        return out
+
+
+_TRACKER = LatencyTracker()
+_EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix="resilience")
+
+
+def get_latency_tracker() -> LatencyTracker:
+    return _TRACKER
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _budget(deadline: Optional[float], attempt_timeout_s: Optional[float]) -> Optional[float]:
+    rem = _remaining(deadline)
+    if rem is None:
+        return attempt_timeout_s
+    return rem if attempt_timeout_s is None else min(rem, attempt_timeout_s)
+
+
+# ---------- 2) Sync calls ----------
+def _timed(fn: Callable[[], T], name: str, hooks: AttemptHooks) -> T:
+    handle = hooks.started()
+    s = time.monotonic()
+    try:
+        out = fn()
+    except BaseException as e:
+        hooks.finished(handle, None, e, time.monotonic() - s)
+        raise
+    latency = time.monotonic() - s
+    _TRACKER.record(name, latency)
+    hooks.finished(handle, out, None, latency)
+    return out
+
+
+def _attempt(fn: Callable[[], T], name: str, budget: Optional[float], hedge: bool,
+             hooks: AttemptHooks = NO_HOOKS) -> T:
+    """
+    One attempt, possibly hedged. Losing/abandoned threads cannot be cancelled;
+    they finish in the background (hooks still see them) and their result is dropped.
+    """
+    t0 = time.monotonic()
+    end = None if budget is None else t0 + budget
+    _timed_attempt = lambda: _timed(fn, name, hooks)
+
+    primary = _EXECUTOR.submit(_timed_attempt)
+    pending = {primary}
+    hedge_delay = _TRACKER.quantile(name, 0.95) if hedge else None
+    hedged = False
+    last_exc: Optional[BaseException] = None
+
+    while pending:
+        timeout = None if end is None else max(0.0, end - time.monotonic())
+        if hedge_delay is not None and not hedged:
+            until_hedge = max(0.0, t0 + hedge_delay - time.monotonic())
+            timeout = until_hedge if timeout is None else min(timeout, until_hedge)
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for f in done:
+            if f.exception() is None:
+                if hedged:
+                    _TRACKER.count(name, "hedge_wins" if f is not primary else "hedge_losses")
+                return f.result()
+            last_exc = f.exception()
+        if not done:
+            if end is not None and time.monotonic() >= end:
+                break
+            if hedge_delay is not None and not hedged:
+                hedged = True
+                _TRACKER.count(name, "hedges")
+                pending.add(_EXECUTOR.submit(_timed_attempt))
+
+    # all attempts failed (e.g. primary failed before the hedge fired): let the retry policy decide
+    if last_exc is not None and not pending:
+        raise last_exc
+    _TRACKER.count(name, "timeouts")
+    raise DeadlineExceeded(f"{name}: no response within {budget:.2f}s")
+
+
+def call_with_resilience(
+    fn: Callable[[], T],
+    *,
+    name: str,
+    deadline_s: Optional[float] = None,
+    attempt_timeout_s: Optional[float] = None,
+    retry: RetryPolicy = RetryPolicy(),
+    hedge: bool = False,
+    hooks: AttemptHooks = NO_HOOKS,
+) -> T:
+    """
+    Run `fn()` with a total deadline, per-attempt timeouts, jittered retries and
+    optional hedging. Raises the last error (or DeadlineExceeded) when out of attempts/time.
+    """
+    deadline = None if deadline_s is None else time.monotonic() + deadline_s
+    _TRACKER.count(name, "calls")
+    for attempt in range(1, retry.attempts + 1):
+        budget = _budget(deadline, attempt_timeout_s)
+        if budget is not None and budget <= 0:
+            _TRACKER.count(name, "timeouts")
+            raise DeadlineExceeded(f"{name}: deadline of {deadline_s}s exceeded")
+        if budget is None and not hedge:
+            try:
+                return _timed(fn, name, hooks)  # no timeout and no hedge: on the caller's thread
+            except Exception as e:
+                exc = e
+        else:
+            try:
+                return _attempt(fn, name, budget, hedge, hooks)
+            except Exception as e:
+                exc = e
+        if attempt == retry.attempts or not (isinstance(exc, DeadlineExceeded) or retry.retryable(exc)):
+            raise exc
+        delay = retry.backoff(attempt)
+        rem = _remaining(deadline)
+        if rem is not None and delay >= rem:
+            raise exc
+        _TRACKER.count(name, "retries")
+        time.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+# ---------- 3) Async calls ----------
+async def acall_with_resilience(
+    fn: Callable[[], Awaitable[T]],
+    *,
+    name: str,
+    deadline_s: Optional[float] = None,
+    attempt_timeout_s: Optional[float] = None,
+    retry: RetryPolicy = RetryPolicy(),
+    hedge: bool = False,
+    hooks: AttemptHooks = NO_HOOKS,
+) -> T:
+    """Async variant of call_with_resilience; losing and timed-out attempts are cancelled."""
+    deadline = None if deadline_s is None else time.monotonic() + deadline_s
+    _TRACKER.count(name, "calls")
+
+    async def _timed():
+        handle = hooks.started()
+        s = time.monotonic()
+        try:
+            out = await fn()
+        except BaseException as e:  # cancelled attempts included
+            hooks.finished(handle, None, e, time.monotonic() - s)
+            raise
+        latency = time.monotonic() - s
+        _TRACKER.record(name, latency)
+        hooks.finished(handle, out, None, latency)
+        return out
+
+    for attempt in range(1, retry.attempts + 1):
+        budget = _budget(deadline, attempt_timeout_s)
+        if budget is not None and budget <= 0:
+            _TRACKER.count(name, "timeouts")
+            raise DeadlineExceeded(f"{name}: deadline of {deadline_s}s exceeded")
+        hedge_delay = _TRACKER.quantile(name, 0.95) if hedge else None
+        tasks = [asyncio.ensure_future(_timed())]
+        t0 = time.monotonic()
+        exc: Optional[BaseException] = None
+        try:
+            while tasks:
+                timeout = None if budget is None else max(0.0, t0 + budget - time.monotonic())
+                if hedge_delay is not None and len(tasks) == 1:
+                    until_hedge = max(0.0, t0 + hedge_delay - time.monotonic())
+                    timeout = until_hedge if timeout is None else min(timeout, until_hedge)
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    tasks.remove(t)
+                    if t.exception() is None:
+                        return t.result()
+                    exc = t.exception()
+                if not done:
+                    if budget is not None and time.monotonic() >= t0 + budget:
+                        _TRACKER.count(name, "timeouts")
+                        exc = DeadlineExceeded(f"{name}: no response within {budget:.2f}s")
+                        break
+                    if hedge_delay is not None and len(tasks) == 1:
+                        _TRACKER.count(name, "hedges")
+                        hedge_delay = None
+                        tasks.append(asyncio.ensure_future(_timed()))
+        finally:
+            for t in tasks:
+                t.cancel()
+
+        if attempt == retry.attempts or not (isinstance(exc, DeadlineExceeded) or retry.retryable(exc)):
+            raise exc
+        delay = retry.backoff(attempt)
+        rem = _remaining(deadline)
+        if rem is not None and delay >= rem:
+            raise exc
+        _TRACKER.count(name, "retries")
+        await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
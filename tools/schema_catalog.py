@@ -1,11 +1,30 @@
 # tools/schema_catalog.py
 import json
+import os
+
+from tools.column_stats import get_column_stats
 
 # --- 1. Define dataset schemas -----------------------------------------------
+# The catalog: one entry per Supabase table. Each entry gets a generic loader tool
+# ("load_<dataset>", tools.registry) and is loaded only when a plan scans it.
+# Only biwenger_player_stats is live by default; the other entries describe tables
+# that are opt-in via CATALOG_DATASETS=<a,b,...> once they exist in Supabase.
+
+_TEAMS = ["Alavés", "Athletic", "Atlético", "Barcelona",
+          "Betis", "Celta", "Elche", "Espanyol", "Getafe",
+          "Girona", "Levante", "Mallorca", "Osasuna",
+          "Rayo Vallecano", "Real Madrid", "Real Oviedo",
+          "Real Sociedad", "Sevilla", "Valencia", "Villarreal"]
+
+_CATEGORICAL_GUIDANCE = (
+    "For categorical columns that appear in value_hints: prefer EXACT matches (op ==) "
+    "and the canonical values listed under value_hints."
+)
 
 _SCHEMA_REGISTRY = {
     "biwenger_player_stats": {
         "dataset": "biwenger_player_stats",
+        "description": "Season snapshot per player: cumulative points, market value and market % as of as_of_date.",
         "columns": [
             {"name": "id", "dtype": "int8"},
             {"name": "created_at", "dtype": "timestamptz"},
@@ -29,6 +48,10 @@ _SCHEMA_REGISTRY = {
         "rules": {
             "only_use_listed_columns": True,
             "date_column": "as_of_date",
+            "derived_columns_guidance": (
+                    "Columns marked derived=true are precomputed at load time; filter and sort on them "
+                    "directly instead of recomputing their formula."
+                ),
             "categorical_guidance": (
                     "For categorical columns that appear in value_hints (e.g., team, position, season): "
                     "prefer EXACT matches (op ==) and prefer the canonical values listed under value_hints. "
@@ -41,11 +64,7 @@ _SCHEMA_REGISTRY = {
                 "complete": True,
             },
             "team": {
-                "values": ["Alavés", "Athletic", "Atlético", "Barcelona",
-                           "Betis", "Celta", "Elche", "Espanyol", "Getafe",
-                           "Girona", "Levante", "Mallorca", "Osasuna",
-                           "Rayo Vallecano", "Real Madrid", "Real Oviedo",
-                           "Real Sociedad", "Sevilla", "Valencia", "Villarreal"],
+                "values": _TEAMS,
                 "complete": True,
             },
             "season": {
@@ -53,23 +72,184 @@ _SCHEMA_REGISTRY = {
                 "complete": True,
             },
         }
-    }
+    },
+    "matches": {
+        "dataset": "matches",
+        "description": "One row per LaLiga match: round, date, teams and final score.",
+        "columns": [
+            {"name": "id", "dtype": "int8"},
+            {"name": "season", "dtype": "text"},
+            {"name": "round", "dtype": "int4"},
+            {"name": "match_date", "dtype": "date"},
+            {"name": "home_team", "dtype": "text"},
+            {"name": "away_team", "dtype": "text"},
+            {"name": "home_goals", "dtype": "int4"},
+            {"name": "away_goals", "dtype": "int4"},
+        ],
+        "rules": {"only_use_listed_columns": True, "date_column": "match_date",
+                  "categorical_guidance": _CATEGORICAL_GUIDANCE},
+        "value_hints": {
+            "home_team": {"values": _TEAMS, "complete": True},
+            "away_team": {"values": _TEAMS, "complete": True},
+        },
+    },
+    "market_transactions": {
+        "dataset": "market_transactions",
+        "description": "Biwenger market moves: one row per player purchase or sale, with price and date.",
+        "columns": [
+            {"name": "id", "dtype": "int8"},
+            {"name": "season", "dtype": "text"},
+            {"name": "transaction_date", "dtype": "date"},
+            {"name": "player_name", "dtype": "text"},
+            {"name": "team", "dtype": "text"},
+            {"name": "type", "dtype": "text"},
+            {"name": "price", "dtype": "int8"},
+        ],
+        "rules": {"only_use_listed_columns": True, "date_column": "transaction_date",
+                  "categorical_guidance": _CATEGORICAL_GUIDANCE},
+        "value_hints": {
+            "type": {"values": ["purchase", "sale"], "complete": True},
+            "team": {"values": _TEAMS, "complete": True},
+        },
+    },
+    "player_round_points": {
+        "dataset": "player_round_points",
+        "description": "Points per player per round (match day), with minutes, goals and assists.",
+        "columns": [
+            {"name": "id", "dtype": "int8"},
+            {"name": "season", "dtype": "text"},
+            {"name": "round", "dtype": "int4"},
+            {"name": "match_id", "dtype": "int8"},
+            {"name": "player_name", "dtype": "text"},
+            {"name": "team", "dtype": "text"},
+            {"name": "position", "dtype": "text"},
+            {"name": "points", "dtype": "int4"},
+            {"name": "minutes", "dtype": "int4"},
+            {"name": "goals", "dtype": "int4"},
+            {"name": "assists", "dtype": "int4"},
+        ],
+        "rules": {"only_use_listed_columns": True, "categorical_guidance": _CATEGORICAL_GUIDANCE},
+        "value_hints": {
+            "position": {"values": ["Goalkeeper", "Defender", "Midfielder", "Forward"], "complete": True},
+            "team": {"values": _TEAMS, "complete": True},
+        },
+    },
+}
+
+# --- 2. Derived columns ---------------------------------------------------------
+# Computed once (vectorized) when a table is loaded/refreshed and cached with it.
+# Each entry: name, dtype, op ("div" | "sub"), left/right input columns, description.
+# "div" yields NaN when the denominator is 0.
+
+_DERIVED_OPS = {"div": "/", "sub": "-"}
+
+_DERIVED_COLUMNS = {
+    "biwenger_player_stats": [
+        {"name": "value_per_point", "dtype": "float8", "op": "div", "left": "value", "right": "points",
+         "description": "Market value paid per season point (lower = better value for money)."},
+        {"name": "points_per_match", "dtype": "float8", "op": "div", "left": "points", "right": "matches_played",
+         "description": "Season points per match played."},
+        {"name": "value_gain", "dtype": "int8", "op": "sub", "left": "value", "right": "min_value",
+         "description": "How far the current value is above its season minimum."},
+        {"name": "value_to_max", "dtype": "int8", "op": "sub", "left": "max_value", "right": "value",
+         "description": "How far the current value is below its season maximum."},
+    ],
 }
 
-# --- 2. Accessors -------------------------------------------------------------
+def get_derived_columns(dataset: str) -> list[dict]:
+    """Return the derived-column definitions for a dataset (may be empty)."""
+    return _DERIVED_COLUMNS.get(dataset, [])
+
+def _derived_as_columns(dataset: str) -> list[dict]:
+    return [
+        {
+            "name": d["name"],
+            "dtype": d["dtype"],
+            "derived": True,
+            "formula": f"{d['left']} {_DERIVED_OPS[d['op']]} {d['right']}",
+            "description": d["description"],
+        }
+        for d in get_derived_columns(dataset)
+    ]
+
+# --- 3. Live column statistics ---------------------------------------------------
+# Once a table version is loaded, its column stats (tools.column_stats) replace the
+# hand-maintained value_hints with the values actually present, add hints for other
+# low-cardinality text columns, and attach a compact per-column summary.
+
+_HINT_MAX_VALUES = 30
+_STATS_SUMMARY_KEYS = ("null_frac", "cardinality", "min", "max")
+
+def _apply_column_stats(dataset: str, schema: dict) -> dict:
+    stats = get_column_stats(dataset)
+    if not stats:
+        return schema
+    col_stats = stats.get("columns", {})
+
+    columns = []
+    for c in schema["columns"]:
+        cs = col_stats.get(c["name"])
+        if cs:
+            c = {**c, "stats": {k: cs[k] for k in _STATS_SUMMARY_KEYS if cs.get(k) is not None}}
+        columns.append(c)
+    schema["columns"] = columns
+
+    hints = {k: dict(v) for k, v in (schema.get("value_hints") or {}).items()}
+    for c in columns:
+        cs = col_stats.get(c["name"]) or {}
+        values = cs.get("values")
+        is_hinted = c["name"] in hints
+        if values is None or (not is_hinted and (c["dtype"] != "text" or len(values) > _HINT_MAX_VALUES)):
+            continue
+        hints[c["name"]] = {**hints.get(c["name"], {}),
+                            "values": [v for v, _ in values], "complete": True, "source": "data"}
+    schema["value_hints"] = hints
+    return schema
+
+# --- 4. Accessors -------------------------------------------------------------
 
 def get_schema_dict(dataset: str) -> dict:
-    """Return the full schema dictionary for a dataset."""
+    """
+    Return the full schema dictionary for a dataset (derived columns included).
+    After the table has been loaded, value_hints and per-column stats come from the data.
+    """
     if dataset not in _SCHEMA_REGISTRY:
         raise ValueError(f"Unknown dataset schema: {dataset}")
-    return _SCHEMA_REGISTRY[dataset]
+    schema = dict(_SCHEMA_REGISTRY[dataset])
+    schema["columns"] = list(schema.get("columns", [])) + _derived_as_columns(dataset)
+    return _apply_column_stats(dataset, schema)
 
 def get_planner_context(dataset: str) -> str:
     """Return schema as a JSON string suitable for LLM context injection."""
     schema = get_schema_dict(dataset)
-    return json.dumps(schema, ensure_ascii=False, indent=2)
+    return json.dumps(schema, ensure_ascii=False, indent=2, default=str)
 
 def list_columns(dataset: str) -> list[str]:
     """Return list of column names for validation or autocomplete."""
     schema = get_schema_dict(dataset)
     return [c["name"] for c in schema.get("columns", [])]
+
+# --- 5. Catalog ---------------------------------------------------------------
+
+_DEFAULT_DATASET = "biwenger_player_stats"
+
+def list_datasets() -> list[str]:
+    """Catalog datasets visible to the planner: biwenger_player_stats plus any opted in via CATALOG_DATASETS."""
+    wanted = {d.strip() for d in os.getenv("CATALOG_DATASETS", "").split(",") if d.strip()}
+    wanted.add(_DEFAULT_DATASET)
+    return [d for d in _SCHEMA_REGISTRY if d in wanted]
+
+def loader_tool_name(dataset: str) -> str:
+    """Name of the generic loader tool for a catalog dataset."""
+    return f"load_{dataset}"
+
+def get_catalog_summary(exclude: str | None = None) -> dict:
+    """Compact view of the other tables (description, loader, column names) for the planner."""
+    return {
+        d: {
+            "description": _SCHEMA_REGISTRY[d].get("description", ""),
+            "loader": loader_tool_name(d),
+            "columns": list_columns(d),
+        }
+        for d in list_datasets() if d != exclude
+    }
@@ -0,0 +1,239 @@
+# tools/snapshot_store.py
+# ----------------------------------------------------
+# Local, append-only snapshot store partitioned by `as_of_date`.
+#   data/snapshots/<table>/as_of_date=YYYY-MM-DD.parquet   (one columnar file per partition)
+#   data/snapshots/<table>/_manifest.json                  (last sync time)
+# An in-memory partition index lets "latest" and date-range reads open only
+# the partitions they need.
+# ----------------------------------------------------
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+_DEFAULT_ROOT = Path(__file__).resolve().parent.parent / "data" / "snapshots"
+_PREFIX = "as_of_date="
+
+# Tables stored as daily/weekly snapshots -> their partition column
+SNAPSHOT_TABLES: Dict[str, str] = {
+    "biwenger_player_stats": "as_of_date",
+}
+
+# A store synced longer ago than this is not trusted to contain the newest partition
+DEFAULT_MAX_AGE_S = 3600
+
+
+def _date_key(v: Any) -> str:
+    """Normalize a date-ish value to the 'YYYY-MM-DD' partition key."""
+    if hasattr(v, "strftime"):
+        return v.strftime("%Y-%m-%d")
+    return str(v)[:10]
+
+
+class SnapshotStore:
+    """
+    Append-only partitions of one table. Existing partitions are never rewritten;
+    `sync` only writes dates the store has not seen yet.
+    """
+
+    def __init__(self, table: str, *, root: Path = _DEFAULT_ROOT, date_col: Optional[str] = None,
+                 max_cached_partitions: int = 32):
+        self.table = table
+        self.date_col = date_col or SNAPSHOT_TABLES.get(table, "as_of_date")
+        self.dir = Path(root) / table
+        self._lock = threading.RLock()
+        self._index: Dict[str, Dict[str, Any]] = {}     # date -> {"path", "rows"}
+        self._cache: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+        self._max_cached = max_cached_partitions
+        self._synced_at: Optional[float] = None
+        self._load_index()
+
+    # --- index ---
+    def _load_index(self) -> None:
+        if not self.dir.exists():
+            return
+        for p in self.dir.glob(f"{_PREFIX}*.parquet"):
+            date = p.stem[len(_PREFIX):]
+            self._index[date] = {"path": p, "rows": None}
+        manifest = self.dir / "_manifest.json"
+        if manifest.exists():
+            try:
+                meta = json.loads(manifest.read_text())
+                self._synced_at = meta.get("synced_at")
+                for date, rows in (meta.get("rows") or {}).items():
+                    if date in self._index:
+                        self._index[date]["rows"] = rows
+            except (OSError, ValueError):
+                pass
+
+    def _write_manifest(self) -> None:
+        tmp = self.dir / "_manifest.json.tmp"
+        tmp.write_text(json.dumps({
+            "synced_at": self._synced_at,
+            "rows": {d: m["rows"] for d, m in self._index.items() if m["rows"] is not None},
+        }))
+        os.replace(tmp, self.dir / "_manifest.json")
+
+    def dates(self) -> List[str]:
+        with self._lock:
+            return sorted(self._index)
+
+    def latest_date(self) -> Optional[str]:
+        dates = self.dates()
+        return dates[-1] if dates else None
+
+    def is_fresh(self, max_age_s: float = DEFAULT_MAX_AGE_S) -> bool:
+        """True if the store has partitions and was synced against the source recently."""
+        return bool(self._index) and self._synced_at is not None and time.time() - self._synced_at <= max_age_s
+
+    # --- writes (append-only) ---
+    def append_partition(self, date: Any, df: pd.DataFrame) -> None:
+        """Write one new partition. Raises ValueError if the date already exists."""
+        key = _date_key(date)
+        with self._lock:
+            if key in self._index:
+                raise ValueError(f"Partition {self.date_col}={key} already exists (store is append-only).")
+            self.dir.mkdir(parents=True, exist_ok=True)
+            path = self.dir / f"{_PREFIX}{key}.parquet"
+            tmp = path.with_suffix(".parquet.tmp")
+            try:
+                df.reset_index(drop=True).to_parquet(tmp, index=False)
+                os.replace(tmp, path)
+            except BaseException:
+                tmp.unlink(missing_ok=True)  # never leave a half-written file next to the partitions
+                raise
+            self._index[key] = {"path": path, "rows": len(df)}
+
+    def sync(self, df: pd.DataFrame) -> List[str]:
+        """
+        Append every `date_col` value of `df` that has no partition yet.
+        Returns the newly written dates.
+        """
+        if df.empty or self.date_col not in df.columns:
+            return []
+        keys = df[self.date_col].map(_date_key)
+        written: List[str] = []
+        with self._lock:
+            for key, part in df.groupby(keys, sort=True):
+                if key not in self._index:
+                    self.append_partition(key, part)
+                    written.append(key)
+            self._synced_at = time.time()
+            self._write_manifest()
+        return written
+
+    # --- reads ---
+    def prune(self, filters: Iterable[dict]) -> List[str]:
+        """Dates whose partition can satisfy every filter on the partition column."""
+        dates = self.dates()
+        for f in filters:
+            if f.get("col") != self.date_col:
+                continue
+            op, val = f.get("op"), f.get("val")
+            if op in {"in", "not_in"}:
+                vals = {_date_key(v) for v in val}
+                dates = [d for d in dates if (d in vals) == (op == "in")]
+                continue
+            if op not in {"==", "!=", ">", ">=", "<", "<="}:
+                continue  # e.g. 'contains': cannot prune, keep all
+            v = _date_key(val)
+            if op == "==":
+                dates = [d for d in dates if d == v]
+            elif op == "!=":
+                dates = [d for d in dates if d != v]
+            elif op == ">":
+                dates = [d for d in dates if d > v]
+            elif op == ">=":
+                dates = [d for d in dates if d >= v]
+            elif op == "<":
+                dates = [d for d in dates if d < v]
+            elif op == "<=":
+                dates = [d for d in dates if d <= v]
+        return dates
+
+    def _read_partition(self, date: str, columns: Optional[List[str]]) -> pd.DataFrame:
+        ck = (date, tuple(columns) if columns else None)
+        with self._lock:
+            if ck in self._cache:
+                self._cache.move_to_end(ck)
+                return self._cache[ck]
+            path = self._index[date]["path"]
+        df = pd.read_parquet(path, columns=columns)
+        with self._lock:
+            self._cache[ck] = df
+            while len(self._cache) > self._max_cached:
+                self._cache.popitem(last=False)
+        return df
+
+    def read(self, dates: Iterable[str], columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Concatenate the given partitions, reading only `columns` if provided."""
+        frames = [self._read_partition(d, columns) for d in dates]
+        if not frames:
+            any_date = self.latest_date()
+            if any_date is None:
+                return pd.DataFrame(columns=columns or [])
+            return self._read_partition(any_date, columns).iloc[:0]  # keep the schema
+        return pd.concat(frames, ignore_index=True)
+
+    def read_latest(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        latest = self.latest_date()
+        return self.read([latest] if latest else [], columns)
+
+    def read_range(self, start: Any = None, end: Any = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Partitions with start <= as_of_date <= end (inclusive, either bound optional)."""
+        filters = []
+        if start is not None:
+            filters.append({"col": self.date_col, "op": ">=", "val": start})
+        if end is not None:
+            filters.append({"col": self.date_col, "op": "<=", "val": end})
+        return self.read(self.prune(filters), columns)
+
+
+# ---------- Process-wide stores ----------
+_STORES: Dict[str, SnapshotStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_snapshot_store(table: str) -> SnapshotStore:
+    if table not in SNAPSHOT_TABLES:
+        raise ValueError(f"Table is not snapshot-partitioned: {table}")
+    with _STORES_LOCK:
+        if table not in _STORES:
+            _STORES[table] = SnapshotStore(table)
+        return _STORES[table]
+
+
+# ---------- Query-plan source ----------
+# Registered with tools.query_plan.register_source: a Scan that asks for the latest
+# snapshot or filters on the partition column reads only the matching partitions.
+_PRUNABLE_OPS = {"==", "!=", ">", ">=", "<", "<=", "in", "not_in"}
+
+
+def scan_matches(scan) -> bool:
+    date_col = SNAPSHOT_TABLES.get(scan.table)
+    if date_col is None:
+        return False
+    wants = getattr(scan, "snapshot", None) == "latest" or any(
+        f.get("col") == date_col and f.get("op") in _PRUNABLE_OPS for f in scan.filters
+    )
+    return wants and get_snapshot_store(scan.table).is_fresh()
+
+
+def scan_load(scan, run_tool=None) -> pd.DataFrame:
+    store = get_snapshot_store(scan.table)
+    dates = store.prune(scan.filters)
+    if getattr(scan, "snapshot", None) == "latest":
+        latest = store.latest_date()
+        dates = [d for d in dates if d == latest]
+    columns = None
+    if scan.columns is not None:
+        # the remaining filters still run on the result, so keep their columns too
+        needed = list(scan.columns) + [f["col"] for f in scan.filters]
+        columns = list(dict.fromkeys(needed))
+    return store.read(dates, columns)
@@ -1,6 +1,11 @@
 # ----------------------------------------------------
 # The specs file defines how the LLM sees the tools.
 # ----------------------------------------------------
+from tools.schema_catalog import _SCHEMA_REGISTRY, list_datasets, loader_tool_name
+
+# One loader step per catalog table (tools.registry registers the matching tools)
+LOADER_TOOL_NAMES = [loader_tool_name(d) for d in list_datasets()]
+
 # MAKE_PLAN_SPEC = {
 #   "type": "function",
 #   "function": {
@@ -79,6 +84,24 @@
 #   }
 # }
 
+AGGREGATE_METRICS_SCHEMA = {
+  "type": "array",
+  "minItems": 1,
+  "items": {
+    "type": "object",
+    "properties": {
+      "col": {"type": "string"},
+      "agg": {
+        "type": "string",
+        "enum": ["sum", "mean", "median", "min", "max", "count", "nunique", "std"]
+      },
+      "as": {"type": "string", "description": "Output column name (default '<agg>_<col>')."}
+    },
+    "required": ["col", "agg"],
+    "additionalProperties": False
+  }
+}
+
 MAKE_PLAN_SPEC = {
   "type": "function",
   "function": {
@@ -87,18 +110,31 @@ MAKE_PLAN_SPEC = {
       "Plan the MINIMAL sequence of steps to satisfy the user's request using available tools.\n"
       "Allowed steps:\n"
       "  - 'load_biwenger_player_stats' (load season snapshot as a DataFrame)\n"
+      "  - 'load_<dataset>' (load another table listed under 'datasets' in the context, if any; "
+      "only when the question needs its columns)\n"
       "  - 'filter_df' (apply deterministic filters to the current DataFrame; MUST include args.filters)\n"
+      "  - 'aggregate_df' (group-by aggregation; args.metrics and optional args.group_by)\n"
+      "  - 'join_df' (add columns of another table by matching keys; args.table, args.on or args.left_on/right_on, "
+      "optional args.how and args.columns; prefer over translate_to_pandas for lookups across tables)\n"
+      "  - 'sort_df' (sort the current DataFrame; args.by and optional args.ascending)\n"
+      "  - 'top_k' (the k rows with the largest/smallest args.col; prefer over sort_df for 'top N' questions)\n"
+      "  - 'select_columns' (keep only args.columns, in order)\n"
       "  - 'translate_to_pandas' (emit a pandas code string that expects df_in and sets df_out; no execution)\n"
+      "  - 'use_previous_result' (start from the previous turn's result instead of loading; only if previous_result is in the context)\n"
       "Guidance:\n"
-      "  • Prefer the shortest path (usually: load_biwenger_player_stats → ONE of {filter_df | translate_to_pandas}).\n"
+      "  • Prefer the shortest path: load_biwenger_player_stats → [filter_df] → [aggregate_df | sort_df | top_k] → [select_columns].\n"
+      "  • Use translate_to_pandas ONLY when the request cannot be expressed with the deterministic steps above.\n"
+      "  • Follow-ups that refine the previous answer ('now only midfielders', 'sort that by value') start with "
+      "use_previous_result and add ONLY the new steps; start from a load when the user asks something new.\n"
       "  • Do NOT include any execution step for pandas code; just return the code string when using translate_to_pandas.\n"
       "  • Use the provided schema context; only use listed columns.\n"
       "  • For columns present in value_hints (e.g., team, position, season): map user text to a canonical value from that list and use exact equality (==). Never modify categorical values in-place.\n"
       "  • For date filtering, prefer inclusive ISO bounds (>= start & <= end) over year/month extraction when a concrete range is implied.\n"
+      "  • Each as_of_date is a full snapshot: for current-state questions load with snapshot='latest'; for trends filter as_of_date to the range.\n"
       "Return shape:\n"
       "  • A PLAN object with keys: steps, why, assumptions (no top-level 'filters' or other keys).\n"
       "  • Use the exact key 'args' (lowercase) for step arguments.\n"
-      "Always include 'why' (<=120 chars) and up to 3 short 'assumptions'."
+      "Always include 'why' (<=120 chars) and up to 3 short 'assumptions', plus an honest 'confidence'."
     ),
     "parameters": {
       "type": "object",
@@ -111,14 +147,23 @@ MAKE_PLAN_SPEC = {
             "properties": {
               "tool": {
                 "type": "string",
-                "enum": ["load_biwenger_player_stats", "filter_df", "translate_to_pandas"]
+                "enum": LOADER_TOOL_NAMES + ["use_previous_result", "filter_df", "aggregate_df", "join_df",
+                                             "sort_df", "top_k", "select_columns", "translate_to_pandas"]
               },
               "args": {
                 "type": "object",
                 "description": (
                   "Arguments for the step.\n"
-                  "- For 'load_biwenger_player_stats', use an empty object {}.\n"
+                  "- For 'load_biwenger_player_stats', use an empty object {}, or {\"snapshot\": \"latest\"} when only the current state matters.\n"
+                  "- For 'use_previous_result', use an empty object {}.\n"
                   "- For 'filter_df', provide 'filters' as a non-empty array of {col, op, val}.\n"
+                  "- For 'aggregate_df', provide 'metrics' as a non-empty array of {col, agg, as?} and optional 'group_by'.\n"
+                  "- For 'join_df', provide 'table' and 'on' (key columns shared by both tables) or 'left_on'/'right_on', "
+                  "optional 'how' ('inner' drops rows without a match, 'left' keeps them) and 'columns' to bring; "
+                  "clashing names get a '_<table>' suffix.\n"
+                  "- For 'sort_df', provide 'by' (array of columns) and optional 'ascending'.\n"
+                  "- For 'top_k', provide 'col', 'k' and optional 'ascending' (default false = largest first).\n"
+                  "- For 'select_columns', provide 'columns'.\n"
                   "- For 'translate_to_pandas', provide 'query' with the user's natural-language request."
                 ),
                 "properties": {
@@ -142,6 +187,50 @@ MAKE_PLAN_SPEC = {
                   "query": {
                     "type": "string",
                     "description": "Only for 'translate_to_pandas': the user request to translate into pandas code."
+                  },
+                  "snapshot": {
+                    "type": "string",
+                    "enum": ["latest", "all"],
+                    "description": "Only for snapshot tables (load_biwenger_player_stats, or join_df on it): 'latest' loads just the newest as_of_date."
+                  },
+                  "metrics": AGGREGATE_METRICS_SCHEMA,
+                  "group_by": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Only for 'aggregate_df': grouping columns (omit for a single total row)."
+                  },
+                  "by": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "minItems": 1,
+                    "description": "Only for 'sort_df': sort keys, most significant first."
+                  },
+                  "ascending": {
+                    "anyOf": [
+                      {"type": "boolean"},
+                      {"type": "array", "items": {"type": "boolean"}}
+                    ],
+                    "description": "For 'sort_df' (bool or one per key) and 'top_k' (bool)."
+                  },
+                  "table": {"type": "string", "description": "Only for 'join_df': the catalog table to join with."},
+                  "on": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "minItems": 1,
+                    "description": "Only for 'join_df': key columns with the same name in both tables."
+                  },
+                  "left_on": {"type": "array", "items": {"type": "string"}, "minItems": 1,
+                              "description": "Only for 'join_df': keys of the current DataFrame."},
+                  "right_on": {"type": "array", "items": {"type": "string"}, "minItems": 1,
+                               "description": "Only for 'join_df': keys of 'table', same order as left_on."},
+                  "how": {"type": "string", "enum": ["inner", "left"], "description": "Only for 'join_df' (default 'inner')."},
+                  "col": {"type": "string", "description": "Only for 'top_k': the ranking column."},
+                  "k": {"type": "integer", "minimum": 1, "description": "Only for 'top_k': number of rows."},
+                  "columns": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "minItems": 1,
+                    "description": "For 'select_columns': columns to keep, in order. For 'join_df': columns of 'table' to bring (default all)."
                   }
                 },
                 "additionalProperties": False
@@ -160,6 +249,12 @@ MAKE_PLAN_SPEC = {
           "type": "array",
           "items": {"type": "string", "maxLength": 120},
           "maxItems": 3
+        },
+        "confidence": {
+          "type": "number",
+          "minimum": 0,
+          "maximum": 1,
+          "description": "How sure you are (0..1) that the plan answers the request with the listed columns/values."
         }
       },
       "required": ["steps","why","assumptions"],
@@ -177,17 +272,39 @@ LOAD_BIWENGER_PLAYER_STATS_SPEC = {
             "Load the full Biwenger player **season snapshot** table from Supabase (cached, read-only). "
             "Each row is one player with cumulative season metrics as of `as_of_date` "
             "(fields include: player_name, team, position, points, matches_played, average (which is average points), "
-            "value/min_value/max_value, market_purchases_pct, market_sales_pct, market_usage_pct, season, as_of_date). "
+            "value/min_value/max_value, market_purchases_pct, market_sales_pct, market_usage_pct, season, as_of_date), "
+            "plus precomputed derived metrics (value_per_point, points_per_match, value_gain, value_to_max). "
             "Use this when the user asks for player statistics, totals, averages, values or market % at the season snapshot level."
         ),
         "parameters": {
             "type": "object",
-            "properties": {},              # no arguments yet; full snapshot
+            "properties": {
+                "snapshot": {
+                    "type": "string",
+                    "enum": ["latest", "all"],
+                    "description": "'latest' = only the newest as_of_date; 'all' (default) = full history."
+                }
+            },
             "additionalProperties": False
         }
     }
 }
 
+def loader_spec(dataset: str) -> dict:
+    """Generic loader spec for a catalog table (its description and column names)."""
+    entry = _SCHEMA_REGISTRY[dataset]
+    columns = ", ".join(c["name"] for c in entry.get("columns", []))
+    return {
+        "type": "function",
+        "function": {
+            "name": loader_tool_name(dataset),
+            "description": f"Load the full '{dataset}' table from Supabase (cached, read-only). "
+                           f"{entry.get('description', '')} Fields: {columns}.",
+            "parameters": {"type": "object", "properties": {}, "additionalProperties": False},
+        },
+    }
+
+
 TRANSLATE_TO_PANDAS_SPEC = {
     "type": "function",
     "function": {
@@ -209,6 +326,109 @@ TRANSLATE_TO_PANDAS_SPEC = {
 }
 
 
+AGGREGATE_DF_SPEC = {
+    "type": "function",
+    "function": {
+        "name": "aggregate_df",
+        "description": (
+            "Group the current DataFrame by `group_by` and compute `metrics` (sum, mean, median, min, max, "
+            "count, nunique, std). Without `group_by`, returns one total row. "
+            "Use for questions like 'average points by team' or 'sum of value per position'."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "metrics": AGGREGATE_METRICS_SCHEMA,
+                "group_by": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["metrics"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+JOIN_DF_SPEC = {
+    "type": "function",
+    "function": {
+        "name": "join_df",
+        "description": (
+            "Add columns of another catalog table to the current DataFrame by matching key columns "
+            "(hash join; 'inner' keeps matched rows, 'left' keeps every row with NaN where nothing matches). "
+            "Use for lookups like 'points with each player's latest market price'."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "table": {"type": "string"},
+                "on": {"type": "array", "items": {"type": "string"}, "minItems": 1},
+                "left_on": {"type": "array", "items": {"type": "string"}, "minItems": 1},
+                "right_on": {"type": "array", "items": {"type": "string"}, "minItems": 1},
+                "how": {"type": "string", "enum": ["inner", "left"]},
+                "columns": {"type": "array", "items": {"type": "string"}, "minItems": 1},
+                "snapshot": {"type": "string", "enum": ["latest", "all"]},
+            },
+            "required": ["table"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+SORT_DF_SPEC = {
+    "type": "function",
+    "function": {
+        "name": "sort_df",
+        "description": "Sort the current DataFrame by one or more columns (NaNs last).",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "by": {"type": "array", "items": {"type": "string"}, "minItems": 1},
+                "ascending": {
+                    "anyOf": [{"type": "boolean"}, {"type": "array", "items": {"type": "boolean"}}]
+                },
+            },
+            "required": ["by"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+TOP_K_SPEC = {
+    "type": "function",
+    "function": {
+        "name": "top_k",
+        "description": (
+            "Return the k rows with the largest (default) or smallest `col`, ordered. "
+            "Use for 'top 10 most valuable forwards'-style questions instead of sort_df."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "col": {"type": "string"},
+                "k": {"type": "integer", "minimum": 1},
+                "ascending": {"type": "boolean", "description": "true = smallest first."},
+            },
+            "required": ["col", "k"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+SELECT_COLUMNS_SPEC = {
+    "type": "function",
+    "function": {
+        "name": "select_columns",
+        "description": "Keep only the listed columns of the current DataFrame, in the given order.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "columns": {"type": "array", "items": {"type": "string"}, "minItems": 1},
+            },
+            "required": ["columns"],
+            "additionalProperties": False,
+        },
+    },
+}
+
 
 # Router will see ONLY the planner:
 PLANNER_TOOL_SPECS = [MAKE_PLAN_SPEC]
@@ -216,5 +436,11 @@ PLANNER_TOOL_SPECS = [MAKE_PLAN_SPEC]
 # Executor knows about concrete runtime functions:
 EXECUTION_TOOL_SPECS = [
     LOAD_BIWENGER_PLAYER_STATS_SPEC,
+    *[loader_spec(d) for d in list_datasets() if d != "biwenger_player_stats"],
+    AGGREGATE_DF_SPEC,
+    JOIN_DF_SPEC,
+    SORT_DF_SPEC,
+    TOP_K_SPEC,
+    SELECT_COLUMNS_SPEC,
     TRANSLATE_TO_PANDAS_SPEC
 ]
\ No newline at end of file
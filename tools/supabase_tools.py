@@ -1,10 +1,53 @@
-from typing import Optional, List
-from supabase import create_client, Client
+from __future__ import annotations
+from typing import Optional, List, TYPE_CHECKING
+import logging
+import os
 from pathlib import Path
 import tomllib
 import pandas as pd
 from functools import lru_cache
-import streamlit as st
+
+if TYPE_CHECKING:  # supabase is imported on first use (slow import)
+    from supabase import Client
+
+from tools.dataframe_transformation_tools import materialize_derived_columns
+from tools.snapshot_store import SNAPSHOT_TABLES, get_snapshot_store
+from tools.resilience import RetryPolicy, call_with_resilience, default_retryable, retryable_status
+from tools.column_stats import register_column_stats
+from tools.tracing import span
+from tools.table_cache import get_table_cache
+from tools.dataset_store import get_dataset_registry
+
+_log = logging.getLogger(__name__)
+
+_TABLE_CACHE = get_table_cache()
+# a table that leaves the cache is no longer pinned as its dataset's newest version
+_TABLE_CACHE.on_evict(get_dataset_registry().forget)
+
+# Per-page budgets: total (retries included) and per attempt. Pages are idempotent
+# reads, so slow ones are hedged once enough latencies have been seen.
+PAGE_DEADLINE_S = float(os.getenv("SUPABASE_PAGE_DEADLINE_S", "60"))
+PAGE_ATTEMPT_TIMEOUT_S = float(os.getenv("SUPABASE_PAGE_ATTEMPT_TIMEOUT_S", "20"))
+
+# PostgREST errors that are transient: connection to the database lost / schema
+# cache not ready (both served as 503) and statement timeout.
+_RETRYABLE_PGRST_CODES = {"PGRST000", "PGRST001", "PGRST002", "57014"}
+
+
+def _page_retryable(exc: BaseException) -> bool:
+    """
+    postgrest.APIError has no status_code: JSON errors carry the PostgREST/SQLSTATE
+    code, non-JSON (gateway) errors the HTTP status, both in `code`.
+    """
+    code = getattr(exc, "code", None)
+    if code in _RETRYABLE_PGRST_CODES:
+        return True
+    if isinstance(code, int) or (isinstance(code, str) and code.isdigit() and len(code) == 3):
+        return retryable_status(int(code))
+    return default_retryable(exc)
+
+
+_PAGE_RETRY = RetryPolicy(retryable=_page_retryable)
 
 # ---------- 0) Cached data ----------
 try:
@@ -19,6 +62,7 @@ try:
 
 except Exception:  # not running in functools
     def cache_data(ttl: Optional[int] = 3600):
+        import streamlit as st
         return st.cache_data(show_spinner=False, ttl=ttl)
 
     STREAMLIT = True
@@ -32,22 +76,29 @@ def get_supabase_client() -> Client:
         [supabase]
         url = "https://xxx.supabase.co"
         anon_key = "xxx"
+    SUPABASE_URL / SUPABASE_ANON_KEY env vars take precedence (e.g. a local
+    PostgREST stand-in, see benchmarks/standins.py).
     """
-    secrets_path = (
-        Path(__file__).resolve().parent.parent / "secrets" / "supabase.toml"
-    )
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_ANON_KEY")
+
+    if not (url and key):
+        secrets_path = (
+            Path(__file__).resolve().parent.parent / "secrets" / "supabase.toml"
+        )
 
-    if not secrets_path.exists():
-        raise FileNotFoundError(f"Missing secrets file at: {secrets_path}")
+        if not secrets_path.exists():
+            raise FileNotFoundError(f"Missing secrets file at: {secrets_path}")
 
-    with open(secrets_path, "rb") as f:
-        cfg = tomllib.load(f)
+        with open(secrets_path, "rb") as f:
+            cfg = tomllib.load(f)
 
-    url = cfg.get("supabase", {}).get("url")
-    key = cfg.get("supabase", {}).get("anon_key")
+        url = url or cfg.get("supabase", {}).get("url")
+        key = key or cfg.get("supabase", {}).get("anon_key")
     if not url or not key:
         raise KeyError("Missing 'url' or 'anon_key' in supabase.toml")
 
+    from supabase import create_client
     return create_client(url, key)
 
 # ---------- 2) Function to fetch any data from Supabase ----------
@@ -62,28 +113,48 @@ def _fetch_all_rows_from_supabase_raw(
     Notes:
     - If the table is large, this will load it fully into memory.
     - For Streamlit, wrap this with st.cache_data to avoid repeated downloads.
+    - Each page has a deadline, is retried with jittered backoff and hedged
+      after the p95 page latency (see tools.resilience).
+    - Works with servers that cap rows per response below `page_size`; a table
+      that fits in one short page costs one extra (empty) request.
     """
-    supabase = get_supabase_client()
+    with span("supabase.fetch", table=table_name, page_size=page_size) as fetch_span:
+        supabase = get_supabase_client()
 
-    rows: List[dict] = []
-    start = 0
+        rows: List[dict] = []
+        start = 0
+        largest = 0  # biggest page seen so far
 
-    while True:
-        # Request a fixed window [start, start+page_size-1]
-        res = supabase.table(table_name).select("*").range(start, start + page_size - 1).execute()
-        batch = getattr(res, "data", None) or []
-        if not batch:
-            break
+        while True:
+            # Request a fixed window [start, start+page_size-1]
+            with span("supabase.page", offset=start) as page_span:
+                res = call_with_resilience(
+                    lambda s=start: supabase.table(table_name).select("*").range(s, s + page_size - 1).execute(),
+                    name="supabase.page",
+                    deadline_s=PAGE_DEADLINE_S,
+                    attempt_timeout_s=PAGE_ATTEMPT_TIMEOUT_S,
+                    retry=_PAGE_RETRY,
+                    hedge=True,
+                )
+                batch = getattr(res, "data", None) or []
+                page_span.set(rows=len(batch))
+            fetch_span.incr("pages")
+            if not batch:
+                break
 
-        rows.extend(batch)
-        got = len(batch)
-        start += got
+            rows.extend(batch)
+            got = len(batch)
+            start += got
 
-        # If we got fewer rows than requested, that was the last page.
-        if got < page_size:
-            break
+            # A page shorter than requested is the last one, unless the server caps rows
+            # per response (PostgREST max-rows): then pages repeat at that capped size.
+            if got < page_size and got < largest:
+                break
+            largest = max(largest, got)
+        fetch_span.set(rows=len(rows))
 
-    return pd.DataFrame(rows)
+    with span("build_dataframe", rows=len(rows)):
+        return pd.DataFrame(rows)
 
 
 # ---------- 3) Cached wrappers to call by specific functions ----------
@@ -95,14 +166,83 @@ def fetch_all_rows_from_supabase(table_name: str) -> pd.DataFrame:
     """
     return _fetch_all_rows_from_supabase_raw(table_name=table_name)
 
-# ---------- 4) Table-specific loading functions  ----------
-def load_biwenger_player_stats() -> pd.DataFrame:
+def load_table(table_name: str) -> pd.DataFrame:
     """
-    Loads the full 'biwenger_player_stats' table (cached).
+    Cached "read entire table + materialize derived columns" helper.
+    Derived columns (schema_catalog._DERIVED_COLUMNS) and column statistics
+    (tools.column_stats) are computed once per load/refresh and cached together with the table.
+    All tables share one memory budget; the least recently used are evicted whole (tools.table_cache).
+    The returned frame is shared by every caller and is read-only by convention: copy before mutating.
     """
-    df = fetch_all_rows_from_supabase("biwenger_player_stats")
+    return _TABLE_CACHE.get_or_load(table_name, lambda: _load_table_uncached(table_name))
+
+
+def _load_table_uncached(table_name: str) -> pd.DataFrame:
+    df = _fetch_all_rows_from_supabase_raw(table_name=table_name)
+    with span("derived_columns"):
+        df = materialize_derived_columns(df, table_name)
+    with span("column_stats"):
+        register_column_stats(table_name, df)
+    if table_name in SNAPSHOT_TABLES:
+        with span("snapshot_sync") as sp:
+            try:
+                # append any new as_of_date partitions to the local snapshot store
+                sp.set(new_partitions=len(get_snapshot_store(table_name).sync(df)))
+            except (OSError, ImportError, ValueError, TypeError) as e:
+                # read-only disk, no pyarrow, or a column pyarrow cannot store
+                # (ArrowInvalid is a ValueError, ArrowTypeError a TypeError)
+                _log.warning("Snapshot sync skipped for '%s': %s", table_name, e)
     return df
 
+# ---------- 4) Loading functions (one generic loader tool per catalog table) ----------
+# The latest partition of a snapshot table is cached as its own entry "<table>@latest"
+# (same memory budget), so repeated snapshot="latest" loads return the same frame and
+# per-frame caches (join hash indexes) are reused. It leaves the cache with its table.
+_LATEST_SUFFIX = "@latest"
+
+
+def _drop_latest_partition(table: str) -> None:
+    if not table.endswith(_LATEST_SUFFIX):
+        _TABLE_CACHE.evict(table + _LATEST_SUFFIX)
+
+
+_TABLE_CACHE.on_evict(_drop_latest_partition)
+
+
+def _latest_partition(table_name: str, df: pd.DataFrame, date_col: str) -> pd.DataFrame:
+    def load() -> pd.DataFrame:
+        dates = df[date_col].astype(str).str[:10]
+        return df.loc[dates == dates.max()]
+
+    return _TABLE_CACHE.get_or_load(table_name + _LATEST_SUFFIX, load)
+
+
+def load_dataset(table_name: str, snapshot: Optional[str] = None) -> pd.DataFrame:
+    """
+    Loads a full catalog table, with derived columns (cached).
+    snapshot="latest" keeps only the most recent partition of snapshot tables (cached too).
+    Both are shared frames, read-only by convention: copy before mutating.
+    """
+    date_col = SNAPSHOT_TABLES.get(table_name)
+    if snapshot not in (None, "all", "latest") or (snapshot == "latest" and not date_col):
+        raise ValueError(f"Unsupported snapshot for '{table_name}': {snapshot}")
+    with span("load", table=table_name, snapshot=snapshot) as sp:
+        misses = _TABLE_CACHE.cache_info().misses
+        df = load_table(table_name)
+        sp.set(cache="miss" if _TABLE_CACHE.cache_info().misses > misses else "hit")
+        if snapshot == "latest" and not df.empty:  # an empty table is its own latest partition
+            df = _latest_partition(table_name, df, date_col)
+        sp.set(rows_out=len(df))
+    return df
+
+
+def load_biwenger_player_stats(snapshot: Optional[str] = None) -> pd.DataFrame:
+    """
+    Loads the full 'biwenger_player_stats' table, with derived columns (cached).
+    snapshot="latest" keeps only the most recent as_of_date.
+    """
+    return load_dataset("biwenger_player_stats", snapshot)
+
 
 if __name__ == "__main__":
     pd.set_option('display.max_columns', None)
@@ -0,0 +1,130 @@
+# tools/table_cache.py
+# ----------------------------------------------------
+# Process-wide cache of loaded tables (with derived columns) under one memory budget.
+#   - whole tables are evicted least-recently-used first once the cached total
+#     exceeds TABLE_CACHE_MAX_MB (a table bigger than the budget is still kept, alone)
+#   - entries expire after TABLE_CACHE_TTL_S (freshness, as the old lru/st.cache_data TTL)
+#   - concurrent misses for the same table share one load (no thundering herd)
+# Evicted frames stay alive while sessions hold handles to them (tools.dataset_store).
+# ----------------------------------------------------
+from __future__ import annotations
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+TABLE_CACHE_MAX_MB = float(os.getenv("TABLE_CACHE_MAX_MB", "1024"))
+TABLE_CACHE_TTL_S = float(os.getenv("TABLE_CACHE_TTL_S", "3600"))
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "evictions", "tables", "bytes", "max_bytes"])
+
+
+class _Entry:
+    __slots__ = ("df", "bytes", "loaded_at", "hits")
+
+    def __init__(self, df: pd.DataFrame, nbytes: int):
+        self.df, self.bytes, self.loaded_at, self.hits = df, nbytes, time.monotonic(), 0
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    """Resident size, strings included (measured once per load)."""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+class TableCache:
+    def __init__(self, max_bytes: float = TABLE_CACHE_MAX_MB * 2**20, ttl_s: float = TABLE_CACHE_TTL_S):
+        self.max_bytes = int(max_bytes)
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()   # LRU order: oldest first
+        self._loading: Dict[str, threading.Lock] = {}
+        self._hits = self._misses = self._evictions = 0
+        self._on_evict: List[Callable[[str], None]] = []
+
+    def on_evict(self, fn: Callable[[str], None]) -> None:
+        """Call fn(table) whenever a table leaves the cache (evicted, expired or cleared)."""
+        self._on_evict.append(fn)
+
+    def _fresh(self, table: str) -> Optional[_Entry]:
+        e = self._entries.get(table)
+        if e is not None and time.monotonic() - e.loaded_at > self.ttl_s:
+            return None
+        return e
+
+    def get_or_load(self, table: str, load: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        with self._lock:
+            e = self._fresh(table)
+            if e is not None:
+                self._entries.move_to_end(table)
+                e.hits += 1
+                self._hits += 1
+                return e.df
+            gate = self._loading.setdefault(table, threading.Lock())
+        with gate:  # one loader per table; the others wait and then hit
+            with self._lock:
+                e = self._fresh(table)
+                if e is not None:
+                    self._entries.move_to_end(table)
+                    e.hits += 1
+                    self._hits += 1
+                    return e.df
+                self._misses += 1
+            df = load()
+            self._put(table, df, frame_bytes(df))
+            return df
+
+    def _put(self, table: str, df: pd.DataFrame, nbytes: int) -> None:
+        evicted = []
+        with self._lock:
+            if self._entries.pop(table, None) is not None:
+                evicted.append(table)  # replaced (expired) version
+            self._entries[table] = _Entry(df, nbytes)
+            total = sum(e.bytes for e in self._entries.values())
+            while total > self.max_bytes and len(self._entries) > 1:
+                name, old = self._entries.popitem(last=False)
+                total -= old.bytes
+                self._evictions += 1
+                evicted.append(name)
+        for name in evicted:
+            self._notify(name)
+
+    def _notify(self, table: str) -> None:
+        for fn in self._on_evict:
+            fn(table)
+
+    def evict(self, table: str) -> bool:
+        with self._lock:
+            gone = self._entries.pop(table, None) is not None
+        if gone:
+            self._notify(table)
+        return gone
+
+    def cache_clear(self) -> None:
+        with self._lock:
+            names = list(self._entries)
+            self._entries.clear()
+        for name in names:
+            self._notify(name)
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._evictions, len(self._entries),
+                             sum(e.bytes for e in self._entries.values()), self.max_bytes)
+
+    def stats(self) -> List[dict]:
+        """Cached tables, least recently used first (for debug panels)."""
+        now = time.monotonic()
+        with self._lock:
+            return [{"table": name, "rows": len(e.df), "mb": round(e.bytes / 2**20, 1), "hits": e.hits,
+                     "age_s": round(now - e.loaded_at, 1)} for name, e in self._entries.items()]
+
+
+# ---------- Process-wide cache ----------
+_CACHE = TableCache()
+
+
+def get_table_cache() -> TableCache:
+    return _CACHE
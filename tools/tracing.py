@@ -0,0 +1,200 @@
+# tools/tracing.py
+# ----------------------------------------------------
+# Lightweight in-process tracing for the query pipeline.
+#   with start_trace("plan", query=...) as trace:      # one per user action
+#       with span("route_to_tool") as sp:               # nested, timed stages
+#           sp.set(tokens_in=..., tokens_out=...)
+# Spans outside an active trace are no-ops. The current trace/span live in
+# contextvars, so nesting follows the call stack (and asyncio tasks) but not
+# worker threads. Finished traces are kept in memory for the debug panels and
+# can be exported as JSONL (one span per line); set TRACE_JSONL=<path> to append
+# every finished trace automatically.
+# ----------------------------------------------------
+from __future__ import annotations
+import contextvars
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional
+
+_log = logging.getLogger(__name__)
+
+TRACE_JSONL = os.getenv("TRACE_JSONL")
+_MAX_RECENT = 50
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: int
+    parent_id: Optional[int]
+    start_s: float                     # offset from the trace start
+    end_s: Optional[float] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_s(self) -> Optional[float]:
+        return None if self.end_s is None else self.end_s - self.start_s
+
+    def set(self, **attrs: Any) -> "Span":
+        self.attrs.update(attrs)
+        return self
+
+    def incr(self, key: str, n: int = 1) -> "Span":
+        self.attrs[key] = self.attrs.get(key, 0) + n
+        return self
+
+
+class _NoopSpan:
+    """Returned by span() when no trace is active; attribute calls are dropped."""
+
+    def set(self, **attrs: Any) -> "_NoopSpan":
+        return self
+
+    def incr(self, key: str, n: int = 1) -> "_NoopSpan":
+        return self
+
+
+_NOOP = _NoopSpan()
+
+
+@dataclass
+class Trace:
+    name: str
+    trace_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    started_at: float = field(default_factory=time.time)     # wall clock, for export
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    spans: List[Span] = field(default_factory=list)
+    _t0: float = field(default_factory=time.perf_counter, repr=False)
+    _ids: Iterator[int] = field(default_factory=lambda: itertools.count(1), repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def _open(self, name: str, parent: Optional[Span], attrs: Dict[str, Any]) -> Span:
+        with self._lock:
+            sp = Span(name, next(self._ids), parent.span_id if parent else None,
+                      time.perf_counter() - self._t0, attrs=dict(attrs))
+            self.spans.append(sp)
+        return sp
+
+    @property
+    def duration_s(self) -> float:
+        ends = [s.end_s for s in self.spans if s.end_s is not None]
+        return max(ends) if ends else 0.0
+
+    def depth(self, sp: Span) -> int:
+        by_id = {s.span_id: s for s in self.spans}
+        d, p = 0, sp.parent_id
+        while p is not None and p in by_id:
+            d, p = d + 1, by_id[p].parent_id
+        return d
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """One flat, JSON-friendly dict per span."""
+        return [
+            {
+                "trace_id": self.trace_id,
+                "trace": self.name,
+                "trace_started_at": self.started_at,
+                "trace_attrs": self.attrs,
+                "span_id": s.span_id,
+                "parent_id": s.parent_id,
+                "name": s.name,
+                "depth": self.depth(s),
+                "start_ms": round(s.start_s * 1000, 3),
+                "duration_ms": round(s.duration_s * 1000, 3) if s.duration_s is not None else None,
+                "attrs": s.attrs,
+                "error": s.error,
+            }
+            for s in self.spans
+        ]
+
+
+_CURRENT_TRACE: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+_CURRENT_SPAN: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("span", default=None)
+_RECENT: Deque[Trace] = deque(maxlen=_MAX_RECENT)
+_RECENT_LOCK = threading.Lock()
+
+
+@contextmanager
+def start_trace(name: str, **attrs: Any) -> Iterator[Trace]:
+    """
+    Open a trace for one user action. Nested start_trace calls reuse the outer
+    trace (the inner one becomes a span).
+    """
+    if _CURRENT_TRACE.get() is not None:
+        with span(name, **attrs):
+            yield _CURRENT_TRACE.get()
+        return
+    trace = Trace(name, attrs=dict(attrs))
+    tok_t, tok_s = _CURRENT_TRACE.set(trace), _CURRENT_SPAN.set(None)
+    try:
+        with span(name, **attrs):
+            yield trace
+    finally:
+        _CURRENT_SPAN.reset(tok_s)
+        _CURRENT_TRACE.reset(tok_t)
+        with _RECENT_LOCK:
+            _RECENT.append(trace)
+        if TRACE_JSONL:
+            try:
+                export_jsonl(TRACE_JSONL, [trace])
+            except OSError as e:
+                _log.warning("Trace export skipped: %s", e)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Any]:
+    """Timed child of the current span; a no-op when no trace is active."""
+    trace = _CURRENT_TRACE.get()
+    if trace is None:
+        yield _NOOP
+        return
+    sp = trace._open(name, _CURRENT_SPAN.get(), attrs)
+    tok = _CURRENT_SPAN.set(sp)
+    try:
+        yield sp
+    except BaseException as e:
+        sp.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        sp.end_s = time.perf_counter() - trace._t0
+        _CURRENT_SPAN.reset(tok)
+
+
+def current_span() -> Any:
+    """The innermost open span (or a no-op span), for annotating from deep code."""
+    return _CURRENT_SPAN.get() or _NOOP
+
+
+def current_trace() -> Optional[Trace]:
+    return _CURRENT_TRACE.get()
+
+
+def recent_traces(limit: int = _MAX_RECENT) -> List[Trace]:
+    """Most recent finished traces in this process, newest first."""
+    with _RECENT_LOCK:
+        return list(_RECENT)[::-1][:limit]
+
+
+def to_jsonl(traces: Iterable[Trace]) -> str:
+    return "".join(json.dumps(r, default=str) + "\n" for t in traces for r in t.to_records())
+
+
+def export_jsonl(path: str, traces: Optional[Iterable[Trace]] = None) -> int:
+    """Append traces (default: the in-memory recent ones) to a JSONL file; returns spans written."""
+    traces = list(traces) if traces is not None else recent_traces()[::-1]
+    text = to_jsonl(traces)
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    with open(p, "a", encoding="utf-8") as f:
+        f.write(text)
+    return text.count("\n")
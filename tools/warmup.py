@@ -0,0 +1,111 @@
+# tools/warmup.py
+# ----------------------------------------------------
+# Opt-in background warm-up at server start (APP_WARMUP=1 or start_warmup(enabled=True)).
+# Runs once per process in a daemon thread so the first real user does not pay for:
+#   - heavy imports (supabase / openai / query tools)
+#   - the Supabase fetch + DataFrame build + derived columns + column stats (cached)
+#   - the OpenAI TLS handshake (a no-token request on the shared client)
+#   - starting the code sandbox worker pool
+# Pages read the readiness flag via get_warmup_status() / is_ready().
+# ----------------------------------------------------
+from __future__ import annotations
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+WARMUP_ENABLED = os.getenv("APP_WARMUP", "0") == "1"
+
+
+def _warm_imports() -> None:
+    import supabase  # noqa: F401
+    import openai  # noqa: F401
+    from tools.registry import TOOL_REGISTRY
+    for name in TOOL_REGISTRY:
+        TOOL_REGISTRY[name]
+
+
+def _warm_data() -> None:
+    from tools.registry import execute_tool
+    execute_tool("load_biwenger_player_stats", {})
+
+
+def _warm_openai() -> None:
+    # metadata request: no tokens spent, but opens the pooled TLS connection
+    from llm_clients.openai_client import get_openai_client, get_default_model
+    get_openai_client().models.retrieve(get_default_model())
+
+
+def _warm_sandbox() -> None:
+    from tools.code_sandbox import get_sandbox
+    get_sandbox()
+
+
+# (name, fn) in order; later steps benefit from earlier ones
+WARMUP_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("imports", _warm_imports),
+    ("data", _warm_data),
+    ("openai", _warm_openai),
+    ("sandbox", _warm_sandbox),
+]
+
+
+@dataclass
+class WarmupStatus:
+    state: str = "idle"                  # idle | running | ready | degraded
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    steps: Dict[str, dict] = field(default_factory=dict)   # name -> {"ok", "seconds", "error"}
+
+    @property
+    def ready(self) -> bool:
+        """True once warm-up finished (some steps may have failed: see `state`)."""
+        return self.state in {"ready", "degraded"}
+
+    def as_dict(self) -> dict:
+        return {"state": self.state, "ready": self.ready, "steps": dict(self.steps),
+                "seconds": (round(self.finished_at - self.started_at, 3)
+                            if self.finished_at and self.started_at else None)}
+
+
+_STATUS = WarmupStatus()
+_LOCK = threading.Lock()
+
+
+def _run(steps: List[Tuple[str, Callable[[], None]]]) -> None:
+    for name, fn in steps:
+        t0 = time.monotonic()
+        try:
+            fn()
+            _STATUS.steps[name] = {"ok": True, "seconds": round(time.monotonic() - t0, 3)}
+        except Exception as e:  # warm-up is best effort: a failed step only makes first use slower
+            _STATUS.steps[name] = {"ok": False, "seconds": round(time.monotonic() - t0, 3),
+                                   "error": f"{type(e).__name__}: {e}"}
+    _STATUS.finished_at = time.monotonic()
+    _STATUS.state = "ready" if all(s["ok"] for s in _STATUS.steps.values()) else "degraded"
+
+
+def start_warmup(enabled: Optional[bool] = None,
+                 steps: Optional[List[Tuple[str, Callable[[], None]]]] = None) -> WarmupStatus:
+    """
+    Start the warm-up thread if enabled (default: APP_WARMUP=1) and not started yet.
+    Safe to call from every page/rerun; returns the process-wide status.
+    """
+    if not (WARMUP_ENABLED if enabled is None else enabled):
+        return _STATUS
+    with _LOCK:
+        if _STATUS.state == "idle":
+            _STATUS.state = "running"
+            _STATUS.started_at = time.monotonic()
+            threading.Thread(target=_run, args=(steps or WARMUP_STEPS,),
+                             name="app-warmup", daemon=True).start()
+    return _STATUS
+
+
+def get_warmup_status() -> WarmupStatus:
+    return _STATUS
+
+
+def is_ready() -> bool:
+    return _STATUS.ready
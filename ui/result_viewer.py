@@ -0,0 +1,116 @@
+# ui/result_viewer.py
+# ----------------------------------------------------
+# Windowed result viewer for pages/*.
+# Pagination, sorting and column selection run on the server; only the
+# visible page (plus a small look-ahead buffer) is sent to the browser. The
+# full frame is only serialized on explicit download request: the CSV bytes are
+# built in memory for that run and are not kept in session_state.
+# ----------------------------------------------------
+from __future__ import annotations
+import math
+from typing import Any, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from tools.dataframe_transformation_tools import top_k
+
+PAGE_SIZES = [20, 50, 100]
+BUFFER_ROWS = 10
+DOWNLOAD_CHUNK_ROWS = 50_000
+_NO_SORT = "(none)"
+
+
+# ---------- 1) Server-side ordering ----------
+def _window_positions(df: pd.DataFrame, sort_col: Optional[str], desc: bool, stop: int, cache_key: str) -> np.ndarray:
+    """
+    Row positions [0, stop) of `df` in display order.
+    Early pages use top-k selection; deeper pages use a full stable sort,
+    computed once per (result, sort spec) and kept in session_state.
+    """
+    n = len(df)
+    if sort_col is None:
+        return np.arange(min(stop, n))
+
+    s = df[sort_col].reset_index(drop=True)
+    cached = st.session_state.get(cache_key)
+    if cached is not None and cached[0] == (sort_col, desc):
+        return cached[1][:stop]
+
+    if stop * 8 < n:
+        return top_k(s.to_frame(), sort_col, stop, ascending=not desc).index.to_numpy()
+
+    order = s.sort_values(ascending=not desc, kind="stable", na_position="last").index.to_numpy()
+    st.session_state[cache_key] = ((sort_col, desc), order)
+    return order[:stop]
+
+
+# ---------- 2) CSV export ----------
+def iter_csv_chunks(df: pd.DataFrame, chunk_rows: int = DOWNLOAD_CHUNK_ROWS) -> Iterator[str]:
+    """Yield the frame as CSV text, `chunk_rows` rows at a time (header first)."""
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=(start == 0))
+
+
+def _csv_bytes(df: pd.DataFrame) -> bytes:
+    """The whole frame as UTF-8 CSV bytes, built in memory (encoded chunk by chunk)."""
+    return b"".join(chunk.encode("utf-8") for chunk in iter_csv_chunks(df))
+
+
+# ---------- 3) Component ----------
+def render_result(result: Any, *, key: str, file_name: str = "result.csv") -> None:
+    """
+    Render a DataFrame (or a dataset/result handle exposing .frame()) as a paginated table.
+    `key` must be unique per viewer on the page.
+    """
+    source = result
+    df = result.frame() if hasattr(result, "frame") else result
+    if isinstance(df, pd.Series):
+        df = df.to_frame()
+    if not isinstance(df, pd.DataFrame):
+        st.write(df)  # scalar / other outputs of generated code
+        return
+    n = len(df)
+    all_cols = list(df.columns)
+
+    # reset per-viewer state when a different result arrives
+    token = (id(source), n, tuple(all_cols))
+    if st.session_state.get(f"{key}__token") != token:
+        st.session_state[f"{key}__token"] = token
+        st.session_state.pop(f"{key}__order", None)
+        st.session_state[f"{key}__cols"] = all_cols
+        st.session_state[f"{key}__page"] = 1
+
+    c1, c2, c3, c4 = st.columns([4, 2, 1, 1])
+    cols = c1.multiselect("Columns", all_cols, key=f"{key}__cols")
+    sort_choice = c2.selectbox("Sort by", [_NO_SORT] + all_cols, key=f"{key}__sort")
+    desc = c3.toggle("Desc", key=f"{key}__desc")
+    page_size = c4.selectbox("Rows/page", PAGE_SIZES, key=f"{key}__size")
+
+    pages = max(1, math.ceil(n / page_size))
+    if st.session_state.get(f"{key}__page", 1) > pages:
+        st.session_state[f"{key}__page"] = pages
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=f"{key}__page")
+
+    start = (int(page) - 1) * page_size
+    stop = min(n, start + page_size + BUFFER_ROWS)
+    sort_col = None if sort_choice == _NO_SORT else sort_choice
+    pos = _window_positions(df, sort_col, desc, stop, f"{key}__order")[start:stop]
+
+    window = df.iloc[pos][cols or all_cols]
+    st.dataframe(window, use_container_width=True, height=min(480, 38 + 35 * max(len(window), 1)))
+    st.caption(
+        f"Rows {min(start + 1, n)}–{min(n, start + page_size)} of {n} × {len(cols or all_cols)} cols "
+        f"(sent {len(window)} rows incl. a {BUFFER_ROWS}-row buffer)"
+    )
+
+    # full frame only on explicit request, and only for this run: nothing is kept in
+    # session_state. st.download_button (streamlit 1.45) takes the whole payload up
+    # front (no streaming), so the bytes are built in memory here and the button is
+    # shown once; its file is dropped on the next rerun.
+    if st.button("Prepare CSV download", key=f"{key}__prep"):
+        export = df if sort_col is None else df.iloc[_window_positions(df, sort_col, desc, n, f"{key}__order")]
+        st.download_button("Download CSV", data=_csv_bytes(export[cols or all_cols]), file_name=file_name,
+                           mime="text/csv", key=f"{key}__dl", on_click="ignore")
+        st.caption("The download link is kept until the next interaction with the page.")
@@ -0,0 +1,90 @@
+# ui/trace_view.py
+# ----------------------------------------------------
+# Per-query latency breakdown for pages/*.
+#   with traced("plan", query=user_text): ...     # records a trace for this session and tags
+#                                                  # its OpenAI calls with the session (llm_clients.metering)
+#   render_traces(key="p03")                       # waterfall + spans table + JSONL download
+# ----------------------------------------------------
+from __future__ import annotations
+import uuid
+from contextlib import contextmanager
+from typing import Any, Iterator, List
+
+import altair as alt
+import pandas as pd
+import streamlit as st
+
+from llm_clients.metering import metering_session
+from tools.tracing import Trace, start_trace, to_jsonl
+
+MAX_SESSION_TRACES = 20
+
+
+def _session_traces() -> List[Trace]:
+    if "traces" not in st.session_state:
+        st.session_state.traces = []
+    return st.session_state.traces
+
+
+def session_id() -> str:
+    """Stable id of this browser session (metering / budgets key)."""
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex[:12]
+    return st.session_state.session_id
+
+
+@contextmanager
+def traced(name: str, **attrs: Any) -> Iterator[Trace]:
+    """start_trace() that also keeps the trace (even a failed one) in this session."""
+    with metering_session(session_id()), start_trace(name, **attrs) as trace:
+        try:
+            yield trace
+        finally:
+            traces = _session_traces()
+            traces.append(trace)
+            del traces[:-MAX_SESSION_TRACES]
+
+
+def _spans_frame(trace: Trace) -> pd.DataFrame:
+    rows = []
+    for r in trace.to_records():
+        rows.append({
+            "span": f"{'· ' * r['depth']}{r['name']}",
+            "start_ms": r["start_ms"],
+            "end_ms": r["start_ms"] + (r["duration_ms"] or 0.0),
+            "duration_ms": r["duration_ms"],
+            "attrs": ", ".join(f"{k}={v}" for k, v in r["attrs"].items()),
+            "error": r["error"] or "",
+            "order": r["span_id"],
+        })
+    return pd.DataFrame(rows)
+
+
+def render_traces(key: str) -> None:
+    """Waterfall of one of this session's traces, plus a JSONL export of all of them."""
+    traces = _session_traces()
+    if not traces:
+        st.caption("No traces yet — plan or execute something.")
+        return
+
+    labels = [f"{t.name} · {t.duration_s * 1000:.0f} ms · {t.trace_id}" for t in traces][::-1]
+    choice = st.selectbox("Trace", labels, key=f"{key}_trace_pick")
+    trace = traces[::-1][labels.index(choice)]
+
+    df = _spans_frame(trace)
+    chart = (
+        alt.Chart(df)
+        .mark_bar()
+        .encode(
+            x=alt.X("start_ms:Q", title="ms since start"),
+            x2="end_ms:Q",
+            y=alt.Y("span:N", sort=alt.SortField("order"), title=None),
+            color=alt.condition(alt.datum.error != "", alt.value("#d62728"), alt.value("#4c78a8")),
+            tooltip=["span", "duration_ms", "attrs", "error"],
+        )
+        .properties(height=max(120, 22 * len(df)))
+    )
+    st.altair_chart(chart, use_container_width=True)
+    st.dataframe(df.drop(columns=["order", "end_ms"]), use_container_width=True, hide_index=True)
+    st.download_button("Download traces (JSONL)", to_jsonl(traces), file_name="traces.jsonl",
+                       mime="application/x-ndjson", key=f"{key}_trace_dl")
@@ -0,0 +1,51 @@
+# ui/usage_view.py
+# ----------------------------------------------------
+# LLM usage for pages/*: budget state of this session and rolling token / cost /
+# latency counters (llm_clients.metering).
+#   render_budget_status()        # one-line notice while budgets degrade the app
+#   render_usage()                # counters for this session and the whole app
+# ----------------------------------------------------
+from __future__ import annotations
+import pandas as pd
+import streamlit as st
+
+from llm_clients.metering import LEVEL_ECONOMY, LEVEL_EXHAUSTED, get_meter
+from ui.trace_view import session_id
+
+
+def render_budget_status() -> str:
+    """Show a notice when the LLM budget is degrading the app; returns the budget level."""
+    level = get_meter().level(session_id())
+    if level == LEVEL_ECONOMY:
+        st.caption("💸 LLM budget nearly spent: using the cheapest model only for now.")
+    elif level == LEVEL_EXHAUSTED:
+        st.caption("⛔ LLM budget spent: new pandas translations are paused; deterministic plans still work.")
+    return level
+
+
+def render_usage() -> None:
+    """Cost/tokens of this session and the app over the rolling window, by stage and model."""
+    meter = get_meter()
+    stats = meter.stats(session_id())
+    window_min = stats["window_s"] / 60
+    mine, app = stats["session"], stats["window"]
+    budget = stats["budget"]
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric(f"Session cost ({window_min:.0f} min)", f"${mine['cost_usd']:.4f}",
+              help=f"Budget ${budget['session_usd']:.2f} per session")
+    c2.metric("Session tokens", f"{mine['prompt_tokens'] + mine['completion_tokens']:,}",
+              help=f"{mine['cached_tokens']:,} prompt tokens served from the cache")
+    c3.metric(f"App cost ({window_min:.0f} min)", f"${app['cost_usd']:.4f}",
+              help=f"Budget ${budget['global_usd']:.2f} for all sessions")
+    c4.metric("Budget level", budget["level"])
+
+    rows = [{"stage": k, **v, **stats["latency"].get(k, {})} for k, v in stats["by_stage"].items()]
+    rows += [{"model": k, **v} for k, v in stats["by_model"].items()]
+    if rows:
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    recent = meter.recent(session_id(), n=20)
+    if recent:
+        st.markdown("**This session's calls (newest first):**")
+        st.dataframe(pd.DataFrame(recent).drop(columns=["session"]), use_container_width=True, hide_index=True)
+    else:
+        st.caption("No LLM calls in this session yet.")
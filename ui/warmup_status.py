@@ -0,0 +1,26 @@
+# ui/warmup_status.py
+# ----------------------------------------------------
+# Readiness indicator for pages/*: starts the (opt-in) background warm-up if it
+# is not running yet and shows its state. Nothing is shown when warm-up is disabled.
+# ----------------------------------------------------
+from __future__ import annotations
+import streamlit as st
+
+from tools.warmup import start_warmup
+
+
+def render_warmup_status() -> bool:
+    """Show a one-line warm-up status; returns True when the app is warm (or warm-up is off)."""
+    status = start_warmup()
+    if status.state == "idle":
+        return True
+    if status.state == "running":
+        done = ", ".join(status.steps) or "starting"
+        st.caption(f"⏳ Warming up in the background ({done}) — the first request may be slower.")
+        return False
+    if status.state == "degraded":
+        failed = [name for name, s in status.steps.items() if not s["ok"]]
+        st.caption(f"⚠️ Warm-up finished with errors in: {', '.join(failed)}.")
+        return True
+    st.caption("✅ Warm: data loaded and connections open.")
+    return True